@@ -5,9 +5,22 @@ __version__ = "0.1.0"
 __license__ = "MIT"
 
 from .engine.core import Amber, MessageDefaults
-from .engine.exceptions import AmberException, IdMissing, EventMissing, NoSuchBlueprint, NotAllowed
+from .engine.exceptions import AmberException, IdMissing, EventMissing, NoSuchBlueprint, NotAllowed, WorldFileError
 from .engine.types_ import Blueprint, Item, Room, Description, IntroScreen
 from .engine.events import EventManager
 from .engine.action import Action
 
-from .web_modules.web_core import run_web, Socket, app
+# The web server is loaded on first use (Amber.start), importing amber doesn't load aiohttp
+_WEB_NAMES = ("run_web", "Socket", "make_app")
+
+
+def __getattr__(name):
+    if name in _WEB_NAMES:
+        from .web_modules import web_core
+        return getattr(web_core, name)
+
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_WEB_NAMES))
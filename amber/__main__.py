@@ -0,0 +1,54 @@
+# coding=utf-8
+
+##############
+# Command line
+# python -m amber compile game.py  - builds the world cache of a game (see Amber.build_world)
+# python -m amber regions world.jsonl [...] -o world.regions  - writes world data files into a region store (see Amber.use_regions)
+##############
+
+import argparse
+import logging
+import os
+import runpy
+import sys
+
+from .engine import world_cache, regions
+
+
+def compile_game(script: str):
+    """
+    Runs a game script without starting the server, caching the world it builds
+    :param script: path of the game script
+    """
+    world_cache.compiling = True
+
+    sys.argv = [script]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+
+    runpy.run_path(script, run_name="__main__")
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(prog="amber", description="Amber text adventure engine")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser("compile", help="build the world cache of a game")
+    compile_parser.add_argument("script", help="game script")
+
+    regions_parser = commands.add_parser("regions", help="write world data files into a region store")
+    regions_parser.add_argument("data", nargs="+", help="world data files (.jsonl or .jsonl.gz)")
+    regions_parser.add_argument("-o", "--output", required=True, help="region store to write")
+    regions_parser.add_argument("--region-size", type=int, default=regions.REGION_SIZE,
+                                help="rooms per region for rooms without a region (default: %(default)s)")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "compile":
+        compile_game(args.script)
+    elif args.command == "regions":
+        regions.build(args.output, *args.data, region_size=args.region_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
 # coding=utf-8
 import logging
+import os
+import pickle
+import sys
 import time
 from typing import Union
 
 from . import presence
 from .types_ import Room, Item, Blueprint
-from .utils import Singleton
+from .session import GameSession
+from .saving import SaveManager
+from . import world_cache
+from . import loader
+from .regions import RegionStore, MAX_REGIONS
+from .resolution import Resolver, ResolutionReport, ResolutionError
+from .utils import Singleton, data_dir
 from .exceptions import IdMissing, AmberException
 
-# Flask webmodule import
-from ..web_modules.web_core import run_web
-
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
@@ -54,26 +60,152 @@ class Amber(metaclass=Singleton):
         self.version = version
         self.author = author
 
-        self.current_room = None
-        self.previous_room = None
         self.starting_room = None
 
-        self.inventory = []
-
         # Internals
         self._start_time = time.time()
 
+        # Used when no GameSession is active (scripts, tests)
+        self._local_session = None
+
+        # SaveManager when autosave is enabled (see start)
+        self.saves = None
+
+        # Handlers registered with on() for objects that were not loaded yet: list(tuple(object id, event, fn, mode))
+        self._pending_handlers = []
+
+        # Resolves references between rooms, items and descriptions (see resolve_world)
+        self.resolver = Resolver(self)
+
         self.defaults = defaults or MessageDefaults()
 
         # Add instance ref to global directory
         if not presence.is_in_world("amber"):
             presence.add_to_world(self, "amber")
 
-    # noinspection PyProtectedMember
-    @staticmethod
-    def _lazy_load():
-        for room in presence.obj_collector.rooms:
-            room._finalize_loading()
+    def resolve_world(self) -> ResolutionReport:
+        """
+        Resolves every reference between rooms, items and descriptions in one sweep and checks the world
+        (unreachable rooms, items nothing links to or makes, blueprints that can never be combined).
+        Rooms and items created afterwards are resolved as they are created.
+        :return: ResolutionReport
+        :raises ResolutionError: listing every reference to an object that does not exist
+        """
+        report = self.resolver.resolve()
+        if not report.ok:
+            raise ResolutionError(report)
+
+        return report
+
+    def _lazy_load(self):
+        return self.resolve_world()
+
+    def build_world(self, fn, cache: bool = True, data_files: list = None):
+        """
+        Builds the world by calling fn, which creates the rooms, items and blueprints and registers their event handlers.
+        The resolved world is cached in the game's data directory (keyed by the script's content hash, see utils.data_dir),
+        so later starts load it instead of calling fn. `python -m amber compile game.py` builds the cache ahead of time.
+        Event handlers are cached by reference: they must be module-level functions, defined before this call.
+        :param fn: function that builds the world
+        :param cache: Whether to use the world cache (OPTIONAL, defaults to True)
+        :param data_files: world data files fn loads (see load_world), the cache is rebuilt when they change (OPTIONAL)
+        :return: None
+        """
+        # inspect (and the modules it loads) is slow to import, it is only needed here
+        import inspect
+        path = world_cache.cache_path(inspect.getsourcefile(fn), *(data_files or ())) if cache else None
+
+        if path and not world_cache.compiling and os.path.isfile(path):
+            try:
+                world_cache.load(path, self)
+                self._attach_pending()
+                return
+            except Exception:
+                log.exception("Could not load the world cache, building the world")
+
+        fn()
+        self._lazy_load()
+        self._attach_pending()
+
+        # A region store is already on disk, paged rooms aren't part of the cached world
+        if not path or presence.obj_collector.regions is not None:
+            return
+
+        try:
+            world_cache.dump(path, self)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            if world_cache.compiling:
+                raise
+
+            log.warning("The world can't be cached ({}), are all event handlers module-level functions?".format(e))
+
+    def load_world(self, *paths: str) -> dict:
+        """
+        Loads rooms, items, blueprints and descriptions from world data files (JSON Lines, see loader.py).
+        Files are streamed record by record, references between records (and files) are resolved at the end.
+        Handlers registered with on() are attached once their objects are loaded.
+        :param paths: paths of .jsonl (or .jsonl.gz) files
+        :return: dict(record type -> number of records loaded)
+        """
+        counts = loader.load(self, *paths)
+        self._attach_pending()
+        return counts
+
+    def use_regions(self, path: str, max_regions: int = MAX_REGIONS) -> RegionStore:
+        """
+        Plays a world from a region store (`python -m amber regions world.jsonl -o world.regions`, see regions.py).
+        Rooms are paged in from disk when they are needed and paged out when no session is in them,
+        items, blueprints and the intro are loaded right away.
+        :param path: region store file
+        :param max_regions: regions to keep in memory (OPTIONAL)
+        :return: RegionStore
+        """
+        store = RegionStore(path, max_regions)
+        presence.obj_collector.regions = store
+
+        counts = store.load_globals(self)
+        if store.starting_room:
+            self.set_starting_point(store.starting_room)
+
+        self._attach_pending()
+
+        log.info("Using region store {} ({item} items, {blueprint} blueprints loaded)".format(path, **counts))
+        return store
+
+    def on(self, object_id: str, event_name: str, mode: str = None):
+        """
+        Registers an event handler of a Room/Item/Blueprint by its id via decorators.
+        The object doesn't have to exist yet (e.g. when it comes from a world data file loaded later).
+        :param object_id: id of the Room/Item/Blueprint
+        :param event_name: name of the event (see Room.Event, Item.Event, Blueprint.Event)
+        :param mode: ExecutionMode: where the handler runs (OPTIONAL, inline by default)
+        :return: function for the decorator to use
+        """
+        def real_dec(fn):
+            if not callable(fn):
+                raise TypeError("not a function")
+
+            # Paged rooms get their handlers every time they are paged in
+            regions = presence.obj_collector.regions
+            if regions is not None and object_id in regions:
+                regions.add_handler(object_id, event_name, fn, mode)
+                return fn
+
+            obj = presence.obj_collector.find_by_id(object_id)
+            if obj is None:
+                self._pending_handlers.append((object_id, event_name, fn, mode))
+            else:
+                obj.event(event_name, mode)(fn)
+
+            return fn
+
+        return real_dec
+
+    def _attach_pending(self):
+        pending, self._pending_handlers = self._pending_handlers, []
+
+        for object_id, event_name, fn, mode in pending:
+            self.on(object_id, event_name, mode)(fn)
 
     def set_starting_point(self, room):
         if not isinstance(room, (Room, str)):
@@ -88,85 +220,127 @@ class Amber(metaclass=Singleton):
 
         self.starting_room = room
 
-    def walk_to(self, room: Union[Room, str]) -> tuple:
+    @property
+    def session(self) -> GameSession:
         """
-        Moves the player to a different room. A check
-        :param room:
-        :return: tuple(Action/bool, message)
+        The GameSession that is currently being served.
+        Outside of a connection, a local session starting in the starting room is used.
+        :return: GameSession
         """
-        # Checks
-        if isinstance(room, str):
-            r_name = str(room)
+        session = presence.get_session()
+        if session is not None:
+            return session
 
-            room = presence.obj_collector.find_room_by_id(room)
-            if not room:
-                raise IdMissing("{} does not exist".format(r_name))
+        if self._local_session is None:
+            self._local_session = GameSession(self, session_id="local")
 
-        if not isinstance(room, (Room, str)):
-            raise TypeError("room: expected Room/str, got {}".format(type(room)))
+        return self._local_session
+
+    # Per-player state lives in the active session
+    @property
+    def current_room(self) -> Room:
+        return self.session.current_room
+
+    @current_room.setter
+    def current_room(self, room):
+        self.session.current_room = room
+
+    @property
+    def previous_room(self) -> Room:
+        return self.session.previous_room
 
-        resp = self.current_room.enter()
+    @property
+    def inventory(self) -> list:
+        return self.session.inventory
 
-        # Main part
-        self.previous_room = self.current_room
-        self.current_room = room
+    def walk_to(self, room: Union[Room, str]) -> tuple:
+        """
+        Moves the player (in the active session) to a different room.
+        :param room: Room object or room id
+        :return: tuple(Action/bool, message)
+        """
+        return self.session.walk_to(room)
 
-        return resp
+    def travel_to(self, room: Union[Room, str], heuristic=None) -> list:
+        """
+        Moves the player (in the active session) to a room that can be several steps away, see GameSession.travel_to
+        :param room: Room object or room id
+        :param heuristic: fn(room id, goal id) -> lower bound of the steps between the rooms (OPTIONAL)
+        :return: list(tuple(Room, response)) of the steps taken or None if there is no way there
+        """
+        return self.session.travel_to(room, heuristic)
 
-    def combine(self, item1: Union[str, Item], item2: Union[str, Item]) -> Union[None, Blueprint]:
+    def combine(self, *items: Union[str, Item]) -> Union[None, Blueprint]:
         """
-        Combines two items together
-        :param item1: First item to combine
-        :param item2: Second item to combine
-        :return: Item that is made
+        Combines two (or more) items together
+        :param items: Items to combine
+        :return: Blueprint that matches the items or None
         """
         # Check types
-        item1 = Item.handle_id_or_object(item1)
-        item2 = Item.handle_id_or_object(item2)
+        items = [Item.handle_id_or_object(a) for a in items]
 
-        # Find matching blueprint
-        bp = None
-        for r in item2.blueprints + item1.blueprints:
-            assert isinstance(r, Blueprint)
+        # Items that override their blueprints with an event have to be matched one by one
+        if any(a._event_mgr.event_exists("blueprints") for a in items):
+            for item in reversed(items):
+                for r in item.blueprints:
+                    assert isinstance(r, Blueprint)
 
-            if r.matches_items(item1, item2):
-                bp = r
-                break
+                    if r.matches_items(*items):
+                        return r
 
-        if not bp:
             return None
 
-        # Return new item
-        return bp
+        # Find matching blueprint
+        return presence.obj_collector.find_recipe_by_ingredients(a.id for a in items)
 
-    def start(self, autosave=True, open_browser=True):
-        # TODO implement autosave and saving
+    def start(self, autosave=True, open_browser=True, production=False, save_dir: str = None):
         """
         Begins the game. This function MUST be placed at the end of the file.
-        :param autosave: Whether to enable autosave or not
+        :param autosave: Whether to enable autosave or not, saved playthroughs are resumed when the player reconnects
         :param open_browser: If you want to automatically open the browser
+        :param production: Cache the page and assets in memory (and let browsers cache them), instead of reading them on every request
+        :param save_dir: Where saves are kept (OPTIONAL, defaults to "saves" in the game's data directory, see
+                         utils.data_dir). Don't put it in the game's directory, its files are served.
         :return: None
         """
-        log.debug("Starting lazy-load")
-        self._lazy_load()
-        log.debug("Finished lazy-load")
+        # build_world (or the world cache) already resolved the world, rooms created since then were resolved
+        # as they were added. It is only swept again if something is still missing.
+        report = self.resolver.report
+        if report is None or not report.ok or self.resolver.waiting:
+            log.debug("Resolving the world")
+            report = self.resolve_world()
+
+        report.log()
 
         if not self.starting_room:
             raise AmberException("no starting room")
 
-        self.current_room = self.starting_room
+        self._attach_pending()
+        if self._pending_handlers:
+            raise IdMissing("handlers registered for objects that do not exist: {}".format(
+                ", ".join(sorted({a[0] for a in self._pending_handlers}))))
+
+        if world_cache.compiling:
+            log.info("World compiled")
+            return
+
+        if autosave:
+            save_dir = save_dir or os.path.join(data_dir(sys.argv[0]), "saves")
+            self.saves = SaveManager(save_dir)
+            self.saves.start()
 
-        run_web(self, open_browser)
+        # The web server (aiohttp) is only loaded when serving, so the engine can be used without it
+        from ..web_modules.web_core import run_web
+
+        try:
+            run_web(self, open_browser, production)
+        finally:
+            if self.saves is not None:
+                self.saves.stop()
 
     # INTERNAL METHODS
     def _add_to_inventory(self, item: Union[Item, str]):
-        item = Item.handle_id_or_object(item)
-
-        if item not in self.inventory:
-            self.inventory.append(item)
+        self.session._add_to_inventory(item)
 
     def _remove_from_inventory(self, item: Union[Item, str]):
-        item = Item.handle_id_or_object(item)
-
-        if item in self.inventory:
-            self.inventory.remove(item)
+        self.session._remove_from_inventory(item)
@@ -1,19 +1,49 @@
 # coding=utf-8
 import logging
 from .exceptions import EventMissing
+from .utils import get_attribute_values
+from .executor import executors, check_mode, ExecutionMode
 
 
 log = logging.getLogger(__name__)
 
+# Event class -> frozenset of its event names, computed once per class
+_schemas = {}
+
+
+def get_event_schema(event_class) -> frozenset:
+    """
+    Returns the (cached) set of event names declared on an Event class
+    :param event_class: Room.Event, Item.Event, ...
+    :return: frozenset
+    """
+    schema = _schemas.get(event_class)
+    if schema is None:
+        schema = _schemas[event_class] = frozenset(str(a) for a in get_attribute_values(event_class))
+
+    return schema
+
 
 class EventManager:
-    def __init__(self, name, events: list):
+    __slots__ = (
+        "_name", "_schema", "_events", "_modes", "active"
+    )
+
+    def __init__(self, name, events):
         self._name = name
 
-        self._events = {str(a): None for a in events}
+        # Shared between all instances of a class when a schema from get_event_schema is passed
+        self._schema = events if isinstance(events, frozenset) else frozenset(str(a) for a in events)
+        # Only created once a handler is registered
+        self._events = None
+        # Event name -> ExecutionMode, only for handlers that don't run inline
+        self._modes = None
+
+        # True when at least one handler is registered, lets getters skip dispatching altogether
+        self.active = False
 
     def event_exists(self, event_name):
-        return self._events.get(event_name) is not None
+        return self._events is not None and self._events.get(event_name) is not None
 
     # noinspection PyCallingNonCallable
     def dispatch_event(self, event_name, *args, **kwargs):
@@ -24,21 +54,52 @@ class EventManager:
         :param kwargs: Additional keyword arguments
         :return: None or what the function returns
         """
-        if event_name not in self._events.keys():
+        if event_name not in self._schema:
             raise EventMissing("{} is not an event".format(event_name))
 
+        if self._events is None:
+            return None
+
         fn = self._events.get(event_name)
         if fn:
+            if self._modes is not None and event_name in self._modes:
+                # Blocks the calling thread (socket handlers are off the event loop while there are such handlers)
+                return executors.run(self._modes[event_name], fn, *args, **kwargs)
+
             return fn(*args, **kwargs)
         else:
             return None
 
-    def set_event_handler(self, event_name, fn):
-        if event_name not in self._events.keys():
+    def set_event_handler(self, event_name, fn, mode: str = None):
+        """
+        Registers a handler
+        :param event_name: Event name
+        :param fn: Handler
+        :param mode: ExecutionMode (OPTIONAL, inline by default), see executor.py
+        """
+        if event_name not in self._schema:
             raise EventMissing("{} is not a valid event!".format(event_name))
 
+        if mode is not None:
+            check_mode(mode)
+
+        if mode is None or mode == ExecutionMode.INLINE:
+            if self._modes is not None:
+                self._modes.pop(event_name, None)
+        else:
+            if self._modes is None:
+                self._modes = {}
+            self._modes[event_name] = mode
+
+            # From now on socket handlers are moved off the event loop
+            executors.pooled_handlers = True
+
+        if self._events is None:
+            self._events = {}
+
         if fn in self._events.values():
             log.warning("Event function {} for {} was already registered, overwriting".format(event_name, self._name))
 
         log.info("{} for {} registered".format(event_name, self._name))
         self._events[event_name] = fn
+        self.active = True
@@ -33,4 +33,11 @@ class NoSuchBlueprint(AmberException):
     """
     Raised when player tries to combine two items that have to matching blueprint
     """
-    pass
\ No newline at end of file
+    pass
+
+
+class WorldFileError(AmberException):
+    """
+    Raised when a world data file contains an invalid record
+    """
+    pass
@@ -0,0 +1,216 @@
+# coding=utf-8
+
+##############
+# Thread/process pools for running event handlers off the event loop
+##############
+
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils import Singleton
+
+
+log = logging.getLogger(__name__)
+
+# Set in the threads of the thread pool
+_worker = threading.local()
+
+
+class ExecutionMode:
+    # Called directly, in the caller's thread
+    INLINE = "inline"
+    # Called in the thread pool (with the caller's context, so the active GameSession is preserved)
+    THREAD = "thread"
+    # Called in the process pool, only for picklable pure functions with picklable arguments
+    PROCESS = "process"
+
+
+modes = (
+    ExecutionMode.INLINE,
+    ExecutionMode.THREAD,
+    ExecutionMode.PROCESS,
+)
+
+
+class _PoolStats:
+    __slots__ = (
+        "submitted", "started", "completed", "failed", "_lock"
+    )
+
+    def __init__(self):
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+
+        self._lock = threading.Lock()
+
+    def on_submit(self):
+        with self._lock:
+            self.submitted += 1
+
+    def on_start(self):
+        with self._lock:
+            self.started += 1
+
+    def on_done(self, future):
+        with self._lock:
+            self.completed += 1
+            if not future.cancelled() and future.exception() is not None:
+                self.failed += 1
+
+
+class Executors(metaclass=Singleton):
+    def __init__(self):
+        """
+        Lazily created thread and process pools, shared by engine and socket handlers
+        """
+        self.thread_workers = min(32, (os.cpu_count() or 1) + 4)
+        self.process_workers = os.cpu_count() or 1
+
+        # Mode for synchronous socket handlers that don't declare one
+        self.default_mode = ExecutionMode.INLINE
+
+        # True once an engine handler (see EventManager) was registered to run in a pool,
+        # calling those blocks until they are done
+        self.pooled_handlers = False
+
+        self._thread_pool = None
+        self._process_pool = None
+
+        self._stats = {
+            ExecutionMode.THREAD: _PoolStats(),
+            ExecutionMode.PROCESS: _PoolStats(),
+        }
+
+    def configure(self, thread_workers: int = None, process_workers: int = None, default_mode: str = None):
+        """
+        Sets pool sizes and the default mode. Pools that were already created are replaced.
+        :param thread_workers: Size of the thread pool
+        :param process_workers: Size of the process pool
+        :param default_mode: ExecutionMode for synchronous socket handlers without one
+        """
+        if default_mode is not None:
+            check_mode(default_mode)
+            self.default_mode = default_mode
+
+        if thread_workers is not None:
+            self.thread_workers = thread_workers
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=False)
+                self._thread_pool = None
+
+        if process_workers is not None:
+            self.process_workers = process_workers
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False)
+                self._process_pool = None
+
+    def _pool(self, mode: str):
+        if mode == ExecutionMode.THREAD:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="amber")
+            return self._thread_pool
+
+        if self._process_pool is None:
+            # Imported here, multiprocessing is only needed by games that use the process pool
+            from concurrent.futures import ProcessPoolExecutor
+            self._process_pool = ProcessPoolExecutor(self.process_workers)
+        return self._process_pool
+
+    def submit(self, mode: str, fn, *args, **kwargs):
+        """
+        Schedules fn in the pool of the mode
+        :return: concurrent.futures.Future
+        """
+        check_mode(mode)
+        if mode == ExecutionMode.INLINE:
+            raise ValueError("inline calls can't be submitted")
+
+        stats = self._stats[mode]
+        stats.on_submit()
+
+        if mode == ExecutionMode.THREAD:
+            ctx = contextvars.copy_context()
+
+            def call():
+                stats.on_start()
+                _worker.active = True
+                return ctx.run(fn, *args, **kwargs)
+
+            future = self._pool(mode).submit(call)
+        else:
+            future = self._pool(mode).submit(functools.partial(fn, *args, **kwargs))
+
+        future.add_done_callback(stats.on_done)
+        return future
+
+    def run(self, mode: str, fn, *args, **kwargs):
+        """
+        Calls fn according to the mode and waits for the result (blocks the calling thread).
+        In a thread of the pool, thread mode calls are made inline: waiting for another task of the same pool
+        deadlocks once every thread waits like that.
+        """
+        if mode is None or mode == ExecutionMode.INLINE:
+            return fn(*args, **kwargs)
+
+        if mode == ExecutionMode.THREAD and getattr(_worker, "active", False):
+            return fn(*args, **kwargs)
+
+        return self.submit(mode, fn, *args, **kwargs).result()
+
+    async def run_async(self, mode: str, fn, *args, **kwargs):
+        """
+        Calls fn according to the mode without blocking the event loop
+        """
+        if mode is None or mode == ExecutionMode.INLINE:
+            return fn(*args, **kwargs)
+
+        # Only called on a running loop, so asyncio is already loaded
+        import asyncio
+        return await asyncio.wrap_future(self.submit(mode, fn, *args, **kwargs))
+
+    def metrics(self) -> dict:
+        """
+        Queue depth and counters of both pools (served at /_amber/metrics, see web_core)
+        :return: dict(thread: dict, process: dict)
+        """
+        result = {}
+        for mode, stats in self._stats.items():
+            workers = self.thread_workers if mode == ExecutionMode.THREAD else self.process_workers
+
+            result[mode] = {
+                "workers": workers,
+                # Submitted but not finished yet
+                "pending": stats.submitted - stats.completed,
+                "completed": stats.completed,
+                "failed": stats.failed,
+            }
+
+            # Only known for threads, processes can't report back when they start
+            if mode == ExecutionMode.THREAD:
+                result[mode]["queued"] = stats.submitted - stats.started
+                result[mode]["running"] = stats.started - stats.completed
+
+        return result
+
+    def shutdown(self, wait=True):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+        self._thread_pool = None
+        self._process_pool = None
+
+
+def check_mode(mode):
+    if mode not in modes:
+        raise ValueError("no such execution mode: {}".format(mode))
+
+
+# Singleton, so it only has one instance
+executors = Executors()
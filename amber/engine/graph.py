@@ -0,0 +1,296 @@
+# coding=utf-8
+
+##############
+# World graph: which room leads to which (Room.locations) as an index of ids, with shortest paths between rooms.
+# Kept up to date as rooms are added and their locations change, paths are cached until the world changes.
+##############
+
+import heapq
+import logging
+from collections import OrderedDict, deque
+
+
+log = logging.getLogger(__name__)
+
+# Shortest paths kept in the cache
+MAX_PATHS = 1024
+
+
+def _location_ids(locations) -> list:
+    # Locations are Rooms, or ids before they are resolved (and in paged regions)
+    return [a if type(a) is str else a.id for a in locations]
+
+
+class WorldGraph:
+    def __init__(self, collector):
+        """
+        Index of the locations of every room (room id -> ids of the rooms it leads to), locations are one-way.
+        Paths only follow the locations rooms were given, "locations" event handlers are not known to the graph.
+        :param collector: ObjectCollector, locations of rooms that aren't paged in are read from its region store
+        """
+        self._collector = collector
+
+        # room id -> list(room id)
+        self._edges = {}
+        # room id -> list(ids of the rooms that lead to it), kept only while the whole world is indexed
+        # (without a region store, see shortest_path)
+        self._reverse = {}
+
+        # tuple(start id, goal id) -> tuple(room id, ...), least recently used first
+        self._paths = OrderedDict()
+        self.max_paths = MAX_PATHS
+
+        # Bumped whenever a path might have changed
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._edges)
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self._edges
+
+    # UPDATES
+    def add_room(self, room, changed: bool = True):
+        """
+        Indexes a room's locations
+        :param room: Room
+        :param changed: False if the room is only being paged in, so no path can change (OPTIONAL)
+        """
+        self._set_edges(room.id, _location_ids(room._locations))
+
+        if changed:
+            self._changed()
+
+    def remove_room(self, room_id: str):
+        """
+        Removes a room that was paged out (its locations are read from the region store again)
+        """
+        self._set_edges(room_id, None)
+
+    def set_locations(self, room_id: str, locations: list):
+        """
+        Replaces all locations of a room
+        :param room_id: Room id
+        :param locations: list(Room/str)
+        """
+        self._set_edges(room_id, _location_ids(locations))
+        self._changed()
+
+    def add_location(self, room_id: str, location_id: str):
+        edges = self._edges.get(room_id)
+        if edges is None:
+            edges = self._edges[room_id] = []
+
+        edges.append(location_id)
+        if self._collector.regions is None:
+            self._reverse.setdefault(location_id, []).append(room_id)
+        self._changed()
+
+    def remove_location(self, room_id: str, location_id: str):
+        edges = self._edges.get(room_id)
+        if edges is not None and location_id in edges:
+            edges.remove(location_id)
+            if self._collector.regions is None:
+                self._remove_source(location_id, room_id)
+            self._changed()
+
+    def _set_edges(self, room_id: str, location_ids):
+        if self._collector.regions is not None:
+            # Paged rooms are searched forwards only, reverse locations would follow every room paged in
+            self._reverse.clear()
+            if location_ids is None:
+                self._edges.pop(room_id, None)
+            else:
+                self._edges[room_id] = location_ids
+            return
+
+        reverse = self._reverse
+        for location_id in self._edges.pop(room_id, ()):
+            self._remove_source(location_id, room_id)
+
+        if location_ids is not None:
+            self._edges[room_id] = location_ids
+            for location_id in location_ids:
+                sources = reverse.get(location_id)
+                if sources is None:
+                    reverse[location_id] = [room_id]
+                else:
+                    sources.append(room_id)
+
+    def _remove_source(self, location_id: str, room_id: str):
+        sources = self._reverse[location_id]
+        sources.remove(room_id)
+        if not sources:
+            del self._reverse[location_id]
+
+    def _changed(self):
+        self.version += 1
+        self._paths.clear()
+
+    # LOOKUPS
+    def locations(self, room_id: str) -> list:
+        """
+        :param room_id: Room id
+        :return: list(room id), empty if the room does not exist
+        """
+        edges = self._edges.get(room_id)
+        if edges is not None:
+            return edges
+
+        # Not indexed: a room of a region that isn't paged in, or one that doesn't exist
+        regions = self._collector.regions
+        return regions.locations(room_id) if regions is not None else []
+
+    def shortest_path(self, start_id: str, goal_id: str, overrides: dict = None, heuristic=None):
+        """
+        Finds the path with the fewest steps from one room to another
+        :param start_id: Room id to start from
+        :param goal_id: Room id to go to
+        :param overrides: dict(room id -> list(room id)) of locations that differ from the shared ones (OPTIONAL,
+                          a session's changes, see GameSession.path_to). Such paths are not cached.
+        :param heuristic: fn(room id, goal id) -> lower bound of the steps between the rooms (OPTIONAL),
+                          searches with A* instead of breadth-first if given
+        :return: tuple(room id, ...) from start to goal (both included) or None if there is no way there
+        """
+        if start_id == goal_id:
+            return start_id,
+
+        key = (start_id, goal_id)
+        if not overrides:
+            path = self._paths.get(key)
+            if path is not None:
+                self._paths.move_to_end(key)
+                self.hits += 1
+                return path
+
+            self.misses += 1
+
+        locations = self.locations
+        if overrides:
+            def locations(room_id, _shared=self.locations):
+                edges = overrides.get(room_id)
+                return edges if edges is not None else _shared(room_id)
+
+        if heuristic is None and not overrides and self._collector.regions is None:
+            # The whole world is indexed, so it can be searched from both ends (reverse locations are complete)
+            path = self._bidirectional(start_id, goal_id) if goal_id in self._edges else None
+        elif heuristic is None:
+            path = self._bfs(start_id, goal_id, locations)
+        else:
+            path = self._astar(start_id, goal_id, locations, heuristic)
+
+        if path is not None and not overrides:
+            self._paths[key] = path
+            if len(self._paths) > self.max_paths:
+                self._paths.popitem(last=False)
+
+        return path
+
+    # SEARCHES
+    @staticmethod
+    def _walk_back(parents: dict, goal_id: str) -> tuple:
+        path = [goal_id]
+        while True:
+            parent = parents[path[-1]]
+            if parent is None:
+                break
+            path.append(parent)
+
+        path.reverse()
+        return tuple(path)
+
+    def _bfs(self, start_id: str, goal_id: str, locations) -> tuple:
+        # room id -> the room it was reached from
+        parents = {start_id: None}
+        queue = deque((start_id, ))
+
+        # Indexed rooms are read straight from the index, locations() is only called for the others
+        edges = self._edges if locations == self.locations else {}
+
+        while queue:
+            room_id = queue.popleft()
+
+            found = edges.get(room_id)
+            for location_id in (found if found is not None else locations(room_id)):
+                if location_id in parents:
+                    continue
+
+                parents[location_id] = room_id
+                if location_id == goal_id:
+                    return self._walk_back(parents, goal_id)
+
+                queue.append(location_id)
+
+        return None
+
+    def _bidirectional(self, start_id: str, goal_id: str) -> tuple:
+        """
+        Breadth-first from the start (locations) and the goal (reverse locations) at once, a level of the smaller
+        frontier at a time. Where the searches meet is the shortest path, only rooms around both ends are visited.
+        """
+        edges, reverse = self._edges, self._reverse
+
+        # room id -> the room it was reached from (towards start/goal)
+        parents = {start_id: None}
+        children = {goal_id: None}
+        forward, backward = [start_id], [goal_id]
+
+        while forward and backward:
+            if len(forward) <= len(backward):
+                frontier, graph, seen, other = forward, edges, parents, children
+            else:
+                frontier, graph, seen, other = backward, reverse, children, parents
+
+            # Rooms where the searches met on this level (the whole level is expanded, so the shortest is found)
+            met = []
+            next_frontier = []
+            for room_id in frontier:
+                for location_id in graph.get(room_id, ()):
+                    if location_id in seen:
+                        continue
+
+                    seen[location_id] = room_id
+                    if location_id in other:
+                        met.append(location_id)
+                    next_frontier.append(location_id)
+
+            if met:
+                def length(room_id):
+                    return len(self._walk_back(parents, room_id)) + len(self._walk_back(children, room_id))
+
+                middle = min(met, key=length)
+                return self._walk_back(parents, middle) + tuple(reversed(self._walk_back(children, middle)))[1:]
+
+            if frontier is forward:
+                forward = next_frontier
+            else:
+                backward = next_frontier
+
+        return None
+
+    def _astar(self, start_id: str, goal_id: str, locations, heuristic) -> tuple:
+        parents = {start_id: None}
+        steps = {start_id: 0}
+        # tuple(estimated total, insertion order (ties go to the newest), room id)
+        c = 0
+        heap = [(heuristic(start_id, goal_id), c, start_id)]
+
+        while heap:
+            _, _, room_id = heapq.heappop(heap)
+            if room_id == goal_id:
+                return self._walk_back(parents, goal_id)
+
+            next_steps = steps[room_id] + 1
+            for location_id in locations(room_id):
+                if next_steps >= steps.get(location_id, next_steps + 1):
+                    continue
+
+                steps[location_id] = next_steps
+                parents[location_id] = room_id
+                c -= 1
+                heapq.heappush(heap, (next_steps + heuristic(location_id, goal_id), c, location_id))
+
+        return None
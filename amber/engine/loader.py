@@ -0,0 +1,335 @@
+# coding=utf-8
+
+##############
+# World data files: rooms, items, blueprints and descriptions as JSON Lines, streamed into the world
+#
+# One record (JSON object) per line, in any order:
+#   {"type": "item", "id": "key", "name": "Key", "description": "A rusty key"}
+#   {"type": "description", "id": "hall_desc", "text": "A hall with a {item|key}, the {room|yard} is outside"}
+#   {"type": "room", "id": "hall", "name": "Hall", "description_id": "hall_desc", "locations": ["yard"], "starting": true}
+#   {"type": "room", "id": "yard", "name": "Yard", "description": "Plain text", "message": "...", "image": "...", "sound": "..."}
+#   {"type": "blueprint", "id": "key_box", "ingredients": ["key", "box"], "result": "open_box", "message": "..."}
+#   {"type": "intro", "title": "My game", "image": "...", "sound": "..."}
+# Blank lines and lines starting with // are skipped. Files ending in .gz are decompressed on the fly.
+##############
+
+import gzip
+import logging
+try:
+    from ujson import loads
+except ImportError:
+    from json import loads
+
+from . import presence
+from .exceptions import WorldFileError
+from .resolution import ResolutionReport, ResolutionError
+from .types_ import Room, Item, Blueprint, Description, IntroScreen
+from .utils import ObjectType, gc_paused
+
+
+log = logging.getLogger(__name__)
+
+
+class RecordType:
+    ROOM = "room"
+    ITEM = "item"
+    BLUEPRINT = "blueprint"
+    DESCRIPTION = "description"
+    INTRO = "intro"
+
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+
+    return open(path, "r", encoding="utf-8")
+
+
+def read_records(path: str):
+    """
+    Reads a world data file one record at a time
+    :param path: path of a .jsonl (or .jsonl.gz) file
+    :return: generator of dicts
+    :raises WorldFileError: on lines that aren't JSON objects (with the file and line)
+    """
+    with _open(path) as file:
+        for line_no, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("//"):
+                continue
+
+            try:
+                record = loads(line)
+            except ValueError as e:
+                raise WorldFileError("{}:{}: invalid record ({!r})".format(path, line_no, e)) from None
+
+            if not isinstance(record, dict):
+                raise WorldFileError("{}:{}: records must be objects".format(path, line_no))
+
+            yield line_no, record
+
+
+def _claim_id(record: dict, fallback: str) -> str:
+    # Same rules as the constructors: explicit ids must be free, missing ones are generated
+    obj_id = record.get("id")
+    if not obj_id:
+        return presence.generate_id(fallback)
+
+    if presence.id_exists(obj_id):
+        raise WorldFileError("object with id '{}' already exists".format(obj_id))
+
+    presence.add_id(obj_id)
+    return obj_id
+
+
+# OBJECTS
+# Built with the types' _from_record/_from_items (not registered), references stay ids until the world is resolved
+
+def _new_item(record: dict, amber) -> Item:
+    return Item._from_record(record, _claim_id(record, record["name"]), amber)
+
+
+def _new_room(record: dict, claim: bool = True) -> Room:
+    """
+    :param record: room record
+    :param claim: register the id (and generate a missing one), False for rooms of a region store
+    """
+    name = record["name"]
+
+    # A description id is kept as a str and swapped for the Description when resolving
+    description = record.get("description_id")
+    text = record.get("description", "")
+
+    if not claim:
+        # Not registered under their ids (they are unique in the region store)
+        room_id = record["id"]
+        if not description:
+            description = Description._from_record(text, "{}.description".format(room_id))
+
+        return Room._from_record(record, room_id, description)
+
+    # Like Room(), the description gets its id before the room
+    if not description:
+        description = Description(text)
+
+    try:
+        room_id = _claim_id(record, name)
+    except WorldFileError:
+        if isinstance(description, Description):
+            presence.remove_id(description.id)
+        raise
+
+    return Room._from_record(record, room_id, description)
+
+
+def _new_blueprint(record: dict) -> tuple:
+    ingredients = record["ingredients"]
+    if len(ingredients) < 2:
+        raise WorldFileError("a blueprint needs at least two ingredients")
+
+    # Without an id, the blueprint is named after its ingredients (see Blueprint._default_id) once they are known
+    recipe_id = _claim_id(record, None) if record.get("id") else None
+
+    # Items may come later in the file
+    return recipe_id, tuple(ingredients), record["result"], record.get("message")
+
+
+class WorldLoader:
+    def __init__(self, amber):
+        """
+        Streams world data files into the world. Records are read one line at a time and registered right away,
+        references between them are resolved once everything was read (see resolve).
+        :param amber: Amber instance
+        """
+        self.amber = amber
+
+        # Objects from this load that still hold ids instead of objects
+        self._rooms = []
+        self._items = []
+        # tuple(claimed id or None, ingredient ids, result id, message), built once the items are known
+        self._blueprints = []
+        # Description id -> Description (descriptions are only reachable through rooms)
+        self._descriptions = {}
+        self._starting_room = None
+        # Ids of the rooms and items, they may be what rooms loaded earlier are waiting for
+        self._ids = []
+        # Every id this load registered (see rollback)
+        self._claimed = []
+
+        self.counts = dict.fromkeys((RecordType.ROOM, RecordType.ITEM, RecordType.BLUEPRINT, RecordType.DESCRIPTION), 0)
+
+    def read(self, path: str):
+        """
+        Reads a world data file
+        :param path: path of a .jsonl (or .jsonl.gz) file
+        :raises WorldFileError: on malformed records (with the file and line)
+        """
+        for line_no, record in read_records(path):
+            try:
+                self.add(record)
+            except WorldFileError as e:
+                raise WorldFileError("{}:{}: {}".format(path, line_no, e)) from None
+            except (ValueError, KeyError, TypeError) as e:
+                raise WorldFileError("{}:{}: invalid record ({!r})".format(path, line_no, e)) from None
+
+    def add(self, record: dict):
+        """
+        Registers one record
+        :param record: dict, see the top of this module
+        """
+        type_ = record["type"]
+        collector = presence.obj_collector
+
+        if type_ == RecordType.ITEM:
+            item = _new_item(record, self.amber)
+            self._claimed.append(item.id)
+            collector.add_item(item)
+            self._items.append(item)
+            self._ids.append(item.id)
+
+        elif type_ == RecordType.ROOM:
+            room = _new_room(record)
+            self._claimed.append(room.id)
+            if isinstance(room._description, Description):
+                self._claimed.append(room._description.id)
+
+            collector.add_room(room)
+            self._rooms.append(room)
+            self._ids.append(room.id)
+
+            if record.get("starting"):
+                self._starting_room = room
+
+        elif type_ == RecordType.BLUEPRINT:
+            blueprint = _new_blueprint(record)
+            if blueprint[0] is not None:
+                self._claimed.append(blueprint[0])
+
+            self._blueprints.append(blueprint)
+
+        elif type_ == RecordType.DESCRIPTION:
+            desc_id = record.get("id")
+            if not desc_id:
+                raise WorldFileError("descriptions need an id")
+            if presence.id_exists(desc_id):
+                raise WorldFileError("object with id '{}' already exists".format(desc_id))
+
+            self._descriptions[desc_id] = Description(record["text"], desc_id=desc_id)
+            self._claimed.append(desc_id)
+
+        elif type_ == RecordType.INTRO:
+            IntroScreen(record["title"], record.get("image"), record.get("sound"))
+            return
+
+        else:
+            raise WorldFileError("unknown record type '{}'".format(type_))
+
+        self.counts[type_] += 1
+
+    def resolve(self):
+        """
+        Swaps ids for objects in everything that was read (in one pass), registers blueprints and sets the starting room
+        :raises ResolutionError: listing every reference to an object that does not exist, everything that was read
+                                 is unregistered (see rollback)
+        """
+        resolver = self.amber.resolver
+        report = ResolutionReport()
+
+        for room in self._rooms:
+            if isinstance(room._description, str):
+                desc = self._descriptions.get(room._description)
+                if desc is None:
+                    report.add_missing(room.id, RecordType.DESCRIPTION, room._description)
+                    continue
+
+                room._description = desc
+
+            resolver.resolve_room(room, report)
+
+        # Blueprints are indexed by their ingredients, so they are registered once those are known
+        collector = presence.obj_collector
+        blueprints = []
+        for recipe_id, ingredients, result, message in self._blueprints:
+            missing = [a for a in ingredients + (result, ) if collector.find_item_by_id(a) is None]
+            if missing:
+                for item_id in missing:
+                    report.add_missing(recipe_id or "-".join(ingredients), ObjectType.ITEM, item_id)
+                continue
+
+            blueprints.append((recipe_id, tuple(map(collector.find_item_by_id, ingredients)),
+                               collector.find_item_by_id(result), message))
+
+        if not report.ok:
+            self.rollback()
+            raise ResolutionError(report)
+
+        for recipe_id, ingredients, result, message in blueprints:
+            if recipe_id is None:
+                recipe_id = presence.generate_id(Blueprint._default_id(ingredients))
+
+            collector.add_blueprint(Blueprint._from_items(ingredients, result, message, recipe_id))
+
+        # Rooms loaded earlier may have been waiting for these (what else they miss was already reported)
+        if resolver.active:
+            for obj_id in self._ids:
+                resolver.release(obj_id, ResolutionReport())
+
+        if self._starting_room is not None:
+            self.amber.set_starting_point(self._starting_room)
+
+        self._clear()
+
+    def rollback(self):
+        """
+        Unregisters everything that was read, so the files can be loaded again once they are fixed
+        """
+        collector = presence.obj_collector
+
+        for room in self._rooms:
+            # Links to objects loaded earlier are dropped from their watchers
+            if isinstance(room._description, Description):
+                room._description._unresolve()
+
+            collector.remove_room(room)
+
+        self.amber.resolver.forget(a.id for a in self._rooms)
+
+        for item in self._items:
+            collector.remove_item(item)
+
+        for obj_id in self._claimed:
+            presence.remove_id(obj_id)
+
+        self._clear()
+
+    def _clear(self):
+        self._rooms.clear()
+        self._items.clear()
+        self._blueprints.clear()
+        self._descriptions.clear()
+        self._starting_room = None
+        self._ids.clear()
+        self._claimed.clear()
+
+
+def load(amber, *paths: str) -> dict:
+    """
+    Loads world data files (see WorldLoader)
+    :param amber: Amber instance
+    :param paths: files to load, they may reference each other
+    :return: dict(record type -> number of records loaded)
+    """
+    loader = WorldLoader(amber)
+
+    with gc_paused():
+        try:
+            for path in paths:
+                loader.read(path)
+        except WorldFileError:
+            loader.rollback()
+            raise
+
+        loader.resolve()
+
+    log.info("Loaded {room} rooms, {item} items, {blueprint} blueprints and {description} descriptions".format(**loader.counts))
+    return loader.counts
@@ -5,7 +5,10 @@
 ##############
 
 import logging
-from .utils import Singleton
+import weakref
+from contextvars import ContextVar
+from .utils import Singleton, ObjectType
+from .graph import WorldGraph
 
 
 log = logging.getLogger(__name__)
@@ -33,13 +36,56 @@ def is_in_world(name):
     return name in world.keys()
 
 
+# GameSession that is currently being served (set per connection/request)
+_session = ContextVar("session", default=None)
+
+
+def get_session():
+    return _session.get()
+
+
+def set_session(session):
+    """
+    Makes a GameSession the active one in the current context
+    :param session: GameSession or None
+    :return: token for reset_session
+    """
+    return _session.set(session)
+
+
+def reset_session(token):
+    _session.reset(token)
+
+
+# Every GameSession that is still alive (paged regions they are in are never evicted)
+sessions = weakref.WeakSet()
+
+
+# Bumped whenever the shared state of a Room/Item changes
+_revision = 0
+
+
+def bump_revision():
+    global _revision
+    _revision += 1
+
+
+def get_revision() -> int:
+    return _revision
+
+
 # Keeps track of already-used ids
-ids = []
+ids = set()
+
+# Per-prefix cursor for generated ids: preferred -> (last candidate, next suffix)
+_id_cursors = {}
+
+# Per-prefix counter for numbered ids: prefix -> last number used (0 for the bare prefix)
+_id_counters = {}
 
 
 def add_id(id_):
-    if id_ not in ids:
-        ids.append(id_)
+    ids.add(id_)
 
 
 def id_exists(id_):
@@ -47,16 +93,97 @@ def id_exists(id_):
 
 
 def remove_id(id_):
-    global ids
     if id_ in ids:
-        ids = [i for i in ids if i != id_]
+        ids.discard(id_)
+        # A freed id may sit anywhere in a suffix chain (or below a counter), so the cursors have to start over
+        _id_cursors.clear()
+        _id_counters.clear()
+
+
+def generate_id(preferred: str) -> str:
+    """
+    Registers and returns the first free id in the chain preferred, preferred1, preferred12, ...
+    The position in each chain is remembered, so repeated requests for the same prefix are amortised O(1)
+    :param preferred: The id you prefer is generated
+    :return: Generated ID (unique to all types)
+    """
+    candidate, c = _id_cursors.get(preferred, (preferred, 1))
+
+    while candidate in ids and candidate is not None:
+        candidate = "{}{}".format(candidate, c)
+        c += 1
+
+    _id_cursors[preferred] = (candidate, c)
+    ids.add(candidate)
+    return candidate
+
+
+def generate_numbered_id(prefix: str) -> str:
+    """
+    Registers and returns the first free id of prefix, prefix1, prefix2, ... after the last one generated for this prefix.
+    Unlike generate_id the ids don't get longer, for objects that are usually created without an id (the first two
+    are the same as generate_id's).
+    :param prefix: start of the id
+    :return: Generated ID (unique to all types)
+    """
+    c = _id_counters.get(prefix, -1)
+
+    candidate = None
+    while candidate is None or candidate in ids:
+        c += 1
+        candidate = "{}{}".format(prefix, c) if c else prefix
+
+    _id_counters[prefix] = c
+    ids.add(candidate)
+    return candidate
+
+
+def recipe_key(item_ids) -> tuple:
+    """
+    Builds the canonical (order-independent) multiset key of ingredient ids
+    :param item_ids: iterable of Item ids
+    :return: tuple
+    """
+    return tuple(sorted(item_ids))
 
 
 class ObjectCollector(metaclass=Singleton):
     def __init__(self):
-        self.items = []
-        self.rooms = []
-        self.blueprints = []
+        # Per-type indexes (id -> object)
+        self._items = {}
+        self._rooms = {}
+        self._blueprints = {}
+
+        # Global index (id -> (ObjectType, object))
+        self._ids = {}
+
+        # Recipe index (canonical ingredient multiset -> Blueprint)
+        self._recipes = {}
+
+        # RegionStore that pages rooms in when they are looked up (see regions.py), None if the whole world is loaded
+        self.regions = None
+
+        # Which room leads to which, for finding paths (see graph.py)
+        self.graph = WorldGraph(self)
+
+        # fn(room) called for every room that is removed (paged out), to drop what is cached about it
+        self.on_remove = []
+
+    @property
+    def items(self):
+        return self._items.values()
+
+    @property
+    def rooms(self):
+        return self._rooms.values()
+
+    @property
+    def blueprints(self):
+        return self._blueprints.values()
+
+    def _add(self, type_, index: dict, obj):
+        index[obj.id] = obj
+        self._ids[obj.id] = (type_, obj)
 
     def add_item(self, item):
         """
@@ -64,11 +191,9 @@ class ObjectCollector(metaclass=Singleton):
         :param item: Item object to register
         :return: None
         """
-        # if not isinstance(item, Item):
-        #     raise TypeError("expected Item, got {}".format(type(item)))
-        if item not in self.items:
-            log.debug("Adding item:{} to world".format(item.name))
-            self.items.append(item)
+        if item.id not in self._items:
+            log.debug("Adding item:{} to world".format(item._name))
+            self._add(ObjectType.ITEM, self._items, item)
         else:
             log.warning("Item {} was already in world".format(item.name))
 
@@ -78,12 +203,12 @@ class ObjectCollector(metaclass=Singleton):
         :param room: Room object to register
         :return: None
         """
-        # if not isinstance(room, Room):
-        #     raise TypeError("expected Room, got {}".format(type(room)))
+        if room.id not in self._rooms:
+            log.debug("Adding room:{} to world".format(room._name))
+            self._add(ObjectType.ROOM, self._rooms, room)
 
-        if room not in self.items:
-            log.debug("Adding room:{} to world".format(room.name))
-            self.rooms.append(room)
+            # Paging a room in doesn't change the world
+            self.graph.add_room(room, changed=self.regions is None or not self.regions.is_loaded(room.id))
         else:
             log.warning("Room {} was already in world".format(room.name))
 
@@ -93,25 +218,49 @@ class ObjectCollector(metaclass=Singleton):
         :param bp: Blueprint object to register
         :return: None
         """
-        # if not isinstance(recipe, Room):
-        #     raise TypeError("expected Blueprint, got {}".format(type(recipe)))
-        if bp not in self.blueprints:
+        if bp.id not in self._blueprints:
             log.debug("Adding blueprint:{} to world".format(bp.id))
-            self.blueprints.append(bp)
+            self._add(ObjectType.RECIPE, self._blueprints, bp)
+
+            key = bp.key
+            if key in self._recipes:
+                log.warning("Blueprint {} has the same ingredients as {}, ignoring it when combining".format(bp.id, self._recipes[key].id))
+            else:
+                self._recipes[key] = bp
         else:
             log.warning("Blueprint {} was already in world".format(bp.id))
 
+    def remove_room(self, room):
+        """
+        Removes a room from the cache (when its region is paged out)
+        :param room: Room object to remove
+        :return: None
+        """
+        if self._rooms.get(room.id) is room:
+            del self._rooms[room.id]
+            del self._ids[room.id]
+            self.graph.remove_room(room.id)
+
+            for fn in self.on_remove:
+                fn(room)
+
+    def remove_item(self, item):
+        """
+        Removes an item from the cache (when loading its world file failed)
+        :param item: Item object to remove
+        :return: None
+        """
+        if self._items.get(item.id) is item:
+            del self._items[item.id]
+            del self._ids[item.id]
+
     def find_item_by_id(self, item_id: str):
         """
         Finds an Item by its id
         :param item_id: Item id
         :return: Item or None if not found
         """
-        for item in self.items:
-            if item.id == item_id:
-                return item
-
-        return None
+        return self._items.get(item_id)
 
     def find_room_by_id(self, room_id: str):
         """
@@ -119,11 +268,11 @@ class ObjectCollector(metaclass=Singleton):
         :param room_id: Room id
         :return: Room or None if not found
         """
-        for room in self.rooms:
-            if room.id == room_id:
-                return room
+        room = self._rooms.get(room_id)
+        if room is None and self.regions is not None:
+            return self.regions.load_room(room_id)
 
-        return None
+        return room
 
     def find_recipe_by_id(self, recipe_id: str):
         """
@@ -131,11 +280,15 @@ class ObjectCollector(metaclass=Singleton):
         :param recipe_id: Blueprint id
         :return: Blueprint or None if not found
         """
-        for recipe in self.blueprints:
-            if recipe.id == recipe_id:
-                return recipe
+        return self._blueprints.get(recipe_id)
 
-        return None
+    def find_recipe_by_ingredients(self, item_ids):
+        """
+        Finds the Blueprint made from exactly these ingredients (in any order)
+        :param item_ids: iterable of Item ids
+        :return: Blueprint or None if not found
+        """
+        return self._recipes.get(recipe_key(item_ids))
 
     def find_by_id(self, object_id: str):
         """
@@ -143,19 +296,20 @@ class ObjectCollector(metaclass=Singleton):
         :param object_id: object id
         :return: Room/Item/Blueprint or None if not found
         """
-        obj = self.find_item_by_id(object_id)
-        if obj:
-            return obj
-
-        obj = self.find_room_by_id(object_id)
-        if obj:
-            return obj
+        return self.find_typed_by_id(object_id)[1]
 
-        obj = self.find_recipe_by_id(object_id)
-        if obj:
-            return obj
+    def find_typed_by_id(self, object_id: str) -> tuple:
+        """
+        Finds an object and its type with a single lookup
+        :param object_id: object id
+        :return: tuple(ObjectType, Room/Item/Blueprint) or (None, None) if not found
+        """
+        found = self._ids.get(object_id)
+        if found is None:
+            room = self.regions.load_room(object_id) if self.regions is not None else None
+            return (ObjectType.ROOM, room) if room is not None else (None, None)
 
-        return None
+        return found
 
 
 # Singleton, so it only has one instance
@@ -0,0 +1,377 @@
+# coding=utf-8
+
+##############
+# Region store: rooms grouped into regions that are kept on disk (SQLite) and paged in when they are needed.
+# Regions no session is in are paged out again (least recently used first), so memory follows the part of
+# the world that is being played instead of its size.
+##############
+
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+try:
+    from ujson import dumps, loads
+except ImportError:
+    from json import dumps, loads
+
+from . import presence
+from .events import get_event_schema
+from .exceptions import WorldFileError, IdMissing, EventMissing
+from .loader import read_records, WorldLoader, RecordType, _new_room
+from .types_ import Room, Description
+
+
+log = logging.getLogger(__name__)
+
+# Regions kept in memory. Regions sessions are in are never paged out, so there can be more of them.
+MAX_REGIONS = 64
+# Rooms without a "region" are grouped in file order, this many per region
+REGION_SIZE = 1000
+# Locations of rooms that aren't paged in kept for finding paths (a few hundred bytes per room)
+MAX_LOCATIONS = 100000
+
+# Bump when the tables change
+FORMAT_VERSION = 1
+
+# Rooms are clustered by region, so paging a region in reads one contiguous range
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE rooms (region TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (region, id)) WITHOUT ROWID;
+CREATE UNIQUE INDEX rooms_id ON rooms (id, region);
+CREATE TABLE descriptions (id TEXT PRIMARY KEY, text TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE globals (seq INTEGER PRIMARY KEY, data TEXT NOT NULL);
+"""
+
+# SQLite limits the number of parameters in one query
+_MAX_PARAMS = 500
+
+
+def build(path: str, *data_paths: str, region_size: int = REGION_SIZE) -> dict:
+    """
+    Writes world data files (see loader.py) into a region store. Rooms are grouped by their "region" field,
+    description records are stored separately and everything else (items, blueprints, the intro) is loaded
+    in full when the store is opened. Records are streamed, so worlds of any size can be written.
+    :param path: file to write (replaced if it exists)
+    :param data_paths: world data files
+    :param region_size: rooms per region for rooms without a "region" (OPTIONAL)
+    :return: dict(rooms, regions, descriptions, globals)
+    :raises WorldFileError: on invalid or duplicate records
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    db.executescript(_SCHEMA)
+
+    counts = dict.fromkeys(("rooms", "descriptions", "globals"), 0)
+    starting_room = None
+
+    try:
+        with db:
+            for data_path in data_paths:
+                for line_no, record in read_records(data_path):
+                    try:
+                        type_ = record["type"]
+
+                        if type_ == RecordType.ROOM:
+                            region = str(record.get("region") or "#{}".format(counts["rooms"] // region_size))
+                            db.execute("INSERT INTO rooms VALUES (?, ?, ?)", (region, record["id"], dumps(record)))
+                            counts["rooms"] += 1
+
+                            if record.get("starting"):
+                                starting_room = record["id"]
+
+                        elif type_ == RecordType.DESCRIPTION:
+                            db.execute("INSERT INTO descriptions VALUES (?, ?)", (record["id"], record["text"]))
+                            counts["descriptions"] += 1
+
+                        else:
+                            db.execute("INSERT INTO globals (data) VALUES (?)", (dumps(record), ))
+                            counts["globals"] += 1
+
+                    except sqlite3.IntegrityError:
+                        raise WorldFileError("{}:{}: object with id '{}' already exists".format(
+                            data_path, line_no, record.get("id"))) from None
+                    except (KeyError, TypeError) as e:
+                        raise WorldFileError("{}:{}: invalid record ({!r})".format(data_path, line_no, e)) from None
+
+            counts["regions"] = db.execute("SELECT COUNT(DISTINCT region) FROM rooms").fetchone()[0]
+
+            db.executemany("INSERT INTO meta VALUES (?, ?)", (
+                ("format", str(FORMAT_VERSION)),
+                ("starting_room", starting_room),
+            ))
+    finally:
+        db.close()
+
+    os.replace(tmp_path, path)
+
+    log.info("Wrote {rooms} rooms in {regions} regions, {descriptions} descriptions "
+             "and {globals} other records".format(**counts))
+    return counts
+
+
+class RegionStore:
+    def __init__(self, path: str, max_regions: int = MAX_REGIONS):
+        """
+        Pages the rooms of a region store (written by build) in and out. Rooms are paged in when they are looked up
+        (ObjectCollector.find_room_by_id) and the regions around a player are prefetched when they walk.
+        Use Amber.use_regions to play a world from a region store.
+        :param path: region store file
+        :param max_regions: regions to keep in memory (OPTIONAL)
+        """
+        self.path = path
+        self.max_regions = max_regions
+
+        # Read-only: the world on disk never changes while playing
+        self._db = sqlite3.connect("file:{}?mode=ro".format(os.path.abspath(path)), uri=True, check_same_thread=False)
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        if meta.get("format") != str(FORMAT_VERSION):
+            raise WorldFileError("{} is not a region store (or was written by another version)".format(path))
+
+        self.starting_room = meta.get("starting_room")
+
+        # Requests are served from several threads
+        self._lock = threading.RLock()
+
+        # region -> dict(room id -> Room), least recently used first
+        self._regions = OrderedDict()
+        # room id -> region, for loaded rooms
+        self._loaded = {}
+        # room id -> list(tuple(event, fn, mode)), attached every time the room is paged in
+        self._handlers = {}
+
+        # Locations of rooms that aren't paged in, for finding paths (see locations), MAX_LOCATIONS rooms at most
+        # region -> list(room id), least recently used first
+        self._location_regions = OrderedDict()
+        # room id -> list(room id)
+        self._locations = {}
+
+        self.loads = 0
+        self.evictions = 0
+
+    def load_globals(self, amber) -> dict:
+        """
+        Loads everything that isn't paged (items, blueprints, the intro)
+        :param amber: Amber instance
+        :return: dict(record type -> number of records loaded)
+        """
+        loader = WorldLoader(amber)
+        for (data, ) in self._db.execute("SELECT data FROM globals ORDER BY seq"):
+            loader.add(loads(data))
+
+        loader.resolve()
+        return loader.counts
+
+    # LOOKUPS
+    def region_of(self, room_id: str):
+        """
+        :param room_id: Room id
+        :return: region or None if the room is not in the store
+        """
+        region = self._loaded.get(room_id)
+        if region is not None:
+            return region
+
+        with self._lock:
+            row = self._db.execute("SELECT region FROM rooms WHERE id = ?", (room_id, )).fetchone()
+
+        return row[0] if row else None
+
+    def is_loaded(self, room_id: str) -> bool:
+        return room_id in self._loaded
+
+    def __contains__(self, room_id: str) -> bool:
+        return self.region_of(room_id) is not None
+
+    def __len__(self):
+        return len(self._regions)
+
+    def locations(self, room_id: str) -> list:
+        """
+        Ids of the rooms a room leads to, read without paging the room in (searching for a path goes
+        through many more rooms than a player walks through). The locations of a whole region are read at once.
+        :param room_id: Room id
+        :return: list(room id), empty if the room is not in the store
+        """
+        with self._lock:
+            locations = self._locations.get(room_id)
+            if locations is not None:
+                return locations
+
+            region = self.region_of(room_id)
+            if region is None:
+                return []
+
+            rows = self._db.execute("SELECT id, data FROM rooms WHERE region = ?", (region, )).fetchall()
+            self._location_regions[region] = [a for a, _ in rows]
+            for a, data in rows:
+                self._locations[a] = loads(data).get("locations") or []
+
+            while len(self._locations) > MAX_LOCATIONS and len(self._location_regions) > 1:
+                for a in self._location_regions.popitem(last=False)[1]:
+                    del self._locations[a]
+
+            return self._locations[room_id]
+
+    # PAGING
+    def load_room(self, room_id: str):
+        """
+        Pages in the region of a room
+        :param room_id: Room id
+        :return: Room or None if the room is not in the store
+        """
+        with self._lock:
+            region = self.region_of(room_id)
+            if region is None:
+                return None
+
+            return self.load_region(region).get(room_id)
+
+    def load_region(self, region: str) -> dict:
+        """
+        Pages a region in (or marks it as recently used if it is loaded)
+        :param region: region name
+        :return: dict(room id -> Room)
+        """
+        with self._lock:
+            rooms = self._regions.get(region)
+            if rooms is not None:
+                self._regions.move_to_end(region)
+                return rooms
+
+            rooms = self._regions[region] = self._read(region)
+            self.loads += 1
+
+            self._evict(region)
+            return rooms
+
+    def prefetch(self, room: Room):
+        """
+        Pages in the regions of a room's neighbours, before the player walks there
+        :param room: Room
+        """
+        with self._lock:
+            for location in room._locations:
+                location_id = location if isinstance(location, str) else location.id
+                if location_id in self._loaded:
+                    continue
+
+                region = self.region_of(location_id)
+                if region is not None:
+                    self.load_region(region)
+
+    def _read(self, region: str) -> dict:
+        records = [loads(a) for (a, ) in self._db.execute("SELECT data FROM rooms WHERE region = ?", (region, ))]
+
+        desc_ids = list({a["description_id"] for a in records if a.get("description_id")})
+        texts = {}
+        for c in range(0, len(desc_ids), _MAX_PARAMS):
+            chunk = desc_ids[c:c + _MAX_PARAMS]
+            query = "SELECT id, text FROM descriptions WHERE id IN ({})".format(",".join("?" * len(chunk)))
+            texts.update(self._db.execute(query, chunk))
+
+        collector = presence.obj_collector
+        rooms = {}
+
+        for record in records:
+            # Locations and description links stay ids, they are resolved (and paged in) when they are used
+            room = _new_room(record, claim=False)
+
+            if isinstance(room._description, str):
+                text = texts.get(room._description)
+                if text is None:
+                    raise IdMissing("description {} does not exist".format(room._description))
+
+                room._description = Description._from_record(text, room._description)
+
+            for event_name, fn, mode in self._handlers.get(room.id, ()):
+                room._event_mgr.set_event_handler(event_name, fn, mode=mode)
+
+            self._loaded[room.id] = region
+            collector.add_room(room)
+            rooms[room.id] = room
+
+        log.debug("Paged in region {} ({} rooms)".format(region, len(rooms)))
+        return rooms
+
+    def _pinned(self) -> set:
+        """
+        Regions that must stay loaded: the starting room's, those sessions are in (or changed rooms of) and those of
+        the rooms sessions changed locations lead to (they hold the Room objects, which must stay the loaded ones)
+        """
+        amber = presence.world.get("amber")
+        rooms = [amber.starting_room] if amber is not None else []
+        pinned = set()
+
+        for session in list(presence.sessions):
+            rooms.append(session.current_room)
+            rooms.append(session.previous_room)
+
+            pinned.update(self._loaded[a] for a in session.overlay.changed_ids() if a in self._loaded)
+            for locations in session.overlay.changes_of("_locations").values():
+                rooms.extend(a for a in locations if type(a) is not str)
+
+        pinned.update(self._loaded[a.id] for a in rooms if a is not None and a.id in self._loaded)
+        return pinned
+
+    def _evict(self, keep: str):
+        """
+        Pages out the least recently used regions no session needs until at most max_regions are left
+        :param keep: region that was just paged in (whoever asked for it is about to use it)
+        """
+        if len(self._regions) <= self.max_regions:
+            return
+
+        pinned = self._pinned()
+        pinned.add(keep)
+
+        for region in list(self._regions):
+            if len(self._regions) <= self.max_regions:
+                break
+
+            if region not in pinned:
+                self._unload(region)
+
+    def _unload(self, region: str):
+        rooms = self._regions.pop(region)
+        collector = presence.obj_collector
+
+        for room in rooms.values():
+            # Descriptions (in other regions) that link to this room go back to ids, so they don't keep it alive
+            for desc in list(room._watchers):
+                desc._unresolve()
+            if isinstance(room._description, Description):
+                room._description._unresolve()
+
+            collector.remove_room(room)
+            del self._loaded[room.id]
+
+        self.evictions += 1
+        log.debug("Paged out region {}".format(region))
+
+    # HANDLERS
+    def add_handler(self, room_id: str, event_name: str, fn, mode: str = None):
+        """
+        Registers an event handler of a paged room, it is attached every time the room is paged in
+        :param room_id: Room id
+        :param event_name: Room event
+        :param fn: handler
+        :param mode: ExecutionMode (OPTIONAL)
+        """
+        if event_name not in get_event_schema(Room.Event):
+            raise EventMissing("{} is not a valid event!".format(event_name))
+
+        with self._lock:
+            self._handlers.setdefault(room_id, []).append((event_name, fn, mode))
+
+            region = self._loaded.get(room_id)
+            if region is not None:
+                self._regions[region][room_id].event(event_name, mode)(fn)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,247 @@
+# coding=utf-8
+
+##############
+# Reference resolution: turns the ids rooms and descriptions refer to into objects in one sweep,
+# reports every problem at once and resolves rooms added while the game runs
+##############
+
+import logging
+from collections import deque
+
+from . import presence
+from .exceptions import IdMissing
+from .types_ import Room, Description
+from .utils import gc_paused
+
+
+log = logging.getLogger(__name__)
+
+# How many ids of each problem are shown in messages
+SHOW_IDS = 10
+
+
+def _ids(ids: list) -> str:
+    shown = ", ".join(ids[:SHOW_IDS])
+    return shown + (" and {} more".format(len(ids) - SHOW_IDS) if len(ids) > SHOW_IDS else "")
+
+
+class ResolutionReport:
+    __slots__ = (
+        "missing", "unreachable", "orphan_items", "uncraftable", "checked"
+    )
+
+    def __init__(self):
+        """
+        Everything a resolution pass found. Only missing ids are errors, the rest can be intended
+        (handlers can move the player anywhere and hand out any item).
+        """
+        # list(tuple(object id, referenced type, missing id))
+        self.missing = []
+        # Room ids that can't be walked to from the starting room
+        self.unreachable = []
+        # Item ids no description links to and no blueprint uses or makes
+        self.orphan_items = []
+        # Blueprint ids that have an ingredient the player can never get
+        self.uncraftable = []
+
+        # False if the world checks were skipped (rooms are paged from a region store)
+        self.checked = False
+
+    def add_missing(self, obj_id: str, type_: str, missing_id: str):
+        self.missing.append((obj_id, type_, missing_id))
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing
+
+    def log(self):
+        """
+        Logs the problems that don't stop the game (see ResolutionError for the others)
+        """
+        if self.unreachable:
+            log.warning("{} rooms can't be reached from the starting room: {}".format(
+                len(self.unreachable), _ids(self.unreachable)))
+        if self.orphan_items:
+            log.warning("{} items are never linked or crafted: {}".format(len(self.orphan_items), _ids(self.orphan_items)))
+        if self.uncraftable:
+            log.warning("{} blueprints can never be combined: {}".format(len(self.uncraftable), _ids(self.uncraftable)))
+
+    def __str__(self):
+        lines = ["{} references to objects that do not exist".format(len(self.missing))]
+        lines.extend("  {}: {} {}".format(obj_id, type_, missing_id) for obj_id, type_, missing_id in self.missing)
+        return "\n".join(lines)
+
+
+class ResolutionError(IdMissing):
+    def __init__(self, report: ResolutionReport):
+        """
+        Raised when rooms or descriptions reference ids that do not exist, lists all of them
+        """
+        super().__init__(str(report))
+        self.report = report
+
+
+class Resolver:
+    def __init__(self, amber):
+        """
+        Resolves the references of rooms and their descriptions. Before the game starts, everything is resolved
+        in one sweep (resolve). Afterwards, rooms and items are resolved as they are created (added), references to
+        ids that don't exist yet wait for them.
+        :param amber: Amber instance
+        """
+        self.amber = amber
+
+        # True once the world was resolved, new rooms/items are resolved as they are added from then on
+        self.active = False
+        # ResolutionReport of the last sweep (or of the cached world, see world_cache.load), None before
+        self.report = None
+
+        # missing id -> dict(room id -> Room) of rooms waiting for it
+        self._waiting = {}
+
+    def resolve_room(self, room: Room, report: ResolutionReport):
+        """
+        Resolves a room's locations and description links, references to missing ids are reported and wait for them
+        """
+        missing = []
+        room._finalize_loading(missing)
+
+        for type_, missing_id in missing:
+            report.add_missing(room.id, type_, missing_id)
+            self._waiting.setdefault(missing_id, {})[room.id] = room
+
+    def release(self, obj_id: str, report: ResolutionReport):
+        """
+        Resolves the rooms that were waiting for an id that now exists
+        """
+        for room in self._waiting.pop(obj_id, {}).values():
+            self.resolve_room(room, report)
+
+    def resolve(self) -> ResolutionReport:
+        """
+        Resolves references of all rooms (that aren't paged) and their descriptions in one sweep, then checks the world
+        :return: ResolutionReport
+        """
+        report = ResolutionReport()
+        collector = presence.obj_collector
+        regions = collector.regions
+
+        # Rooms of a region store resolve their references when they are used
+        rooms = [a for a in collector.rooms if regions is None or not regions.is_loaded(a.id)]
+
+        with gc_paused():
+            # Everything is looked up again, so waiting references are collected anew
+            self._waiting.clear()
+            for room in rooms:
+                self.resolve_room(room, report)
+
+            self.active = True
+
+            if report.ok and regions is None:
+                self._check(report)
+
+        self.report = report
+        return report
+
+    def added(self, obj):
+        """
+        Resolves a Room created after the world was resolved, and everything that was waiting for its id
+        :param obj: new Room/Item
+        :return: ResolutionReport (of the new room's missing references)
+        """
+        report = ResolutionReport()
+
+        if isinstance(obj, Room):
+            self.resolve_room(obj, report)
+
+            if report.missing:
+                log.warning("{} is waiting for objects that do not exist yet: {}".format(
+                    obj.id, _ids(list(dict.fromkeys(a[2] for a in report.missing)))))
+
+        # Rooms that still miss other ids were already reported
+        self.release(obj.id, ResolutionReport())
+        return report
+
+    def forget(self, room_ids):
+        """
+        Stops resolving rooms that were removed (their world file failed to load)
+        :param room_ids: iterable of Room ids
+        """
+        room_ids = set(room_ids)
+        for missing_id, rooms in list(self._waiting.items()):
+            for room_id in room_ids.intersection(rooms):
+                del rooms[room_id]
+
+            if not rooms:
+                del self._waiting[missing_id]
+
+    @property
+    def waiting(self) -> list:
+        """
+        Ids that rooms refer to, but do not exist
+        """
+        return list(self._waiting)
+
+    # CHECKS
+    def _check(self, report: ResolutionReport):
+        collector = presence.obj_collector
+        starting_room = self.amber.starting_room
+
+        # Rooms reachable from the start (breadth-first over the shared locations and the rooms descriptions link to)
+        reachable = set()
+        if starting_room is not None:
+            reachable.add(starting_room.id)
+            queue = deque((starting_room, ))
+
+            while queue:
+                room = queue.popleft()
+                desc = room._description
+                linked = desc.rooms if isinstance(desc, Description) else ()
+
+                for location in (*room._locations, *linked):
+                    if location.id not in reachable:
+                        reachable.add(location.id)
+                        queue.append(location)
+
+            report.unreachable = [a.id for a in collector.rooms if a.id not in reachable]
+
+        # Items the player can find: linked from descriptions of reachable rooms
+        linked = set()
+        found = deque()
+        for room in collector.rooms:
+            desc = room._description
+            if not isinstance(desc, Description):
+                continue
+
+            for item in desc.items:
+                linked.add(item.id)
+                if room.id in reachable:
+                    found.append(item)
+
+        # ... or craft from those (each blueprint counts down its distinct ingredients)
+        used_in = {}
+        remaining = {}
+        made = set()
+        for bp in collector.blueprints:
+            ingredients = {a.id for a in bp.ingredients}
+            remaining[bp.id] = len(ingredients)
+
+            for item_id in ingredients:
+                used_in.setdefault(item_id, []).append(bp)
+            made.add(bp.result.id)
+
+        obtainable = set()
+        while found:
+            item = found.popleft()
+            if item.id in obtainable:
+                continue
+
+            obtainable.add(item.id)
+            for bp in used_in.get(item.id, ()):
+                remaining[bp.id] -= 1
+                if not remaining[bp.id]:
+                    found.append(bp.result)
+
+        report.orphan_items = [a.id for a in collector.items if a.id not in linked and a.id not in used_in and a.id not in made]
+        report.uncraftable = [a for a, count in remaining.items() if count]
+        report.checked = True
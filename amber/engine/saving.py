@@ -0,0 +1,357 @@
+# coding=utf-8
+
+##############
+# Saving: an append-only journal of session changes, periodic snapshots and background compaction
+##############
+
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+try:
+    from ujson import dumps, loads
+except ImportError:
+    from json import dumps, loads
+
+from . import presence
+from .session import GameSession
+from .types_ import Room, Item
+from .utils import Change
+
+
+log = logging.getLogger(__name__)
+
+JOURNAL_FILE = "journal.jsonl"
+SNAPSHOT_FILE = "snapshot.json"
+
+# A snapshot is written (and the journal emptied) this often (seconds) ...
+SNAPSHOT_INTERVAL = 60
+# ... or after this many journal entries, whichever comes first
+COMPACT_AFTER = 10000
+# Saved sessions that haven't changed for this long (seconds) are dropped when compacting
+SESSION_TTL = 30 * 24 * 3600
+
+# Journal entry of a new session (the other entries are Change kinds)
+START = "start"
+
+# Tells the writer thread to finish
+_STOP = object()
+
+
+# VALUES
+# Overlay values are saved with Rooms/Items replaced by their ids
+
+def _encode(value):
+    if isinstance(value, Room):
+        return {"$room": value.id}
+    if isinstance(value, Item):
+        return {"$item": value.id}
+    if isinstance(value, (list, tuple)):
+        return [_encode(a) for a in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+
+    raise TypeError("can't save {}".format(type(value).__name__))
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if "$room" in value:
+            return presence.obj_collector.find_room_by_id(value["$room"])
+        if "$item" in value:
+            return presence.obj_collector.find_item_by_id(value["$item"])
+    if isinstance(value, list):
+        # Rooms/Items that were removed from the world since are left out
+        return [_decode(a) for a in value if not isinstance(a, dict) or _decode(a) is not None]
+
+    return value
+
+
+def _apply(states: dict, entry: list):
+    """
+    Applies a journal entry to the saved states
+    :param states: session id -> dict(room, previous, inventory, overlay)
+    :param entry: list(seq, session id, kind, object id, attribute, value)
+    """
+    _, session_id, kind, obj_id, attr, value = entry
+
+    if kind == START:
+        states[session_id] = {"room": obj_id, "previous": None, "inventory": [], "overlay": {}}
+        return
+
+    state = states.get(session_id)
+    if state is None:
+        return
+
+    if kind == Change.MOVE:
+        state["previous"], state["room"] = state["room"], obj_id
+
+    elif kind == Change.INVENTORY_ADD:
+        if obj_id not in state["inventory"]:
+            state["inventory"].append(obj_id)
+
+    elif kind == Change.INVENTORY_REMOVE:
+        if obj_id in state["inventory"]:
+            state["inventory"].remove(obj_id)
+
+    elif kind == Change.UPDATE:
+        state["overlay"].setdefault(obj_id, {})[attr] = value
+
+
+class SaveManager:
+    def __init__(self, directory: str, snapshot_interval: float = SNAPSHOT_INTERVAL, compact_after: int = COMPACT_AFTER,
+                 session_ttl: float = SESSION_TTL):
+        """
+        Saves every session's changes to an append-only journal. A background thread writes the journal,
+        keeps the saved states up to date and compacts them into a snapshot, so saving never blocks the caller.
+        Saved states are loaded right away (snapshot + journal entries after it).
+        :param directory: where the journal and snapshot are kept
+        :param snapshot_interval: write a snapshot at least this often (seconds)
+        :param compact_after: write a snapshot after this many journal entries
+        :param session_ttl: drop saved sessions that haven't changed for this long (seconds, OPTIONAL)
+        """
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.compact_after = compact_after
+        self.session_ttl = session_ttl
+
+        os.makedirs(directory, exist_ok=True)
+        self.journal_path = os.path.join(directory, JOURNAL_FILE)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+
+        # session id -> dict(room, previous, inventory, overlay, seen), changed by the writer thread only
+        self._states = {}
+        self._lock = threading.Lock()
+        self._seq = 0
+
+        # Sessions that are still in memory are resumed as they are
+        self._live = weakref.WeakValueDictionary()
+
+        self._queue = queue.Queue()
+        self._thread = None
+
+        self.load()
+
+    # RECOVERY
+    def load(self):
+        """
+        Loads the snapshot and replays the journal entries written after it
+        """
+        states, seq = {}, 0
+
+        if os.path.isfile(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                snapshot = loads(file.read())
+            states, seq = snapshot["sessions"], snapshot["seq"]
+
+        replayed = 0
+        if os.path.isfile(self.journal_path):
+            with open(self.journal_path, "r+b") as file:
+                # End of the last complete entry
+                good = 0
+
+                for line in file:
+                    try:
+                        entry = loads(line)
+                    except ValueError:
+                        entry = None
+
+                    if entry is None or not line.endswith(b"\n"):
+                        # The last entry can be cut off by a crash, new entries must not be appended to it
+                        log.warning("Dropping an incomplete journal entry")
+                        file.truncate(good)
+                        break
+
+                    good += len(line)
+
+                    # Already part of the snapshot (the journal is emptied after the snapshot is written)
+                    if entry[0] <= seq:
+                        continue
+
+                    _apply(states, entry)
+                    seq = entry[0]
+                    replayed += 1
+
+        # Sessions from older snapshots (and the journal) count as seen now
+        now = time.time()
+        for state in states.values():
+            state.setdefault("seen", now)
+
+        with self._lock:
+            self._states, self._seq = states, seq
+
+        log.info("Loaded {} saved sessions ({} journal entries)".format(len(states), replayed))
+
+    def resume(self, amber, session_id: str, **kwargs):
+        """
+        Restores a saved session. A session that is still in memory is returned as it is, the connection that
+        resumes it takes it over (see GameSession.connection).
+        :param amber: Amber instance
+        :param session_id: id of the session
+        :param kwargs: passed to GameSession
+        :return: GameSession or None if there is no such save
+        """
+        live = self._live.get(session_id)
+        if live is not None:
+            return live
+
+        with self._lock:
+            state = self._states.get(session_id)
+            if state is None:
+                return None
+
+            state = loads(dumps(state))
+
+        session = GameSession(amber, session_id=session_id, **kwargs)
+        collector = presence.obj_collector
+
+        room = collector.find_room_by_id(state["room"])
+        if room is not None:
+            session.current_room = room
+        else:
+            log.warning("Saved room {} does not exist anymore".format(state["room"]))
+
+        session.previous_room = collector.find_room_by_id(state["previous"]) if state["previous"] else None
+        session.inventory = [a for a in map(collector.find_item_by_id, state["inventory"]) if a is not None]
+
+        # Straight into the overlay, so nothing is recorded again
+        for obj_id, changes in state["overlay"].items():
+            obj = collector.find_by_id(obj_id)
+            if obj is None:
+                continue
+
+            for attr, value in changes.items():
+                session.overlay.set(obj, attr, _decode(value))
+
+        self._attach(session)
+        return session
+
+    # RECORDING
+    def attach(self, session: GameSession):
+        """
+        Starts saving a new session
+        """
+        self._attach(session)
+        self._queue.put((session.id, START, session.current_room.id, None, None))
+
+    def _attach(self, session: GameSession):
+        session.journal = self
+        self._live[session.id] = session
+
+    def record(self, session: GameSession, change: str, obj, attr: str = None):
+        """
+        Queues a change for the journal (called by GameSession.record)
+        """
+        value = None
+        if change == Change.UPDATE:
+            try:
+                value = _encode(session.overlay.get(obj, attr))
+            except TypeError as e:
+                log.warning("Not saving {}.{}: {}".format(obj.id, attr, e))
+                return
+
+        self._queue.put((session.id, change, obj.id, attr, value))
+
+    # WRITER THREAD
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name="amber-saving", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Writes everything that is queued, a final snapshot and stops the writer thread
+        """
+        if self._thread is None:
+            return
+
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        journal = open(self.journal_path, "a", encoding="utf-8")
+        written = 0
+        last_snapshot = time.monotonic()
+
+        try:
+            running = True
+            while running:
+                try:
+                    batch = [self._queue.get(timeout=1)]
+                except queue.Empty:
+                    batch = []
+
+                # Writes everything that piled up in one go
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                if _STOP in batch:
+                    running = False
+                    batch = batch[:batch.index(_STOP)]
+
+                if batch:
+                    written += self._write(journal, batch)
+
+                due = time.monotonic() - last_snapshot >= self.snapshot_interval
+                if written and (due or written >= self.compact_after or not running):
+                    journal = self._compact(journal)
+                    written = 0
+                    last_snapshot = time.monotonic()
+        except Exception:
+            log.exception("Saving failed")
+        finally:
+            journal.close()
+
+    def _write(self, journal, batch: list) -> int:
+        lines = []
+        now = time.time()
+        with self._lock:
+            for session_id, kind, obj_id, attr, value in batch:
+                self._seq += 1
+                entry = [self._seq, session_id, kind, obj_id, attr, value]
+
+                _apply(self._states, entry)
+                lines.append(dumps(entry))
+
+                state = self._states.get(session_id)
+                if state is not None:
+                    state["seen"] = now
+
+        journal.write("\n".join(lines) + "\n")
+        journal.flush()
+        return len(lines)
+
+    def _compact(self, journal):
+        """
+        Drops abandoned sessions, writes a snapshot of all saved states and empties the journal
+        :return: the new journal file
+        """
+        expired = time.time() - self.session_ttl
+        with self._lock:
+            for session_id in [a for a, state in self._states.items() if state["seen"] < expired]:
+                if session_id not in self._live:
+                    del self._states[session_id]
+
+        # Only this (the writer) thread changes the states, so they can be serialized without holding the lock
+        # (resume takes it on the event loop)
+        snapshot = dumps({"seq": self._seq, "sessions": self._states})
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(snapshot)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Entries up to the snapshot's seq are skipped on load, so a crash before this point is fine
+        journal.close()
+        log.debug("Wrote snapshot ({} KiB)".format(len(snapshot) // 1024))
+        return open(self.journal_path, "w", encoding="utf-8")
@@ -0,0 +1,285 @@
+# coding=utf-8
+import logging
+import uuid
+from typing import Union
+
+from . import presence
+from .types_ import Room, Item
+from .exceptions import IdMissing, AmberException
+from .utils import Change
+
+
+log = logging.getLogger(__name__)
+
+
+class Overlay:
+    __slots__ = (
+        "_changes", "_attr_counts", "revision"
+    )
+
+    def __init__(self):
+        """
+        Copy-on-write layer over the shared world. Only attributes a session changed are stored here,
+        everything else is read from the world objects.
+        """
+        # object id -> {attribute: value}
+        self._changes = {}
+        # attribute -> number of objects that changed it
+        self._attr_counts = {}
+        # Bumped on every change, part of the version tags of session-changed payloads
+        self.revision = 0
+
+    def get(self, obj, attr: str):
+        changes = self._changes.get(obj.id)
+        if changes is not None and attr in changes:
+            return changes[attr]
+
+        return getattr(obj, attr)
+
+    def set(self, obj, attr: str, value):
+        changes = self._changes.get(obj.id)
+        if changes is None:
+            changes = self._changes[obj.id] = {}
+
+        if attr not in changes:
+            self._attr_counts[attr] = self._attr_counts.get(attr, 0) + 1
+
+        changes[attr] = value
+        self.revision += 1
+
+    def has_changes(self, attr: str) -> bool:
+        """
+        Checks if any object has a change of this attribute
+        """
+        return attr in self._attr_counts
+
+    def is_changed(self, obj, attr: str = None) -> bool:
+        changes = self._changes.get(obj.id)
+        if changes is None:
+            return False
+
+        return attr is None or attr in changes
+
+    def revert(self, obj, attr: str = None):
+        """
+        Drops the session's changes (of one attribute or the whole object), going back to the shared state
+        """
+        changes = self._changes.get(obj.id)
+        if changes is None:
+            return
+
+        for a in (list(changes) if attr is None else [attr]):
+            if a not in changes:
+                continue
+
+            del changes[a]
+
+            self._attr_counts[a] -= 1
+            if not self._attr_counts[a]:
+                del self._attr_counts[a]
+
+        if not changes:
+            del self._changes[obj.id]
+
+        self.revision += 1
+
+    def changes_of(self, attr: str) -> dict:
+        """
+        Values of one attribute on every object that changed it
+        :return: dict(object id -> value)
+        """
+        if attr not in self._attr_counts:
+            return {}
+
+        return {obj_id: changes[attr] for obj_id, changes in self._changes.items() if attr in changes}
+
+    def changed_ids(self):
+        """
+        Ids of the objects this overlay changed
+        """
+        return self._changes.keys()
+
+    def __len__(self):
+        return sum(len(a) for a in self._changes.values())
+
+
+class GameSession:
+    __slots__ = (
+        "id", "amber", "current_room", "previous_room", "inventory", "inventory_version", "overlay", "journal", "connection", "_changes", "__weakref__"
+    )
+
+    def __init__(self, amber, session_id: str = None, track_changes: bool = False):
+        """
+        Holds the mutable state of one playthrough. The world (rooms, items, blueprints) is shared between sessions.
+        :param amber: Amber instance the session belongs to
+        :param session_id: Unique id of this session (OPTIONAL, generated if not provided)
+        :param track_changes: Record state changes so they can be pushed to the client (OPTIONAL, defaults to False)
+        """
+        if not amber.starting_room:
+            raise AmberException("no starting room")
+
+        self.id = session_id or uuid.uuid4().hex
+        self.amber = amber
+
+        self.current_room = amber.starting_room
+        self.previous_room = None
+
+        self.inventory = []
+        # Bumped whenever an item is added or removed
+        self.inventory_version = 0
+
+        # Changes this player made to rooms and items
+        self.overlay = Overlay()
+
+        # list(tuple(Change, object, attribute)), None when not tracking
+        self._changes = [] if track_changes else None
+        # SaveManager that saves this session's changes (see SaveManager.attach)
+        self.journal = None
+        # Connection (SocketHandler) that plays this session, the last one that opened or resumed it
+        self.connection = None
+
+        presence.sessions.add(self)
+
+    def walk_to(self, room: Union[Room, str]) -> tuple:
+        """
+        Moves the player to a different room. The room's enter event runs first, the player stays where they are
+        if it returns (False, message).
+        :param room: Room object or room id
+        :return: tuple(Action/bool, message) from the room's enter event
+        """
+        # Checks
+        if isinstance(room, str):
+            r_name = str(room)
+
+            room = presence.obj_collector.find_room_by_id(room)
+            if not room:
+                raise IdMissing("{} does not exist".format(r_name))
+
+        if not isinstance(room, Room):
+            raise TypeError("room: expected Room/str, got {}".format(type(room)))
+
+        resp = room.enter()
+        if isinstance(resp, tuple) and resp[0] is False:
+            return resp
+
+        # Main part
+        self.previous_room = self.current_room
+        self.current_room = room
+        self.record(Change.MOVE, room)
+
+        regions = presence.obj_collector.regions
+        if regions is not None:
+            regions.prefetch(room)
+
+        return resp
+
+    def path_to(self, room: Union[Room, str], heuristic=None) -> list:
+        """
+        Finds the shortest way from the current room to another one (as this player sees the world)
+        :param room: Room object or room id
+        :param heuristic: fn(room id, goal id) -> lower bound of the steps between the rooms (OPTIONAL, see WorldGraph)
+        :return: list(Room, ...) of rooms to walk through (ending with room) or None if there is no way there
+        """
+        path = self._path_ids(room, heuristic)
+        if path is None:
+            return None
+
+        return [Room.handle_id_or_object(a) for a in path[1:]]
+
+    def travel_to(self, room: Union[Room, str], heuristic=None) -> list:
+        """
+        Moves the player to a room that can be several steps away, along the shortest way.
+        Every step is a walk_to, so the enter events of the rooms on the way run. Travelling stops early
+        when a step's event returns anything other than a plain (True, message), or when the next room
+        can't be reached anymore (a handler changed the locations). A room that doesn't let the player in
+        is the last step, the player stays in the room before it.
+        :param room: Room object or room id
+        :param heuristic: see path_to (OPTIONAL)
+        :return: list(tuple(Room, response)) of the steps taken or None if there is no way there
+        """
+        path = self._path_ids(room, heuristic)
+        if path is None:
+            return None
+
+        steps = []
+        # Ids, the rooms of a region store can be paged out and in again on the way
+        for room_id in path[1:]:
+            if all(a.id != room_id for a in self.current_room.locations):
+                break
+
+            room = presence.obj_collector.find_room_by_id(room_id)
+            resp = self.walk_to(room)
+            steps.append((room, resp))
+
+            if isinstance(resp, tuple) and resp[0] is not True:
+                break
+
+        return steps
+
+    def _path_ids(self, room: Union[Room, str], heuristic) -> tuple:
+        room_id = Room.handle_id_or_object(room).id
+
+        # Locations this player changed
+        overrides = {a: [b if type(b) is str else b.id for b in locations]
+                     for a, locations in self.overlay.changes_of("_locations").items()}
+
+        return presence.obj_collector.graph.shortest_path(self.current_room.id, room_id, overrides, heuristic)
+
+    @property
+    def inventory_tag(self):
+        """
+        Version tag of the inventory payload (see Room.tag)
+        :return: tuple or None if getter handlers make an item uncacheable
+        """
+        if any(a.version is None for a in self.inventory):
+            return None
+
+        return self.inventory_version, self.overlay.revision, presence.get_revision()
+
+    def combine(self, *items: Union[str, Item]):
+        """
+        Combines two (or more) items together, see Amber.combine
+        """
+        return self.amber.combine(*items)
+
+    # CHANGE TRACKING
+    def record(self, change: str, obj, attr: str = None):
+        """
+        Records a state change for the client (if the session tracks changes) and the save journal
+        :param change: Change kind
+        :param obj: Room/Item that changed
+        :param attr: changed attribute (Change.UPDATE only)
+        """
+        if self._changes is not None:
+            self._changes.append((change, obj, attr))
+
+        if self.journal is not None:
+            self.journal.record(self, change, obj, attr)
+
+    def take_changes(self) -> list:
+        """
+        Returns the changes recorded since the last call and starts a new list
+        :return: list(tuple(Change, object, attribute))
+        """
+        if not self._changes:
+            return []
+
+        changes, self._changes = self._changes, []
+        return changes
+
+    # INTERNAL METHODS
+    def _add_to_inventory(self, item: Union[Item, str]):
+        item = Item.handle_id_or_object(item)
+
+        if item not in self.inventory:
+            self.inventory.append(item)
+            self.inventory_version += 1
+            self.record(Change.INVENTORY_ADD, item)
+
+    def _remove_from_inventory(self, item: Union[Item, str]):
+        item = Item.handle_id_or_object(item)
+
+        if item in self.inventory:
+            self.inventory.remove(item)
+            self.inventory_version += 1
+            self.record(Change.INVENTORY_REMOVE, item)
@@ -0,0 +1,119 @@
+# coding=utf-8
+import random
+
+from amber.engine.graph import WorldGraph
+
+
+class _Collector:
+    # The whole world is indexed (no region store)
+    regions = None
+
+
+class _Room:
+    def __init__(self, room_id, locations):
+        self.id = room_id
+        self._locations = locations
+
+
+def _graph(edges: dict) -> WorldGraph:
+    graph = WorldGraph(_Collector())
+    for room_id, locations in edges.items():
+        graph.add_room(_Room(room_id, list(locations)))
+
+    return graph
+
+
+def _random_edges(rooms: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    return {"r{}".format(a): ["r{}".format(rnd.randrange(rooms)) for _ in range(rnd.randint(0, 3))]
+            for a in range(rooms)}
+
+
+def _is_path(edges: dict, path: tuple) -> bool:
+    return all(b in edges[a] for a, b in zip(path, path[1:]))
+
+
+def test_bidirectional_finds_shortest_paths():
+    edges = _random_edges(300, seed=1)
+    graph = _graph(edges)
+    rnd = random.Random(2)
+
+    for _ in range(300):
+        start, goal = ("r{}".format(a) for a in rnd.sample(range(300), 2))
+
+        path = graph.shortest_path(start, goal)
+        expected = graph._bfs(start, goal, graph.locations)
+
+        if expected is None:
+            assert path is None
+        else:
+            assert len(path) == len(expected)
+            assert path[0] == start and path[-1] == goal
+            assert _is_path(edges, path)
+
+
+def test_unknown_rooms_have_no_path():
+    graph = _graph({"a": ["b"], "b": []})
+
+    assert graph.shortest_path("a", "nope") is None
+    assert graph.shortest_path("nope", "a") is None
+    assert graph.shortest_path("b", "a") is None
+    assert graph.shortest_path("a", "a") == ("a", )
+
+
+def test_reverse_locations_are_kept_in_sync():
+    graph = _graph({"a": ["b"], "b": ["c"], "c": []})
+
+    graph.add_location("a", "c")
+    assert sorted(graph._reverse["c"]) == ["a", "b"]
+
+    graph.remove_location("a", "c")
+    graph.set_locations("b", [])
+    # Rooms nothing leads to anymore are not left with empty lists
+    assert "c" not in graph._reverse
+    assert graph._reverse == {"b": ["a"]}
+
+    assert graph.shortest_path("a", "c") is None
+
+
+def test_paths_are_cached_until_the_world_changes():
+    graph = _graph({"a": ["b"], "b": ["c"], "c": ["d"], "d": []})
+
+    assert graph.shortest_path("a", "d") == ("a", "b", "c", "d")
+    assert graph.shortest_path("a", "d") == ("a", "b", "c", "d")
+    assert graph.hits == 1
+
+    graph.add_location("a", "d")
+    assert graph.shortest_path("a", "d") == ("a", "d")
+
+
+def test_overrides_are_followed_and_not_cached():
+    graph = _graph({"a": ["b"], "b": ["c"], "c": []})
+
+    assert graph.shortest_path("a", "c", overrides={"a": ["c"]}) == ("a", "c")
+    assert graph.shortest_path("a", "c", overrides={"b": []}) is None
+    assert not graph._paths
+
+    assert graph.shortest_path("a", "c") == ("a", "b", "c")
+
+
+def test_astar_finds_shortest_paths_on_a_grid():
+    size = 12
+
+    def room(x, y):
+        return "{}_{}".format(x, y)
+
+    edges = {}
+    for x in range(size):
+        for y in range(size):
+            edges[room(x, y)] = [room(x + dx, y + dy) for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                                 if 0 <= x + dx < size and 0 <= y + dy < size]
+    graph = _graph(edges)
+
+    def manhattan(room_id, goal_id):
+        (x1, y1), (x2, y2) = map(int, room_id.split("_")), map(int, goal_id.split("_"))
+        return abs(x1 - x2) + abs(y1 - y2)
+
+    path = graph.shortest_path(room(0, 0), room(size - 1, 5), heuristic=manhattan)
+    assert len(path) == size - 1 + 5 + 1
+    assert _is_path(edges, path)
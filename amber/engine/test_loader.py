@@ -0,0 +1,101 @@
+# coding=utf-8
+import gzip
+import json
+
+import pytest
+
+from amber import Amber, Room, Item, Blueprint, WorldFileError
+from amber.engine import presence
+from amber.engine.resolution import ResolutionError
+
+
+RECORDS = [
+    {"type": "item", "name": "Key"},
+    {"type": "item", "name": "Box"},
+    {"type": "item", "name": "Open box", "id": "open_box"},
+    {"type": "room", "name": "Hall", "description": "A {item|Key}, a {item|Box} and the {room|yard}", "starting": True},
+    {"type": "room", "id": "yard", "name": "Yard", "description": "Grass", "locations": ["Hall"]},
+    {"type": "blueprint", "ingredients": ["Key", "Box"], "result": "open_box"},
+]
+
+
+def _write(path, records: list, lines: list = ()):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(str(path), "wt", encoding="utf-8") as file:
+        file.write("\n".join([*lines, *map(json.dumps, records)]))
+
+    return str(path)
+
+
+def _state() -> tuple:
+    collector = presence.obj_collector
+    return set(presence.ids), len(collector.rooms), len(collector.items), len(collector.blueprints)
+
+
+def test_world_file_is_loaded(tmp_path):
+    amber = Amber("Test")
+    path = _write(tmp_path / "world.jsonl.gz", RECORDS, ["// comment", ""])
+
+    counts = amber.load_world(path)
+    assert (counts["item"], counts["room"], counts["blueprint"]) == (3, 2, 1)
+
+    hall = presence.obj_collector.find_room_by_id("Hall")
+    assert amber.starting_room is hall
+    assert hall.description.render()
+    assert [a.id for a in hall.description.items] == ["Key", "Box"]
+    assert presence.obj_collector.find_room_by_id("yard").locations == [hall]
+
+
+def test_blueprint_ids_match_the_constructor(tmp_path):
+    amber = Amber("Test")
+    amber.load_world(_write(tmp_path / "world.jsonl", RECORDS))
+    loaded = [a.id for a in presence.obj_collector.blueprints]
+
+    collector = presence.obj_collector
+    bp = Blueprint(collector.find_item_by_id("Key"), collector.find_item_by_id("Box"), Item("Lid"))
+
+    assert loaded == ["Key-Box"]
+    # Same name, so the constructor gets the next free id
+    assert bp.id == "Key-Box1"
+
+
+def test_missing_references_roll_back(tmp_path):
+    amber = Amber("Test")
+    Room("Start", "s", room_id="start")
+    old = Item("Old", item_id="old")
+    before = _state()
+
+    records = [dict(a) for a in RECORDS]
+    records[3]["description"] += " and an {item|old}"
+    records[4]["locations"] = ["nope"]
+    path = _write(tmp_path / "world.jsonl", records)
+
+    with pytest.raises(ResolutionError):
+        amber.load_world(path)
+
+    assert _state() == before
+    assert not amber.resolver.waiting
+    assert not old._watchers
+
+    # Fixed and loaded again, with the same ids
+    records[4]["locations"] = ["start"]
+    amber.load_world(_write(tmp_path / "world.jsonl", records))
+    descriptions = [presence.obj_collector.find_room_by_id(a).description.id for a in ("Hall", "yard")]
+    assert sorted(presence.ids - before[0]) == sorted(["Key", "Box", "open_box", "Hall", "yard", "Key-Box", *descriptions])
+
+
+def test_malformed_records_roll_back(tmp_path):
+    amber = Amber("Test")
+    before = _state()
+
+    path = _write(tmp_path / "world.jsonl", RECORDS[:4], ['{"type": "room", "name": '])
+    with pytest.raises(WorldFileError) as e:
+        amber.load_world(path)
+    assert "world.jsonl:1" in str(e.value)
+    assert _state() == before
+
+    path = _write(tmp_path / "world.jsonl", [*RECORDS[:4], {"type": "room", "id": "Hall", "name": "Again"}])
+    with pytest.raises(WorldFileError) as e:
+        amber.load_world(path)
+    assert "already exists" in str(e.value)
+    assert _state() == before
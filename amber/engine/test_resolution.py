@@ -0,0 +1,64 @@
+# coding=utf-8
+import pytest
+
+from amber import Amber, Room, Item, Blueprint
+from amber.engine import presence
+from amber.engine.resolution import ResolutionError
+
+
+def test_rooms_linked_from_descriptions_are_reachable():
+    amber = Amber("Test")
+    Room("Hall", "A door to the {room|cellar}", room_id="hall", starting_room=True)
+    Room("Cellar", "Dark", room_id="cellar", locations=["vault"])
+    Room("Vault", "Gold", room_id="vault")
+    Room("Attic", "Dust", room_id="attic")
+
+    report = amber.resolve_world()
+    assert report.checked
+    assert report.unreachable == ["attic"]
+
+
+def test_items_are_found_and_crafted():
+    amber = Amber("Test")
+    Room("Hall", "A {item|key} and a {item|box}", room_id="hall", starting_room=True)
+    Room("Attic", "A {item|map}", room_id="attic")
+    key, box, chest = Item("Key", item_id="key"), Item("Box", item_id="box"), Item("Chest", item_id="chest")
+    game_map, gem = Item("Map", item_id="map"), Item("Gem", item_id="gem")
+    Item("Rock", item_id="rock")
+    Blueprint(key, box, chest, recipe_id="key_box")
+    Blueprint(game_map, chest, gem, recipe_id="map_chest")
+
+    report = amber.resolve_world()
+    assert report.orphan_items == ["rock"]
+    # The map is only in a room that can't be reached
+    assert report.uncraftable == ["map_chest"]
+
+
+def test_every_missing_reference_is_reported():
+    amber = Amber("Test")
+    Room("Hall", "A {item|key} and the {room|yard}", room_id="hall", locations=["garden"], starting_room=True)
+
+    with pytest.raises(ResolutionError) as e:
+        amber.resolve_world()
+
+    assert sorted(a[2] for a in e.value.report.missing) == ["garden", "key", "yard"]
+    assert sorted(amber.resolver.waiting) == ["garden", "key", "yard"]
+
+
+def test_rooms_wait_for_ids_created_later():
+    amber = Amber("Test")
+    hall = Room("Hall", "h", room_id="hall", starting_room=True)
+    amber.resolve_world()
+
+    # Resolved as it is created, the garden doesn't exist yet
+    yard = Room("Yard", "Towards the {room|garden}", room_id="yard", locations=["garden"])
+    assert amber.resolver.waiting == ["garden"]
+    assert yard._locations == ["garden"]
+
+    garden = Room("Garden", "g", room_id="garden")
+    assert amber.resolver.waiting == []
+    assert yard._locations == [garden]
+    assert list(yard.description.rooms) == [garden]
+
+    hall.add_location(yard)
+    assert presence.obj_collector.graph.shortest_path("hall", "garden") == ("hall", "yard", "garden")
@@ -0,0 +1,135 @@
+# coding=utf-8
+import os
+import queue
+import time
+
+import pytest
+
+from amber import Amber, Room, Item
+from amber.engine import presence
+from amber.engine.saving import SaveManager
+from amber.engine.session import GameSession
+
+
+@pytest.fixture
+def amber():
+    amber = Amber("Test")
+    hall = Room("Hall", "h", room_id="hall", starting_room=True)
+    yard = Room("Yard", "y", room_id="yard", locations=["hall"])
+    hall.add_location(yard)
+    Item("Key", item_id="key")
+    amber.resolve_world()
+
+    return amber
+
+
+def _crash(manager: SaveManager):
+    # Writes what is queued to the journal but never gets to the snapshot
+    batch = []
+    while True:
+        try:
+            batch.append(manager._queue.get_nowait())
+        except queue.Empty:
+            break
+
+    with open(manager.journal_path, "a", encoding="utf-8") as journal:
+        manager._write(journal, batch)
+
+
+def _play(amber, manager: SaveManager) -> GameSession:
+    session = GameSession(amber)
+    manager.attach(session)
+
+    token = presence.set_session(session)
+    try:
+        session.walk_to("yard")
+        session._add_to_inventory("key")
+        session.current_room.name = "Backyard"
+    finally:
+        presence.reset_session(token)
+
+    return session
+
+
+def _assert_restored(session: GameSession):
+    assert session.current_room.id == "yard"
+    assert session.previous_room.id == "hall"
+    assert [a.id for a in session.inventory] == ["key"]
+    assert session.overlay.get(session.current_room, "_name") == "Backyard"
+    # Only in the session
+    assert session.current_room._name == "Yard"
+
+
+def test_journal_is_replayed_after_a_crash(amber, tmp_path):
+    manager = SaveManager(str(tmp_path))
+    session_id = _play(amber, manager).id
+    _crash(manager)
+
+    assert not os.path.isfile(manager.snapshot_path)
+
+    restored = SaveManager(str(tmp_path)).resume(amber, session_id)
+    _assert_restored(restored)
+
+
+def test_snapshot_is_written_on_stop(amber, tmp_path):
+    manager = SaveManager(str(tmp_path))
+    manager.start()
+    session_id = _play(amber, manager).id
+    manager.stop()
+
+    assert os.path.isfile(manager.snapshot_path)
+    assert os.path.getsize(manager.journal_path) == 0
+
+    restored = SaveManager(str(tmp_path)).resume(amber, session_id)
+    _assert_restored(restored)
+
+
+def test_incomplete_last_entry_is_dropped(amber, tmp_path):
+    manager = SaveManager(str(tmp_path))
+    session_id = _play(amber, manager).id
+    _crash(manager)
+
+    size = os.path.getsize(manager.journal_path)
+    with open(manager.journal_path, "a", encoding="utf-8") as journal:
+        journal.write('[99, "{}", "move", "ha'.format(session_id))
+
+    manager = SaveManager(str(tmp_path))
+    # Truncated, so the next entry doesn't end up on the same line
+    assert os.path.getsize(manager.journal_path) == size
+
+    session = manager.resume(amber, session_id)
+    _assert_restored(session)
+
+    token = presence.set_session(session)
+    session.walk_to("hall")
+    presence.reset_session(token)
+    _crash(manager)
+
+    manager = SaveManager(str(tmp_path))
+    assert manager.resume(amber, session_id).current_room.id == "hall"
+
+
+def test_resume_returns_the_session_in_memory(amber, tmp_path):
+    manager = SaveManager(str(tmp_path))
+    session = _play(amber, manager)
+
+    assert manager.resume(amber, session.id) is session
+    assert manager.resume(amber, "nope") is None
+
+
+def test_abandoned_sessions_are_dropped(amber, tmp_path):
+    manager = SaveManager(str(tmp_path), session_ttl=60)
+    old_id = _play(amber, manager).id
+    _crash(manager)
+
+    # Not in memory anymore and last seen long ago
+    manager._live.clear()
+    manager._states[old_id]["seen"] = time.time() - 3600
+
+    manager.start()
+    new_id = _play(amber, manager).id
+    manager.stop()
+
+    manager = SaveManager(str(tmp_path))
+    assert manager.resume(amber, old_id) is None
+    assert manager.resume(amber, new_id) is not None
@@ -0,0 +1,141 @@
+# coding=utf-8
+import pytest
+
+from amber import Amber, Room
+from amber.engine import presence
+from amber.engine.session import GameSession, Overlay
+
+
+class _Obj:
+    def __init__(self, obj_id, **attrs):
+        self.id = obj_id
+        self.__dict__.update(attrs)
+
+
+@pytest.fixture
+def rooms():
+    amber = Amber("Test")
+    hall = Room("Hall", "h", room_id="hall", starting_room=True)
+    yard = Room("Yard", "y", room_id="yard", locations=["hall"])
+    gate = Room("Gate", "g", room_id="gate", locations=["yard"])
+    road = Room("Road", "r", room_id="road", locations=["gate"])
+    hall.add_location(yard)
+    yard.add_location(gate)
+    gate.add_location(road)
+    amber.resolve_world()
+
+    return amber, hall, yard, gate, road
+
+
+@pytest.fixture
+def session(rooms):
+    session = GameSession(rooms[0])
+    token = presence.set_session(session)
+    yield session
+    presence.reset_session(token)
+
+
+# OVERLAY
+
+def test_overlay_reads_through_to_the_object():
+    overlay = Overlay()
+    obj = _Obj("a", name="shared")
+
+    assert overlay.get(obj, "name") == "shared"
+
+    overlay.set(obj, "name", "mine")
+    assert overlay.get(obj, "name") == "mine"
+    assert obj.name == "shared"
+    assert overlay.is_changed(obj) and overlay.is_changed(obj, "name")
+    assert not overlay.is_changed(obj, "image")
+
+
+def test_overlay_revert_of_one_attribute():
+    overlay = Overlay()
+    a, b = _Obj("a", name="a", image=None), _Obj("b", name="b")
+
+    overlay.set(a, "name", "x")
+    overlay.set(a, "image", "x.png")
+    overlay.set(b, "name", "y")
+    revision = overlay.revision
+
+    overlay.revert(a, "name")
+    assert overlay.get(a, "name") == "a"
+    assert overlay.get(a, "image") == "x.png"
+    # b still changes the name
+    assert overlay.has_changes("name")
+    assert overlay.changes_of("name") == {"b": "y"}
+    assert overlay.revision > revision
+
+    overlay.revert(b, "name")
+    assert not overlay.has_changes("name")
+    assert overlay.changes_of("name") == {}
+    assert list(overlay.changed_ids()) == ["a"]
+
+
+def test_overlay_revert_of_a_whole_object():
+    overlay = Overlay()
+    a = _Obj("a", name="a", image=None)
+
+    overlay.set(a, "name", "x")
+    overlay.set(a, "name", "z")
+    overlay.set(a, "image", "x.png")
+    assert len(overlay) == 2
+
+    overlay.revert(a)
+    assert len(overlay) == 0
+    assert not overlay.has_changes("name") and not overlay.has_changes("image")
+    assert not overlay.is_changed(a)
+
+    # Reverting what isn't changed does nothing
+    overlay.revert(a)
+    overlay.revert(a, "name")
+    assert len(overlay) == 0
+
+
+# MOVING
+
+def test_session_changes_stay_in_the_session(rooms, session):
+    amber, hall, yard, gate, road = rooms
+
+    hall.add_location(road)
+    assert road in hall.locations
+    assert session.path_to(road) == [road]
+
+    # Other sessions (and the graph) still see the shared world
+    presence.set_session(None)
+    assert road not in hall.locations
+    assert presence.obj_collector.graph.shortest_path("hall", "road") == ("hall", "yard", "gate", "road")
+
+
+def test_walk_to_a_room_that_denies_entry(rooms, session):
+    amber, hall, yard, gate, road = rooms
+
+    @yard.event(Room.Event.ENTER)
+    def deny():
+        return False, "locked"
+
+    assert session.walk_to(yard) == (False, "locked")
+    assert session.current_room is hall
+    assert session.previous_room is None
+
+
+def test_travel_to_stops_at_a_room_that_denies_entry(rooms, session):
+    amber, hall, yard, gate, road = rooms
+
+    @gate.event(Room.Event.ENTER)
+    def deny():
+        return False, "closed"
+
+    steps = session.travel_to(road)
+    assert [a[0] for a in steps] == [yard, gate]
+    assert steps[-1][1] == (False, "closed")
+    assert session.current_room is yard
+
+
+def test_travel_to_an_unreachable_room(rooms, session):
+    amber, hall, yard, gate, road = rooms
+
+    hall.remove_location(yard)
+    assert session.travel_to(road) is None
+    assert session.current_room is hall
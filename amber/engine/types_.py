@@ -5,8 +5,8 @@ from typing import Union
 
 from . import presence
 from .exceptions import IdMissing, AmberException
-from .events import EventManager
-from .utils import get_attribute_values
+from .events import EventManager, get_event_schema
+from .utils import ObjectType, Change
 
 log = logging.getLogger(__name__)
 
@@ -18,26 +18,89 @@ def _get_amber():
     return presence.world["amber"]
 
 
+def _get_state(obj, attr: str):
+    """
+    Internal, reads a mutable attribute through the active session's overlay (falls back to the shared world)
+    """
+    session = presence.get_session()
+    if session is None:
+        return getattr(obj, attr)
+
+    return session.overlay.get(obj, attr)
+
+
+def _set_state(obj, attr: str, value):
+    """
+    Internal, writes a mutable attribute into the active session's overlay.
+    Outside of a session (while building the world), the shared object is changed instead.
+    """
+    session = presence.get_session()
+    if session is None:
+        setattr(obj, attr, value)
+        _notify_watchers(obj)
+    else:
+        session.overlay.set(obj, attr, value)
+        session.record(Change.UPDATE, obj, attr)
+
+
+def _notify_watchers(obj):
+    """
+    Internal, bumps the object's version and invalidates cached Description renders that link to it
+    """
+    obj._version += 1
+    presence.bump_revision()
+
+    for desc in obj._watchers:
+        desc._invalidate()
+
+
+def _is_shared(objects, attrs: tuple = None) -> bool:
+    """
+    Internal, checks that the active session did not change these objects (so their shared state/caches apply)
+    :param objects: iterable of Rooms/Items
+    :param attrs: only consider these attributes (OPTIONAL)
+    """
+    session = presence.get_session()
+    if session is None:
+        return True
+
+    overlay = session.overlay
+    if attrs is None:
+        return not any(overlay.is_changed(a) for a in objects)
+
+    # Usually the session changed none of these attributes on any object
+    attrs = [a for a in attrs if overlay.has_changes(a)]
+    if not attrs:
+        return True
+
+    return not any(overlay.is_changed(a, attr) for a in objects for attr in attrs)
+
+
+def _tag(version, shared: bool, *extra):
+    """
+    Internal, version tag of a payload as the active session sees it
+    :param version: version tuple of the shared payload (or None if it can't be cached)
+    :param shared: False if the active session changed the payload
+    :param extra: additional per-session state that is part of the payload
+    :return: tuple or None
+    """
+    if version is None:
+        return None
+
+    if not shared:
+        # The overlay revision changes with every change the session makes
+        version = version + ("s", presence.get_session().overlay.revision)
+
+    return version + extra
+
+
 def _generate_id(preferred: str):
     """
     Internal use, generates an id based on item's name. If preferred id is not available, adds numbers to the end. (item1, item2, ...)
     :param preferred: The id you prefer is generated
     :return: Generated ID (unique to all types)
     """
-    if not presence.id_exists(preferred):
-        presence.add_id(preferred)
-        return preferred
-    else:
-        # Loops until a non-used number is found
-        c = 1
-        while presence.id_exists(preferred) and preferred is not None:
-            buff = "{}{}".format(preferred, c)
-            preferred = str(buff)
-
-            c += 1
-
-        presence.add_id(preferred)
-        return preferred
+    return presence.generate_id(preferred)
 
 
 def _get_item_postponed(item_id):
@@ -64,63 +127,249 @@ def _get_room_postponed(room_id):
 desc_regex = re.compile(r"({\w+\|\w+})", re.MULTILINE)
 
 
+# Shared by all objects that have nothing in a collection
+_EMPTY = ()
+
+# Attributes of linked rooms/items that show up in a rendered Description
+_LINK_ATTRS = ("_name", "_desc")
+_LINK_EVENTS = ("name", "description")
+
+# Attributes and getter events that make up a Room/Item payload (the message is per-session)
+_ROOM_PAYLOAD_ATTRS = ("_name", "_description", "_image", "_sound")
+_ROOM_PAYLOAD_EVENTS = ("name", "description", "image", "sound")
+_ITEM_PAYLOAD_EVENTS = ("name", "description")
+
+
 class Description:
+    __slots__ = (
+        "text", "segments", "rooms", "items", "id", "_rendered", "_version", "_dynamic", "_pending"
+    )
+
     def __init__(self, string: Union[str, list], desc_id=None):
         """
         Creates and parses a text with dynamic links to items/rooms
         :param string: Text to parse
         """
         # TODO implement removing sentences after usage
-        self.text = str(string)
-        self._groups = []
-
-        self.rooms = []
-        self.items = []
-
-        self._q_rooms = []
-        self._q_items = []
-
-        self._parse_string()
+        self._setup(str(string))
 
         self.id = None
         if not desc_id:
-            self.id = _generate_id("description")
+            # Most descriptions have no id: generate_id's chain (description, description1, description12, ...) gets longer
+            # with each one, which makes building N descriptions quadratic. They are numbered instead (description,
+            # description1, description2, ...). From the third one on, the ids differ from older versions (see changes.txt).
+            self.id = presence.generate_numbered_id("description")
         elif presence.id_exists(desc_id):
             raise RuntimeError("object with id '{}' already exists".format(desc_id))
         else:
             self.id = _generate_id(desc_id)
 
+    @classmethod
+    def _from_record(cls, text: str, desc_id: str):
+        """
+        Internal, creates a description whose id is not registered (descriptions of paged rooms, see regions.py)
+        """
+        desc = cls.__new__(cls)
+        desc._setup(str(text))
+        desc.id = desc_id
+
+        return desc
+
+    def _setup(self, text: str):
+        # Everything but the id, shared by __init__ and _from_record
+        self.text = text
+
+        # Compiled template: literal text and (type, id/object) references, in order
+        self.segments = _EMPTY
+
+        self.rooms = _EMPTY
+        self.items = _EMPTY
+
+        # Cached result of render(), _version is bumped whenever it is invalidated
+        self._rendered = None
+        self._version = 0
+        # Cached value of dynamic, None when unknown
+        self._dynamic = None
+        # True while links are still ids (they are resolved on first use if _finalize_loading wasn't called)
+        self._pending = False
+
+        self._parse_string()
+
     def _parse_string(self):
-        self._groups = list(desc_regex.findall(self.text))
+        segments = []
+
+        # desc_regex has one group, so split alternates between text and {type|id} groups
+        for c, part in enumerate(desc_regex.split(self.text)):
+            if not c % 2:
+                if part:
+                    segments.append(part)
+                continue
 
-        for group in self._groups:
-            type_, obj_id = group.lstrip("{").rstrip("}").split("|")
+            type_, obj_id = part[1:-1].split("|")
 
-            if type_ == "room":
-                self._q_rooms.append(obj_id)
-            elif type_ == "item":
-                self._q_items.append(obj_id)
-            else:
+            if type_ not in (ObjectType.ROOM, ObjectType.ITEM):
                 log.warning("{} is not a valid type, ignoring".format(type_))
+                segments.append(part)
                 continue
 
-    def _finalize_loading(self):
+            segments.append((type_, obj_id))
+            self._pending = True
+
+        self.segments = tuple(segments)
+
+    def _finalize_loading(self, missing: list = None):
         """
         Internal, should be called when all stuff is loaded
         Goes though all rooms and items and converts string references to actual objects, if necessary
+        :param missing: collects (type, id) of links to objects that don't exist instead of raising IdMissing (OPTIONAL),
+                        those links stay ids
+        """
+        segments = []
+        rooms, items = [], []
+        pending = False
+
+        for segment in self.segments:
+            if isinstance(segment, tuple) and isinstance(segment[1], str):
+                type_, obj_id = segment
+
+                if type_ == ObjectType.ROOM:
+                    obj = presence.obj_collector.find_room_by_id(obj_id)
+                else:
+                    obj = presence.obj_collector.find_item_by_id(obj_id)
+
+                if obj is None:
+                    if missing is None:
+                        raise IdMissing("{} {} does not exist".format(type_, obj_id))
+
+                    missing.append(segment)
+                    segments.append(segment)
+                    pending = True
+                    continue
+
+                (rooms if type_ == ObjectType.ROOM else items).append(obj)
+
+                # Linked objects tell this description when the rendered payload goes stale
+                if obj._watchers is _EMPTY:
+                    obj._watchers = []
+                obj._watchers.append(self)
+
+                segment = (type_, obj)
+
+            segments.append(segment)
+
+        self.segments = tuple(segments)
+        if rooms:
+            self.rooms = self.rooms + tuple(rooms)
+        if items:
+            self.items = self.items + tuple(items)
+
+        self._pending = pending
+        self._invalidate()
+
+    def _unresolve(self):
+        """
+        Internal, turns linked objects back into ids (when a region they belong to is paged out, see regions.py)
+        """
+        for obj in self.rooms + self.items:
+            if self in obj._watchers:
+                obj._watchers.remove(self)
+
+        self.segments = tuple((a[0], a[1].id) if isinstance(a, tuple) and not isinstance(a[1], str) else a
+                              for a in self.segments)
+        self.rooms = _EMPTY
+        self.items = _EMPTY
+
+        self._pending = True
+        self._invalidate()
+
+    def _invalidate(self):
+        self._rendered = None
+        self._dynamic = None
+        self._version += 1
+
+    @property
+    def dynamic(self) -> bool:
+        """
+        True if a linked room/item has name/description getter handlers (so the rendered payload may differ on every call)
+        """
+        if self._pending:
+            self._finalize_loading()
+
+        # Registering a handler on a linked object invalidates this
+        if self._dynamic is None:
+            self._dynamic = any(
+                a._event_mgr.active and any(a._event_mgr.event_exists(e) for e in _LINK_EVENTS)
+                for a in self.rooms + self.items
+            )
+
+        return self._dynamic
+
+    @property
+    def version(self):
+        """
+        Version of the rendered payload, changes whenever a linked object changes
+        :return: int or None if the payload can't be cached
         """
-        for q_room in self._q_rooms:
-            room = Room.handle_id_or_object(q_room)
-            self.rooms.append(room)
+        if self.dynamic:
+            return None
 
-        for q_item in self._q_items:
-            item = Item.handle_id_or_object(q_item)
-            self.items.append(item)
+        return self._version
+
+    def is_shared(self) -> bool:
+        """
+        False if the active session changed a linked room/item (and the shared payload doesn't apply)
+        """
+        if self._pending:
+            self._finalize_loading()
+
+        return _is_shared(self.rooms + self.items, _LINK_ATTRS)
+
+    @property
+    def tag(self):
+        """
+        Version tag of the rendered payload as the active session sees it
+        :return: tuple or None if the payload can't be cached
+        """
+        version = self.version
+        return _tag(None if version is None else (version, ), self.is_shared())
+
+    def render(self) -> dict:
+        """
+        Returns the description with its linked rooms and items resolved.
+        The result is cached until a linked object changes its name/description or gets a getter handler.
+        :return: dict(text, rooms, items, id)
+        """
+        if self._pending:
+            self._finalize_loading()
+
+        if self._rendered is not None and self.is_shared():
+            return self._rendered
+
+        rendered = {
+            "text": self.text,
+            "rooms": {a.id: {"name": a.name, "id": a.id} for a in self.rooms},
+            "items": {a.id: {"name": a.name, "description": a.description, "id": a.id} for a in self.items},
+            "id": self.id,
+        }
+
+        # Handlers can return something else on every call
+        if not self.dynamic and self.is_shared():
+            self._rendered = rendered
+
+        return rendered
+
+    def __str__(self):
+        return self.text
 
 # TODO music
 
 
 class Room:
+    __slots__ = (
+        "_name", "_description", "_message", "_locations", "_image", "_sound", "id", "_entered", "_event_mgr",
+        "_watchers", "_version"
+    )
+
     class Event:
         # Events
         ENTER = "enter"
@@ -138,7 +387,7 @@ class Room:
         """
         Creates a room that the player "can" step in
         :param name: Name of the room, displayed at the top
-        :param description: Room description (see Descriptions)
+        :param description: Room description (see Descriptions), text or a Description object
         :param initial_msg: The message that is displayed when the player enters the room for the first time (see Top Messages)
         :param locations: a list of Room's that can be accessed from this room
         :param image: Path to the image that should be displayed in this room
@@ -146,38 +395,28 @@ class Room:
         :param room_id: Item id that you assign (OPTIONAL). Defaults to the name if available, otherwise numbers (room_name1, room_name2, ...) are added
         :param starting_room: bool indicating if this room should be the starting one
         """
-        self._name = name
-        self._description = Description(description)
-        self._message = initial_msg
+        description = description if isinstance(description, Description) else Description(description)
 
-        self._locations = []
+        checked = _EMPTY
         if locations:
+            checked = []
             for loc in locations:
                 # Location can be either a Room object or an id
                 if isinstance(loc, (Room, str)):
-                    self._locations.append(loc)
+                    checked.append(loc)
                 else:
                     raise TypeError("expected Room/str, got {}".format(type(loc)))
 
-        self._image = image
-        self._sound = sound
-
         # Generates / uses an id
         # Tries the name. If taken, adds numbers at the end
-        self.id = None
         if not room_id:
-            self.id = _generate_id(self._name)
+            room_id = _generate_id(name)
         elif presence.id_exists(room_id):
             raise RuntimeError("object with id '{}' already exists".format(room_id))
         else:
-            self.id = _generate_id(room_id)
+            room_id = _generate_id(room_id)
 
-        # Internal vars
-        self._entered = False
-
-        # Used for events
-        events = get_attribute_values(Room.Event)
-        self._event_mgr = EventManager(self._name, events)
+        self._setup(name, description, initial_msg, checked, image, sound, room_id)
 
         if starting_room:
             if not presence.is_in_world("amber"):
@@ -188,88 +427,190 @@ class Room:
         # Add item to cache
         presence.obj_collector.add_room(self)
 
+        # Rooms created after the world was resolved are resolved right away
+        amber = presence.world.get("amber")
+        if amber is not None and amber.resolver.active:
+            amber.resolver.added(self)
+
+    @classmethod
+    def _from_record(cls, record: dict, room_id: str, description):
+        """
+        Internal, creates a room from a world data record (see loader.py) without registering it.
+        Locations stay ids until the world is resolved.
+        :param record: room record
+        :param room_id: id (already claimed)
+        :param description: Description or the id of one
+        """
+        room = cls.__new__(cls)
+        room._setup(record["name"], description, record.get("message"),
+                    list(record["locations"]) if record.get("locations") else _EMPTY,
+                    record.get("image"), record.get("sound"), room_id)
+
+        return room
+
+    def _setup(self, name: str, description, message, locations, image, sound, room_id: str):
+        # Every attribute, shared by __init__ and _from_record
+        self._name = name
+        self._description = description
+        self._message = message
+        self._locations = locations
+        self._image = image
+        self._sound = sound
+        self.id = room_id
+
+        # Internal vars
+        self._entered = False
+        # Descriptions that link to this room
+        self._watchers = _EMPTY
+        # Bumped on every change to the shared state
+        self._version = 0
+
+        # Used for events
+        events = get_event_schema(Room.Event)
+        self._event_mgr = EventManager(self._name, events)
+
     # PROPERTIES
     @property
     def name(self) -> str:
-        res = self._event_mgr.dispatch_event("name", self._name)
-        if res:
-            return res
-        else:
-            return self._name
+        name = _get_state(self, "_name")
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("name", name)
+            if res:
+                return res
+
+        return name
 
     @name.setter
     def name(self, value):
-        self._name = value
+        _set_state(self, "_name", value)
 
     @property
     def description(self) -> Union[str, Description]:
-        res = self._event_mgr.dispatch_event("description", self._description)
-        if res:
-            return res
-        else:
-            return self._description
+        description = _get_state(self, "_description")
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("description", description)
+            if res:
+                return res
+
+        return description
 
     @description.setter
     def description(self, value):
-        self._description = value
+        _set_state(self, "_description", value)
 
     @property
     def message(self) -> str:
-        res = self._event_mgr.dispatch_event("message", self._message)
-        if res is not None:
-            return res
+        message = _get_state(self, "_message")
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("message", message)
+            if res is not None:
+                return res
+
+        if _get_state(self, "_entered"):
+            return ""
         else:
-            if self._entered:
-                return ""
-            else:
-                self._entered = True
-                return self._message
+            _set_state(self, "_entered", True)
+            return message
 
     @message.setter
     def message(self, value):
-        self._message = value
+        _set_state(self, "_message", value)
 
     @property
     def locations(self) -> list:
-        res = self._event_mgr.dispatch_event("locations", self._locations)
-        if res:
-            return res
-        else:
-            return self._locations
+        locations = _get_state(self, "_locations")
+        # Rooms in paged regions (see regions.py) keep their locations as ids
+        if any(type(a) is str for a in locations):
+            locations = [Room.handle_id_or_object(a) for a in locations]
+
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("locations", locations)
+            if res:
+                return res
+
+        return locations
 
     @locations.setter
     def locations(self, value):
-        self._locations = value
+        _set_state(self, "_locations", value)
+
+        if presence.get_session() is None:
+            presence.obj_collector.graph.set_locations(self.id, value)
 
     @property
     def image(self):
-        res = self._event_mgr.dispatch_event("image", self._image)
-        if res:
-            return res
-        else:
-            return self._image
+        image = _get_state(self, "_image")
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("image", image)
+            if res:
+                return res
 
-    @description.setter
-    def description(self, value):
-        self._description = value
+        return image
+
+    @image.setter
+    def image(self, value):
+        _set_state(self, "_image", value)
 
     @property
     def sound(self):
-        res = self._event_mgr.dispatch_event("sound", self._sound)
-        if res:
-            return res
-        else:
-            return self._sound
+        sound = _get_state(self, "_sound")
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("sound", sound)
+            if res:
+                return res
+
+        return sound
 
     @sound.setter
     def sound(self, value):
-        self._sound = value
+        _set_state(self, "_sound", value)
+
+    # VERSIONING
+    @property
+    def version(self):
+        """
+        Version of the room's shared state (name, description, image, sound), changes on every change
+        :return: tuple or None if getter handlers make it uncacheable
+        """
+        if self._event_mgr.active and any(self._event_mgr.event_exists(a) for a in _ROOM_PAYLOAD_EVENTS):
+            return None
+
+        desc_version = 0
+        if isinstance(self._description, Description):
+            desc_version = self._description.version
+            if desc_version is None:
+                return None
+
+        return self._version, desc_version
+
+    def is_shared(self) -> bool:
+        """
+        False if the active session changed this room's (or its description's) shared state
+        """
+        if not _is_shared((self, ), _ROOM_PAYLOAD_ATTRS):
+            return False
+
+        return not isinstance(self._description, Description) or self._description.is_shared()
+
+    @property
+    def tag(self):
+        """
+        Version tag of the room payload (including the message) as the active session sees it.
+        Comparing tags is O(1), nothing has to be serialized.
+        :return: tuple or None if getter handlers make it uncacheable
+        """
+        if self._event_mgr.active and self._event_mgr.event_exists("message"):
+            return None
+
+        shared = self.is_shared() and _is_shared((self, ), ("_message", ))
+        return _tag(self.version, shared, int(bool(_get_state(self, "_entered"))))
 
     # EVENT REGISTERING
-    def event(self, event_name):
+    def event(self, event_name, mode: str = None):
         """
         Registers an event handler via decorators
         :param event_name: Your first parameter: name of the event (by property names)
+        :param mode: ExecutionMode: where the handler runs (OPTIONAL, inline by default)
         :return: function for the decorator to use
         """
         def real_dec(fn):
@@ -277,7 +618,8 @@ class Room:
                 raise TypeError("not a function")
 
             # Register the event
-            self._event_mgr.set_event_handler(event_name, fn)
+            self._event_mgr.set_event_handler(event_name, fn, mode=mode)
+            _notify_watchers(self)
             return fn
 
         return real_dec
@@ -298,24 +640,28 @@ class Room:
             else:
                 raise IdMissing("room {} does not exist".format(room_or_id))
 
-    def _finalize_loading(self):
+    def _finalize_loading(self, missing: list = None):
         """
         If a string was passed as a location, resolve its name to the actual Room object.
         Then, run the same thing for Descriptions
+        :param missing: collects (type, id) of references that don't exist instead of raising IdMissing (OPTIONAL),
+                        those references stay ids
         """
-        log.debug("Finalizing {}".format(self._name))
-        for c, room_i in enumerate(self._locations.copy()):
-            if isinstance(room_i, str):
-                room = presence.obj_collector.find_room_by_id(room_i)
-                if not room:
-                    raise IdMissing("Room id {} does not exist".format(room_i))
-            else:
+        locations = self._locations
+        for c, room_i in enumerate(locations):
+            if type(room_i) is not str:
                 continue
 
-            self._locations[c] = room
+            room = presence.obj_collector.find_room_by_id(room_i)
+            if room is not None:
+                locations[c] = room
+            elif missing is None:
+                raise IdMissing("Room id {} does not exist".format(room_i))
+            else:
+                missing.append((ObjectType.ROOM, room_i))
 
-        if isinstance(self._description, Description):
-            self._description._finalize_loading()
+        if isinstance(self._description, Description) and self._description._pending:
+            self._description._finalize_loading(missing)
 
     def add_location(self, location):
         """
@@ -324,7 +670,14 @@ class Room:
         :return: None
         """
         loc = self.handle_id_or_object(location)
-        self._locations.append(loc)
+
+        # Copy-on-write: sessions get their own list, the shared one is only changed outside of sessions
+        locations = list(_get_state(self, "_locations"))
+        locations.append(loc)
+        _set_state(self, "_locations", locations)
+
+        if presence.get_session() is None:
+            presence.obj_collector.graph.add_location(self.id, loc.id)
 
     def remove_location(self, location):
         """
@@ -333,7 +686,13 @@ class Room:
         :return: bool indicating success
         """
         loc = self.handle_id_or_object(location)
-        self._locations.remove(loc)
+
+        locations = list(_get_state(self, "_locations"))
+        locations.remove(loc)
+        _set_state(self, "_locations", locations)
+
+        if presence.get_session() is None:
+            presence.obj_collector.graph.remove_location(self.id, loc.id)
 
     def set_as_starting_room(self):
         amber = presence.world.get("amber")
@@ -362,53 +721,113 @@ class Room:
 
 
 class Blueprint:
+    __slots__ = (
+        "ingredients", "item1", "item2", "result", "_msg", "id", "_event_mgr"
+    )
+
     class Event:
         COMBINE = "combine"
 
     # noinspection PyProtectedMember
-    def __init__(self, ingredient1, ingredient2, result, message: str = None, recipe_id: str = None):
+    def __init__(self, ingredient1, ingredient2, result, message: str = None, recipe_id: str = None,
+                 additional_ingredients: list = None):
         """
-        Binds two items together to they can form another item
+        Binds two (or more) items together to they can form another item
         :param ingredient1: Item
         :param ingredient2: Item
-        :param result: Item that is made from two ingredients
+        :param result: Item that is made from the ingredients
         :param message: Message to be displayed when combining
         :param recipe_id: Blueprint ID that you can assign (OPTIONAL, see Room initialization)
+        :param additional_ingredients: list of Items that are also required (OPTIONAL, for recipes with more than two ingredients)
         """
-        ingredient1 = Item.handle_id_or_object(ingredient1)
-        ingredient2 = Item.handle_id_or_object(ingredient2)
+        ingredients = [ingredient1, ingredient2] + list(additional_ingredients or [])
+        ingredients = tuple(Item.handle_id_or_object(a) for a in ingredients)
         result = Item.handle_id_or_object(result)
 
-        self.item1 = ingredient1
-        self.item2 = ingredient2
-        self.result = result
-
-        # Add this Blueprints to the Item's _blueprints
-        ingredient1._blueprints.append(self)
-        ingredient2._blueprints.append(self)
-
-        self._msg = message
-
-        self.id = None
         if not recipe_id:
-            self.id = _generate_id("{}-{}".format(ingredient1.name, ingredient2.name))
+            recipe_id = _generate_id(Blueprint._default_id(ingredients))
         elif presence.id_exists(recipe_id):
             raise RuntimeError("blueprint with id '{}' already exists".format(recipe_id))
         else:
-            self.id = _generate_id(recipe_id)
+            recipe_id = _generate_id(recipe_id)
 
-        events = get_attribute_values(Blueprint.Event)
-        self._event_mgr = EventManager(self.id, events)
+        self._setup(ingredients, result, message, recipe_id)
 
         presence.obj_collector.add_blueprint(self)
 
+    @classmethod
+    def _from_items(cls, ingredients: tuple, result, message, recipe_id: str):
+        """
+        Internal, creates a blueprint of a world data record (see loader.py) once its items exist, without registering it
+        :param ingredients: tuple(Item)
+        :param result: Item
+        :param message: Message to be displayed when combining
+        :param recipe_id: id (already claimed)
+        """
+        bp = cls.__new__(cls)
+        bp._setup(ingredients, result, message, recipe_id)
+
+        return bp
+
+    def _setup(self, ingredients: tuple, result, message, recipe_id: str):
+        # Every attribute, shared by __init__ and _from_items
+        self.ingredients = ingredients
+        self.item1 = ingredients[0]
+        self.item2 = ingredients[1]
+        self.result = result
+
+        # Add this Blueprint to each Item's _blueprints (once per distinct Item)
+        for ingredient in {a.id: a for a in ingredients}.values():
+            if ingredient._blueprints is _EMPTY:
+                ingredient._blueprints = []
+
+            ingredient._blueprints.append(self)
+
+        self._msg = message
+        self.id = recipe_id
+
+        events = get_event_schema(Blueprint.Event)
+        self._event_mgr = EventManager(self.id, events)
+
+    @staticmethod
+    def _default_id(ingredients) -> str:
+        """
+        The id a blueprint without one is given (before numbers are added if it is taken)
+        :param ingredients: Items
+        :return: str
+        """
+        return "-".join(a.name for a in ingredients)
+
+    @property
+    def key(self) -> tuple:
+        """
+        Canonical multiset of ingredient ids, used to index recipes
+        """
+        return presence.recipe_key(a.id for a in self.ingredients)
+
+    @property
+    def message(self) -> str:
+        return self._msg
+
+    # EVENT REGISTERING
+    def event(self, event_name, mode: str = None):
+        """
+        Registers an event handler via decorators (see Room.event)
+        """
+        def real_dec(fn):
+            if not callable(fn):
+                raise TypeError("not a function")
+
+            self._event_mgr.set_event_handler(event_name, fn, mode=mode)
+            return fn
+
+        return real_dec
+
     # Utility functions
-    def matches_items(self, item1, item2):
-        item1 = Item.handle_id_or_object(item1)
-        item2 = Item.handle_id_or_object(item2)
+    def matches_items(self, *items):
+        items = [Item.handle_id_or_object(a) for a in items]
 
-        ls = [self.item1, self.item2]
-        return item1 in ls and item2 in ls
+        return presence.recipe_key(a.id for a in items) == self.key
 
     def is_result(self, item):
         item = Item.handle_id_or_object(item)
@@ -432,6 +851,10 @@ class Blueprint:
 
 
 class Item:
+    __slots__ = (
+        "_name", "_desc", "_blueprints", "id", "_event_mgr", "amber", "_watchers", "_version"
+    )
+
     class Event:
         # Getters
         NAME_GET = "name"
@@ -449,67 +872,108 @@ class Item:
         :param blueprints: Blueprints, containing items that can be made from this one
         :param item_id: Item ID that you can assign (OPTIONAL, see Room initialization)
         """
-        self._name = name
-        self._desc = description
-
-        self._blueprints = []
+        found = _EMPTY
         # Parses recipes
         if blueprints:
+            found = []
             for rec in blueprints:
 
                 if isinstance(rec, Blueprint):
-                    self._blueprints.append(rec)
+                    found.append(rec)
                 elif isinstance(rec, str):
                     # Find by id
                     f_rec = presence.obj_collector.find_recipe_by_id(rec)
                     if f_rec:
-                        self._blueprints.append(f_rec)
+                        found.append(f_rec)
                     else:
                         raise TypeError("Blueprint id invalid")
 
         # Generates / uses an id
         # Tries the name. If taken, adds numbers at the end
-        self.id = None
         if not item_id:
-            self.id = _generate_id(self._name)
+            item_id = _generate_id(name)
         elif presence.id_exists(item_id):
             raise RuntimeError("object with id '{}' already exists".format(item_id))
         else:
-            self.id = _generate_id(item_id)
+            item_id = _generate_id(item_id)
+
+        self._setup(name, description, found, item_id, _get_amber())
+
+        # Add item to cache
+        presence.obj_collector.add_item(self)
+
+        # Rooms may be waiting for this item
+        if self.amber.resolver.active:
+            self.amber.resolver.added(self)
+
+    @classmethod
+    def _from_record(cls, record: dict, item_id: str, amber):
+        """
+        Internal, creates an item from a world data record (see loader.py) without registering it
+        :param record: item record
+        :param item_id: id (already claimed)
+        :param amber: Amber instance
+        """
+        item = cls.__new__(cls)
+        item._setup(record["name"], record.get("description"), _EMPTY, item_id, amber)
+
+        return item
+
+    def _setup(self, name, description, blueprints, item_id: str, amber):
+        # Every attribute, shared by __init__ and _from_record
+        self._name = name
+        self._desc = description
+        self._blueprints = blueprints
+        self.id = item_id
 
         # Used for events
-        events = get_attribute_values(Item.Event)
+        events = get_event_schema(Item.Event)
         self._event_mgr = EventManager(self._name, events)
 
-        self.amber = _get_amber()
+        self.amber = amber
 
-        # Add item to cache
-        presence.obj_collector.add_item(self)
+        # Descriptions that link to this item
+        self._watchers = _EMPTY
+        # Bumped on every change to the shared state
+        self._version = 0
 
     # PROPERTIES
     @property
     def name(self) -> str:
-        res = self._event_mgr.dispatch_event("name", self._name)
-        if res:
-            return res
-        else:
-            return self._name
+        name = _get_state(self, "_name")
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("name", name)
+            if res:
+                return res
+
+        return name
+
+    @name.setter
+    def name(self, value):
+        _set_state(self, "_name", value)
 
     @property
     def description(self) -> Union[Description, str]:
-        res = self._event_mgr.dispatch_event("description", self._desc)
-        if res:
-            return res
-        else:
-            return self._desc
+        desc = _get_state(self, "_desc")
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("description", desc)
+            if res:
+                return res
+
+        return desc
+
+    @description.setter
+    def description(self, value):
+        _set_state(self, "_desc", value)
 
     @property
     def blueprints(self) -> list:
-        res = self._event_mgr.dispatch_event("blueprints", self._desc)
-        if res:
-            return res
-        else:
-            return self._blueprints
+        if self._event_mgr.active:
+            res = self._event_mgr.dispatch_event("blueprints", self._desc)
+            if res:
+                return res
+
+        return self._blueprints
 
     def pickup(self) -> tuple:
         """
@@ -541,11 +1005,38 @@ class Item:
         else:
             return res
 
+    # VERSIONING
+    @property
+    def version(self):
+        """
+        Version of the item's shared state (name, description), changes on every change
+        :return: tuple or None if getter handlers make it uncacheable
+        """
+        if self._event_mgr.active and any(self._event_mgr.event_exists(a) for a in _ITEM_PAYLOAD_EVENTS):
+            return None
+
+        return self._version,
+
+    def is_shared(self) -> bool:
+        """
+        False if the active session changed this item's shared state
+        """
+        return _is_shared((self, ), _LINK_ATTRS)
+
+    @property
+    def tag(self):
+        """
+        Version tag of the item payload as the active session sees it (see Room.tag)
+        :return: tuple or None if getter handlers make it uncacheable
+        """
+        return _tag(self.version, self.is_shared())
+
     # EVENT REGISTERING
-    def event(self, event_name):
+    def event(self, event_name, mode: str = None):
         """
         Registers an event handler via decorators
         :param event_name: Your first parameter: name of the event (by property names)
+        :param mode: ExecutionMode: where the handler runs (OPTIONAL, inline by default)
         :return: function for the decorator to use
         """
         def real_dec(fn):
@@ -553,7 +1044,8 @@ class Item:
                 raise TypeError("not a function")
 
             # Register the event
-            self._event_mgr.set_event_handler(event_name, fn)
+            self._event_mgr.set_event_handler(event_name, fn, mode=mode)
+            _notify_watchers(self)
             return fn
 
         return real_dec
@@ -1,4 +1,8 @@
 # coding=utf-8
+import gc
+import hashlib
+import os
+from contextlib import contextmanager
 
 
 class Singleton(type):
@@ -10,12 +14,40 @@ class Singleton(type):
         return cls._instances[cls]
 
 
+def data_dir(source: str) -> str:
+    """
+    Per-user directory for what a game writes (saves, the world cache). It is never inside the game's directory,
+    which is served over HTTP. AMBER_DATA_DIR replaces the default base (the user's local app data).
+    :param source: path of the game script
+    :return: str
+    """
+    base = os.environ.get("AMBER_DATA_DIR") or os.path.join(
+        os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_DATA_HOME") or
+        os.path.join(os.path.expanduser("~"), ".local", "share"), "amber")
+
+    # Games with the same script name in different directories don't share saves
+    source = os.path.abspath(source)
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(base, "{}-{}".format(name, hashlib.sha256(source.encode("utf-8")).hexdigest()[:8]))
+
+
 class ObjectType:
     ROOM = "room"
     ITEM = "item"
     RECIPE = "recipe"
 
 
+class Change:
+    """
+    Kinds of state changes a GameSession records
+    """
+    INVENTORY_ADD = "inventory_add"
+    INVENTORY_REMOVE = "inventory_remove"
+    MOVE = "move"
+    # An attribute of a Room/Item was changed through the session's overlay
+    UPDATE = "update"
+
+
 def get_attribute_values(_class):
     attributes = get_class_attributes(_class)
     return [getattr(_class, a) for a in attributes]
@@ -26,3 +58,18 @@ def get_class_attributes(_class):
     return [a for a in dir(_class) if
             not a.startswith('__') and
             not callable(getattr(_class, a))]
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pauses the cyclic garbage collector. For bulk work that only creates objects that live on
+    (loading/resolving the world), where the collector would keep rescanning the growing world for nothing.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
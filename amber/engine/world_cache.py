@@ -0,0 +1,181 @@
+# coding=utf-8
+
+##############
+# World cache: the fully resolved world (rooms, items, blueprints, descriptions and event handler bindings)
+# stored in one binary file, so starting a game does not have to build it again
+##############
+
+import hashlib
+import io
+import logging
+import os
+import pickle
+import sys
+
+from . import presence
+from .types_ import Room, Item, Blueprint
+from .utils import ObjectType, data_dir
+
+
+log = logging.getLogger(__name__)
+
+# Under the game's data directory (see utils.data_dir)
+CACHE_DIR = "world_cache"
+# Bump when the cached layout changes
+FORMAT_VERSION = 2
+
+# Set by `python -m amber compile`: always build (and cache) the world, don't start the server
+compiling = False
+
+_WORLD_TYPES = (
+    (ObjectType.ROOM, Room),
+    (ObjectType.ITEM, Item),
+    (ObjectType.RECIPE, Blueprint),
+)
+_CLASSES = dict(_WORLD_TYPES)
+
+# Persistent id of the Amber instance (world objects use their ids)
+_AMBER = 0
+
+
+def cache_key(source: str, *data_files: str) -> str:
+    """
+    Content hash of a game script (together with everything else the cached file depends on)
+    :param source: path of the script
+    :param data_files: world data files the script loads
+    :return: str
+    """
+    from .. import __version__
+
+    digest = hashlib.sha256()
+    digest.update("{}|{}|{}.{}|".format(FORMAT_VERSION, __version__, *sys.version_info[:2]).encode("utf-8"))
+
+    for path in (source, ) + data_files:
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def cache_path(source: str, *data_files: str) -> str:
+    """
+    Where the world of a game script is cached (in its data directory, named by its content hash)
+    """
+    name = os.path.basename(source)
+    return os.path.join(data_dir(source), CACHE_DIR, "{}.{}.world".format(name, cache_key(source, *data_files)[:16]))
+
+
+def _slots(cls) -> list:
+    return [a for c in cls.__mro__ for a in getattr(c, "__slots__", ()) if a != "__weakref__"]
+
+
+class _WorldPickler(pickle.Pickler):
+    # Rooms, items and blueprints are saved once each (as states) and referenced by id everywhere else,
+    # so long chains of linked rooms don't make pickle recurse through the whole world
+    def persistent_id(self, obj):
+        if isinstance(obj, (Room, Item, Blueprint)):
+            return obj.id
+        if obj is presence.world.get("amber"):
+            return _AMBER
+
+        return None
+
+
+class _WorldUnpickler(pickle.Unpickler):
+    def __init__(self, file, shells: dict, amber):
+        super().__init__(file)
+        self.shells = shells
+        self.amber = amber
+
+    def persistent_load(self, pid):
+        if pid == _AMBER:
+            return self.amber
+
+        return self.shells[pid]
+
+
+def dump(path: str, amber):
+    """
+    Writes the current world to a file. Event handlers are saved by reference (module and name),
+    so they have to be module-level functions.
+    :param path: file to write
+    :param amber: Amber instance
+    :raises pickle.PicklingError/AttributeError/TypeError: if something (e.g. a lambda handler) can't be saved
+    """
+    collector = presence.obj_collector
+
+    indexes = {
+        ObjectType.ROOM: collector.rooms,
+        ObjectType.ITEM: collector.items,
+        ObjectType.RECIPE: collector.blueprints,
+    }
+    objects = [(type_, obj) for type_, _ in _WORLD_TYPES for obj in indexes[type_]]
+
+    slots = {cls: _slots(cls) for _, cls in _WORLD_TYPES}
+    states = [[getattr(obj, a, None) for a in slots[type(obj)]] for _, obj in objects]
+
+    buffer = io.BytesIO()
+    # The objects are created (empty) from the first part before the second one, which references them, is loaded
+    pickle.dump([(type_, obj.id) for type_, obj in objects], buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    _WorldPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump({
+        "states": states,
+        "ids": presence.ids,
+        "cursors": presence._id_cursors,
+        "counters": presence._id_counters,
+        "starting_room": amber.starting_room,
+        "intro": presence.world.get("intro"),
+        # What the checks found, logged again when the game starts from the cache
+        "report": amber.resolver.report,
+    })
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(buffer.getbuffer())
+    os.replace(tmp_path, path)
+
+    log.info("Cached the world ({} objects, {} KiB)".format(len(objects), len(buffer.getbuffer()) // 1024))
+
+
+def load(path: str, amber):
+    """
+    Loads a cached world into the (empty) world
+    :param path: file written by dump
+    :param amber: Amber instance
+    """
+    with open(path, "rb") as file:
+        shells = {}
+        order = []
+        for type_, obj_id in pickle.load(file):
+            cls = _CLASSES[type_]
+            obj = shells[obj_id] = cls.__new__(cls)
+            order.append(obj)
+
+        world = _WorldUnpickler(file, shells, amber).load()
+
+    # Nothing is registered until everything was read
+    slots = {cls: _slots(cls) for _, cls in _WORLD_TYPES}
+    for obj, state in zip(order, world["states"]):
+        for attr, value in zip(slots[type(obj)], state):
+            setattr(obj, attr, value)
+
+    collector = presence.obj_collector
+    add = {Room: collector.add_room, Item: collector.add_item, Blueprint: collector.add_blueprint}
+    for obj in order:
+        add[type(obj)](obj)
+
+    presence.ids.update(world["ids"])
+    presence._id_cursors.update(world["cursors"])
+    presence._id_counters.update(world.get("counters", {}))
+
+    if world["starting_room"] is not None:
+        amber.set_starting_point(world["starting_room"])
+    if world["intro"] is not None:
+        presence.add_to_world(world["intro"], "intro", force=True)
+
+    # The world was resolved before it was cached
+    amber.resolver.active = True
+    amber.resolver.report = world.get("report")
+
+    log.info("Loaded the cached world ({} objects)".format(len(order)))
@@ -39,8 +39,9 @@ const logWS     = new Logger("WebSocket"),
       logUI     = new Logger("UI");
 
 // Setup the websocket
+// The websocket is served on the same port as the page
 logWS.debug("Connecting to " + host + ":" + port);
-let socket = new WebSocket("ws://" + host + ":" + port);
+let socket = new WebSocket("ws://" + host + ":" + port + "/ws");
 
 let socketQueueId = 0;
 let socketQueueCallback = {};
@@ -49,14 +50,56 @@ let socketQueueCallback = {};
 const uiVersion = "0.1.0";
 let serverInfo = {};
 
+// Actions that support conditional fetch: their replies carry a version tag and sending it back
+// gets a tiny not_modified reply instead of the same data again
+const conditionalActions = ["room/get", "room/get/description", "item/get", "game/get/inventory"];
+let taggedCache = {};
+
+// Adds the held version tag to the request and wraps the callback to handle not_modified replies
+function withConditional(action, data, callback) {
+    if (!conditionalActions.includes(action)) {
+        return [data, callback];
+    }
+
+    let key = action + (data.id !== undefined ? ":" + data.id : "");
+    let cached = taggedCache[key];
+
+    if (cached) {
+        data = Object.assign({}, data, {tag: cached.tag});
+    }
+
+    let cb = function (status, reply, tag) {
+        if (status === Status.NOT_MODIFIED) {
+            status = Status.OK;
+            reply = cached.data;
+        }
+        else if (tag) {
+            taggedCache[key] = {tag: tag, data: reply};
+        }
+
+        if (callback) {
+            callback(status, reply);
+        }
+    };
+
+    return [data, cb];
+}
+
 class AmberFrontend {
     sendHandshake() {
         let data = {
             uiVersion: uiVersion
         };
 
+        // Resumes the saved playthrough
+        let sessionId = window.localStorage.getItem("amberSession");
+        if (sessionId !== null) {
+            data.session = sessionId;
+        }
+
         let cb = function (status, data) {
             serverInfo = data;
+            window.localStorage.setItem("amberSession", data.session);
             logWS.debug("Handshake complete");
         };
 
@@ -69,6 +112,7 @@ class AmberFrontend {
         if (data === null) {
             data = {}
         }
+        [data, callback] = withConditional(action, data, callback);
 
         let payload = {
             type: "action",
@@ -95,6 +139,47 @@ class AmberFrontend {
         socket.send(pl);
     }
 
+    // Sends several requests in one frame: requests is a list of [type ("action"/"event"), name, data, callback]
+    // The server runs them in order and replies with all results at once
+    sendBatch(requests) {
+        logWS.debug("Sending batch of " + requests.length);
+
+        let entries = [];
+        for (let i = 0; i < requests.length; i++) {
+            let [type, name, data, callback] = requests[i];
+
+            data = data === null ? {} : data;
+            if (type === "action") {
+                [data, callback] = withConditional(name, data, callback);
+            }
+
+            let entry = {
+                type: type,
+                data: data,
+                req_id: ++socketQueueId
+            };
+            entry[type] = name;
+
+            socketQueueCallback[socketQueueId] = callback;
+            entries.push(entry);
+        }
+
+        let payload = {
+            type: "batch",
+            data: entries,
+            req_id: ++socketQueueId
+        };
+
+        // Results are dispatched to the callbacks of individual requests
+        socketQueueCallback[socketQueueId] = function (status, results) {
+            for (let i = 0; i < results.length; i++) {
+                resolveReply(results[i]);
+            }
+        };
+
+        socket.send(dumps(payload));
+    }
+
     // Game methods
     getInventory(cb) {
         this.sendAction("game/get/inventory", null, cb)
@@ -124,8 +209,12 @@ class AmberFrontend {
         this.sendAction("room/enter", {room: room_id}, cb)
     }
 
-    combineItems(item1_id, item2_id, cb) {
-        this.sendAction("inventory/combine", {item1: item1_id, item2: item2_id}, cb)
+    travelTo(room_id, cb) {
+        this.sendAction("room/travel", {room: room_id}, cb)
+    }
+
+    combineItems(item_ids, cb) {
+        this.sendAction("inventory/combine", {items: item_ids}, cb)
     }
 
     useItem(item_id, cb) {
@@ -141,40 +230,68 @@ class AmberFrontend {
 
 let amber = new AmberFrontend();
 
-// Send data to AmberFrontend instance or the respective callback
-socket.onmessage = function (evt) {
-    let json = loads(evt.data);
-
+// Calls the callback of the request this reply belongs to
+function resolveReply(json) {
     let c_id = json.req_id;
     let status = json.status;
     let data = json.data;
 
+    // State changes made by the request are pushed along with the reply
+    if (json.deltas) {
+        applyDeltas(json.deltas);
+    }
+
     // Callback for that particular request gets called
     if (!(c_id in socketQueueCallback)) {
         return
     }
 
-    socketQueueCallback[c_id](status, data);
+    let callback = socketQueueCallback[c_id];
     delete socketQueueCallback[c_id];
 
+    if (callback) {
+        callback(status, data, json.tag);
+    }
+}
+
+// Send data to AmberFrontend instance or the respective callback
+socket.onmessage = function (evt) {
+    resolveReply(loads(evt.data));
 };
 
+// Patches the local state (room, inventory, locations) with deltas sent by the server
+function applyDeltas(deltas) {
+    for (let i = 0; i < deltas.length; i++) {
+        let delta = deltas[i];
+        logAction.debug("Applying delta: " + delta.op);
+
+        if (delta.op === "inventory/add") {
+            addToInventory(delta.item);
+        }
+        else if (delta.op === "inventory/remove") {
+            removeFromInventory(delta.id);
+        }
+        else if (delta.op === "inventory/update") {
+            updateInventoryItem(delta.item);
+        }
+        else if (delta.op === "room") {
+            _parseAndSetRoom(delta.room);
+        }
+        else if (delta.op === "room/update") {
+            updateRoom(delta.fields);
+        }
+        else if (delta.op === "locations") {
+            setLocations(Status.OK, delta.locations);
+        }
+    }
+}
+
 function resolveAction(action_cls) {
     logAction.log("Resolving action...");
     console.log(action_cls);
 
-    let act = action_cls.action;
-    let obj = action_cls.object;
-
-    if (act === Action.add_item) {
-        addToInventoryFromID(obj);
-    }
-    else if (act === Action.travel) {
-        moveToRoom(obj);
-    }
-    else if (act === Action.remove_item) {
-        refreshInventory();
-    }
+    // The server already applied the action (moving, adding/removing items)
+    // and the changes arrived as deltas with the reply, so there is nothing to fetch
 }
 
 // Useful functions
@@ -187,15 +304,17 @@ function useDescriptionElement(self, item_id) {
     })
 }
 
-function refreshInventory() {
-    amber.getInventory(function (status, data) {
-        logUI.log("Refreshing inventory");
-        clearInventory();
+function setInventory(status, data) {
+    logUI.log("Refreshing inventory");
+    clearInventory();
 
-        for (let i = 0; i < data.length; i++) {
-            addToInventory(data[i]);
-        }
-    });
+    for (let i = 0; i < data.length; i++) {
+        addToInventory(data[i]);
+    }
+}
+
+function refreshInventory() {
+    amber.getInventory(setInventory);
 }
 
 function sendInventoryUse(item_id) {
@@ -219,17 +338,10 @@ function moveToRoom(room_id) {
             // Assume status is OK
             resolveAction(data);
 
+            // Locations arrive as a delta
             _parseAndSetRoom(data);
-            logAction.log("Moved to " + data.name);
+            logAction.log("Moved to " + data.room.name);
         }
-
-        // When moved, refresh locations
-        amber.getLocations(function (status, data) {
-            clearLocations();
-            for (let i = 0; i < data.length; i++) {
-                addLocation(data[i]);
-            }
-        })
     });
 
 }
@@ -240,9 +352,32 @@ function _parseAndSetRoom(data) {
     }
 
     roomNameObj.innerHTML = data.name;
+    setRoomDescription(data.description);
+    roomMessageObj.innerHTML = data.msg;
+
+    setRoomSound(data.sound);
+    setRoomImage(data.image);
+}
 
+// Only changes the given room fields (name, description, image, sound)
+function updateRoom(fields) {
+    if ("name" in fields) {
+        roomNameObj.innerHTML = fields.name;
+    }
+    if ("description" in fields) {
+        setRoomDescription(fields.description);
+    }
+    if ("sound" in fields) {
+        setRoomSound(fields.sound);
+    }
+    if ("image" in fields) {
+        setRoomImage(fields.image);
+    }
+}
+
+function setRoomDescription(description) {
     // Parses description
-    let desc = data.description.text;
+    let desc = description.text;
 
     let splits = desc.split(/({\w+\|\w+})/);
     for (let i = 0; i < splits.length; i++) {
@@ -260,10 +395,10 @@ function _parseAndSetRoom(data) {
             let item_name = null;
 
             if (item_type === "room") {
-                item_name = data.description.rooms[item_id].name;
+                item_name = description.rooms[item_id].name;
             }
             else if (item_type === "item") {
-                item_name = data.description.items[item_id].name;
+                item_name = description.items[item_id].name;
             }
 
             assert(item_name !== null);
@@ -273,16 +408,19 @@ function _parseAndSetRoom(data) {
     }
 
     roomDescriptionObj.innerHTML = splits.join("");
-    roomMessageObj.innerHTML = data.msg;
+}
 
+function setRoomSound(sound) {
     // Set up music
-    if (data.sound !== null) {
-        logUI.log("Playing sound: " + data.sound);
-        music.playSound(data.sound);
+    if (sound !== null) {
+        logUI.log("Playing sound: " + sound);
+        music.playSound(sound);
     }
+}
 
-    logUI.debug("Setting room image: " + data.image);
-    setImageSrc(roomImageObj, data.image);
+function setRoomImage(image) {
+    logUI.debug("Setting room image: " + image);
+    setImageSrc(roomImageObj, image);
 }
 
 function addToInventory(item) {
@@ -294,6 +432,31 @@ function addToInventory(item) {
     inventoryObj.appendChild(el);
 }
 
+function findInventoryElement(item_id) {
+    for (let i = 0; i < inventoryObj.children.length; i++) {
+        let el = inventoryObj.children[i];
+        if (el.getAttribute("item-id") === item_id) {
+            return el;
+        }
+    }
+
+    return null;
+}
+
+function removeFromInventory(item_id) {
+    let el = findInventoryElement(item_id);
+    if (el !== null) {
+        inventoryObj.removeChild(el);
+    }
+}
+
+function updateInventoryItem(item) {
+    let el = findInventoryElement(item.id);
+    if (el !== null) {
+        el.innerHTML = item.name;
+    }
+}
+
 function addToInventoryFromID(item_id) {
     amber.getItemInfo(item_id, function (status, data) {
         if (status === Status.MISSING) {
@@ -314,6 +477,15 @@ function addLocation(loc) {
     locationsObj.appendChild(el);
 }
 
+function setLocations(status, data) {
+    logUI.log("Setting locations");
+    clearLocations();
+
+    for (let i = 0; i < data.length; i++) {
+        addLocation(data[i]);
+    }
+}
+
 function clearLocations() {
     while (locationsObj.lastChild) {
         locationsObj.removeChild(locationsObj.lastChild);
@@ -350,26 +522,20 @@ socket.onopen = function () {
             imageObj.setAttribute("src", image);
         }
 
-        // Proceed to getting the first room info
-        amber.getCurrentRoom(function (status, data) {
-            logUI.log("Setting initial room state");
-            console.debug(data);
-
-            _parseAndSetRoom(data);
-
-            sectionFade(sections["section-loading"]);
-            sectionFade(sections["section-intro"]);
-        });
-
-        refreshInventory();
+        // Proceed to getting the first room info, inventory and locations in one round trip
+        amber.sendBatch([
+            ["action", "room/get", null, function (status, data) {
+                logUI.log("Setting initial room state");
+                console.debug(data);
 
-        amber.getLocations(function (status, data) {
-            logUI.log("Setting locations");
+                _parseAndSetRoom(data);
 
-            for (let i = 0; i < data.length; i++) {
-                addLocation(data[i]);
-            }
-        })
+                sectionFade(sections["section-loading"]);
+                sectionFade(sections["section-intro"]);
+            }],
+            ["action", "game/get/inventory", null, setInventory],
+            ["action", "room/get/locations", null, setLocations]
+        ]);
 
     })
 
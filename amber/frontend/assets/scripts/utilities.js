@@ -160,7 +160,8 @@ const Status = {
     "OK": "ok",
     "MISSING": "missing",
     "FORBIDDEN": "forbidden",
-    "ERROR": "error"
+    "ERROR": "error",
+    "NOT_MODIFIED": "not_modified"
 };
 
 const Action = {
@@ -1,21 +1,19 @@
 # coding=utf-8
 import logging
 from random import randint
-try:
-    from ujson import dumps
-except ImportError:
-    from json import dumps
 import inspect
 
 from .web_utils import Status, get_engine_version
+from . import payloads, wire
 from ..engine.types_ import Room, Description, Item, Blueprint
 from ..engine.exceptions import NoSuchBlueprint, IdMissing
+from ..engine.utils import ObjectType
 from ..engine import action as act, presence
+from ..engine.session import GameSession
+from ..engine.executor import executors, check_mode, ExecutionMode
 
 log = logging.getLogger(__name__)
 
-amber = None
-
 
 class HandlerMeta(type):
     _instances = {}
@@ -35,12 +33,19 @@ class SocketEventManager(metaclass=HandlerMeta):
         self.r = randint(5, 500)
 
         self.callbacks = {}
+        # Callbacks that take the GameSession as their first argument (registered with with_session=True)
+        self._with_session = set()
+        # Callbacks that don't change any state and can run concurrently
+        self.read_only = set()
+        # Event name -> ExecutionMode of synchronous callbacks that declared one
+        self.modes = {}
 
     # noinspection PyCallingNonCallable
-    async def dispatch_event(self, event_name, *args, **kwargs):
+    async def dispatch_event(self, event_name, session, *args, **kwargs):
         """
         Internal use only, to dispatch individual events
         :param event_name: Event name
+        :param session: GameSession of the connection (passed only to callbacks registered with with_session)
         :param args: Additional positional arguments
         :param kwargs: Additional keyword arguments
         :return: None or what the function returns
@@ -48,25 +53,54 @@ class SocketEventManager(metaclass=HandlerMeta):
 
         fn = self.callbacks.get(event_name)
         if fn:
+            if event_name in self._with_session:
+                args = (session, *args)
+
             if inspect.iscoroutinefunction(fn):
                 return await fn(*args, **kwargs)
             else:
-                return fn(*args, **kwargs)
+                # Synchronous callbacks may be moved off the event loop
+                mode = self.modes.get(event_name, executors.default_mode)
+
+                # Room/item events and getters they call would block the loop while waiting for a pool
+                if mode == ExecutionMode.INLINE and executors.pooled_handlers:
+                    mode = ExecutionMode.THREAD
+                return await executors.run_async(mode, fn, *args, **kwargs)
         else:
             return None
 
-    def set_event_handler(self, event_name, fn):
+    def set_event_handler(self, event_name, fn, read_only=False, mode: str = None, with_session: bool = False):
         if fn in self.callbacks.values():
             log.warning("Event function {} was already registered, overwriting".format(event_name))
 
         log.info("Event {} registered".format(event_name))
         self.callbacks[event_name] = fn
 
+        if mode is None:
+            self.modes.pop(event_name, None)
+        else:
+            check_mode(mode)
+            self.modes[event_name] = mode
+
+        if read_only:
+            self.read_only.add(event_name)
+        else:
+            self.read_only.discard(event_name)
+
+        # fn(data) or, if the callback asked for it, fn(session, data)
+        if with_session:
+            self._with_session.add(event_name)
+        else:
+            self._with_session.discard(event_name)
+
     # EVENT REGISTERING
-    def on(self, event_name):
+    def on(self, event_name, read_only=False, mode: str = None, with_session: bool = False):
         """
         Registers an event handler via decorators
         :param event_name: Your first parameter: name of the event (by property names)
+        :param read_only: If the handler doesn't change any state, requests may be handled concurrently
+        :param mode: ExecutionMode for synchronous handlers (OPTIONAL, executors.default_mode if not set)
+        :param with_session: Pass the connection's GameSession as the first argument, fn(session, data) (OPTIONAL)
         :return: function for the decorator to use
         """
         def real_dec(fn):
@@ -74,7 +108,7 @@ class SocketEventManager(metaclass=HandlerMeta):
                 raise TypeError("not a function")
 
             # Register the event
-            self.set_event_handler(event_name, fn)
+            self.set_event_handler(event_name, fn, read_only=read_only, mode=mode, with_session=with_session)
             return fn
 
         return real_dec
@@ -86,7 +120,7 @@ action = SocketEventManager("action")
 # UTILITIES
 
 
-def parse_event_response(res: tuple) -> tuple:
+def parse_event_response(session: GameSession, res: tuple) -> tuple:
     # If user returns only the message, default to no action, just the message
     if not isinstance(res, tuple):
         return act.Action.nothing(), res
@@ -99,15 +133,15 @@ def parse_event_response(res: tuple) -> tuple:
 
     if isinstance(o_act, act.Action):
         if o_act.action == act.ADD_TO_INV:
-            amber._add_to_inventory(o_act.object)
+            session._add_to_inventory(o_act.object)
 
         elif o_act.action == act.MOVE_TO:
-            st, message = amber.walk_to(o_act.object)
+            st, message = session.walk_to(o_act.object)
 
         elif o_act.action == act.REMOVE_FROM_INV:
             items = o_act.object
             for item in items:
-                amber._remove_from_inventory(item)
+                session._remove_from_inventory(item)
 
 
         # Add action to dictionary - event returned an Action
@@ -147,11 +181,16 @@ def extract_from_item(item: Item) -> dict:
 
 
 def extract_from_description(desc: Description) -> dict:
+    # Descriptions cache their own rendered payload
+    if isinstance(desc, Description):
+        return desc.render()
+
+    # A description handler returned plain text
     return {
-        "text": desc.text if hasattr(desc, "text") else desc,
-        "rooms": {a.id: extract_from_room_name_id(a) for a in desc.rooms},
-        "items": {a.id: extract_from_item(a) for a in desc.items},
-        "id": desc.id,
+        "text": desc,
+        "rooms": {},
+        "items": {},
+        "id": None,
     }
 
 
@@ -159,6 +198,7 @@ def extract_from_blueprint(bp: Blueprint) -> dict:
     return {
         "item1": bp.item1,
         "item2": bp.item2,
+        "ingredients": list(bp.ingredients),
         "result": bp.result,
     }
 
@@ -187,14 +227,8 @@ def dictify(obj):
         return tree
 
     elif isinstance(obj, Description):
-        tree = extract_from_description(obj)
-        for k, el in tree.items():
-            if k == "rooms":
-                tree[k] = {r.get("id"): r for r in [extract_from_room_name_id(r) for r in el]}
-            elif k == "items":
-                tree[k] = {r.get("id"): r for r in [extract_from_item(r) for r in el]}
-
-        return tree
+        # Already resolved (and cached, so it must not be changed in place)
+        return extract_from_description(obj)
 
     elif isinstance(obj, Blueprint):
         tree = extract_from_blueprint(obj)
@@ -222,7 +256,27 @@ def dictify(obj):
         return obj.__dict__
 
 
+def conditional(data, get_tag, build) -> tuple:
+    """
+    Conditional fetch, the client can send the version tag it already holds (data["tag"])
+    :param data: request data
+    :param get_tag: fn() -> tuple, engine version tag of the payload (see Room.tag)
+    :param build: fn() -> payload, called only if the client's copy is outdated
+    :return: tuple(Status.NOT_MODIFIED, None) or tuple(Status.OK, Tagged(payload, tag))
+    """
+    client_tag = data.get("tag") if isinstance(data, dict) else None
+
+    if client_tag is not None and client_tag == payloads.etag(get_tag()):
+        return Status.NOT_MODIFIED, None
+
+    payload = build()
+    # Building can change the tag (reading the room message marks the room as entered)
+    return Status.OK, payloads.Tagged(payload, payloads.etag(get_tag()))
+
+
 # EVENT HANDLERS
+# Handlers that run game script events (enter, pickup, use, combine) are run in the thread pool,
+# so slow or blocking scripts don't stall other connections
 
 ######
 # ROOM
@@ -232,110 +286,153 @@ def dictify(obj):
 
 # /get
 
-@action.on("room/get")
-def get_room_info(data):
+# Not read-only: reading the room message marks the room as entered
+@action.on("room/get", with_session=True)
+def get_room_info(session, data):
     """
     Gets current room state
-    :param data: None
+    :param data: dict(tag) (OPTIONAL, see conditional)
 
     :return dict(Room)
     """
-    cr = amber.current_room
+    cr = session.current_room
 
-    return Status.OK, extract_from_room(cr)
+    return conditional(data, lambda: cr.tag, lambda: payloads.room_json(cr))
 
 
-@action.on("room/get/description")
-def get_room_desc(data):
+@action.on("room/get/description", read_only=True, with_session=True)
+def get_room_desc(session, data):
     """
     Gets current room description
-    :param data: None
+    :param data: dict(tag) (OPTIONAL, see conditional)
 
     :return dict(Description)
     """
-    desc = amber.current_room.description
+    desc = session.current_room.description
+    if not isinstance(desc, Description):
+        # A description handler returned plain text
+        return Status.OK, payloads.description_json(desc)
 
-    return Status.OK, extract_from_description(desc)
+    return conditional(data, lambda: desc.tag, lambda: payloads.description_json(desc))
 
 
-@action.on("room/get/locations")
-def get_room_paths(data):
+@action.on("room/get/locations", read_only=True, with_session=True)
+def get_room_paths(session, data):
     """
     Gets possible ways to different rooms from the current one
     :param data: None
 
     :return: list(Room, ...)
     """
-    return Status.OK, extract_locations(amber.current_room.locations)
+    return Status.OK, payloads.locations_json(session.current_room.locations)
 
 
-@action.on("room/get/name")
-def get_room_name(data):
+@action.on("room/get/name", read_only=True, with_session=True)
+def get_room_name(session, data):
     """
     Gets the current room name
     :param data: None
 
     :return: str
     """
-    cr = amber.current_room
+    cr = session.current_room
 
     return Status.OK, cr.name
 
 
-@action.on("room/get/image")
-def get_room_image(data):
+@action.on("room/get/image", read_only=True, with_session=True)
+def get_room_image(session, data):
     """
     Gets the current room image.
     :param data: None
 
     :return: str
     """
-    image = amber.current_room.image
+    image = session.current_room.image
 
     return Status.OK, image
 
 
-@action.on("room/use/description")
-def use_from_description(obj):
+@action.on("room/use/description", mode=ExecutionMode.THREAD, with_session=True)
+def use_from_description(session, obj):
     """
     Uses a description item
     :param obj:
 
     :return: dict(message, Action)
     """
-    obj = obj.get("item")
+    obj_id = obj.get("item")
 
-    try:
-        obj = Item.handle_id_or_object(obj)
+    type_, obj = presence.obj_collector.find_typed_by_id(obj_id)
 
+    if type_ == ObjectType.ITEM:
         resp = obj.pickup()
-        return parse_event_response(resp)
+        return parse_event_response(session, resp)
 
     # Is a room, not an item
-    except IdMissing:
-        obj = Room.handle_id_or_object(obj)
+    elif type_ == ObjectType.ROOM:
+        resp = session.walk_to(obj)
+        return parse_event_response(session, resp)
 
-        resp = amber.walk_to(obj)
-
-        return parse_event_response(resp)
+    else:
+        return Status.MISSING, {"message": "{} does not exist".format(obj_id)}
 
 
-@action.on("room/enter")
-def move_to(data):
+@action.on("room/enter", mode=ExecutionMode.THREAD, with_session=True)
+def move_to(session, data):
     """
     Enters a room
     :param data: dict(room: str)
 
-    :return: dict(room: Room, Action)
+    :return: dict(room: Room, Action), the room the player is in afterwards
     """
     room_id = data.get("room")
 
     room = Room.handle_id_or_object(room_id)
 
-    resp = amber.walk_to(room)
-    status, stuff = parse_event_response(resp)
+    resp = session.walk_to(room)
+    status, stuff = parse_event_response(session, resp)
+    stuff = stuff if type(stuff) is dict else {}
+
+    # The enter event already read the room's message
+    return status, {**stuff, **{"room": payloads.room_json(session.current_room, stuff.get("message", ""))}}
+
+
+@action.on("room/travel", mode=ExecutionMode.THREAD, with_session=True)
+def travel_to(session, data):
+    """
+    Travels to a room that can be several steps away (along the shortest way), see GameSession.travel_to
+    :param data: dict(room: str)
 
-    return status, {**(stuff if type(stuff) is dict else {}), **{"room": extract_from_room(room)}}
+    :return: dict(room: Room, path: list(Room, ...), messages: list(str), Action)
+    """
+    room = Room.handle_id_or_object(data.get("room"))
+
+    steps = session.travel_to(room)
+    if steps is None:
+        return Status.FORBIDDEN, {"message": "there is no way to {}".format(room.id)}
+
+    status, stuff = Status.OK, {}
+    messages = []
+    path = []
+    # Message of the last room entered (entering it read the message)
+    message = None
+    for step, resp in steps:
+        status, stuff = parse_event_response(session, resp)
+        stuff = stuff if type(stuff) is dict else {}
+        if stuff.get("message"):
+            messages.append(stuff["message"])
+
+        # The last room can deny entering it
+        if status != Status.FORBIDDEN:
+            path.append(step)
+            message = stuff.get("message", "")
+
+    return status, {**stuff, **{
+        "room": payloads.room_json(session.current_room, message),
+        "path": payloads.locations_json(path),
+        "messages": messages,
+    }}
 
 
 ######
@@ -344,40 +441,44 @@ def move_to(data):
 ######
 
 
-@event.on("game/handshake")
-def handshake(data):
+@event.on("game/handshake", with_session=True)
+def handshake(session, data):
     """
     Initial handshake that must be completed when connected
-    :param data: dict(uiVersion)
+    :param data: dict(uiVersion, session (OPTIONAL, id of a saved session to resume), encodings, compression,
+                      compressionThreshold), see wire.negotiate
 
-    :return: dict(engineVersion, author, name, description)
+    :return: dict(engineVersion, author, name, description, session, encoding, compression, compressionThreshold)
     """
     ui_version = data.get("uiVersion")
     log.info("Client connected with uiVersion {}".format(ui_version))
 
     payload = {
         "engineVersion": get_engine_version(),
-        "author": amber.author,
-        "name": amber.name,
-        "description": amber.description,
+        "author": session.amber.author,
+        "name": session.amber.name,
+        "description": session.amber.description,
+        "session": session.id,
     }
 
     return Status.OK, payload
 
 
-@action.on("game/get/inventory")
-def get_inventory(data):
+@action.on("game/get/inventory", read_only=True, with_session=True)
+def get_inventory(session, data):
     """
     Gets inventory state
-    :param data: None
+    :param data: dict(tag) (OPTIONAL, see conditional)
 
     :return: list
     """
-    return Status.OK, dictify(amber.inventory)
+    return conditional(
+        data, lambda: session.inventory_tag, lambda: payloads.inventory_json(session.inventory)
+    )
 
 
-@action.on("game/get/intro")
-def get_intro(data):
+@action.on("game/get/intro", read_only=True, with_session=True)
+def get_intro(session, data):
     """
     Gets the game intro
     :param data: None
@@ -402,19 +503,21 @@ def get_intro(data):
 # inventory/
 ######
 
-@action.on("inventory/get")
-def get_inventory(data):
+@action.on("inventory/get", read_only=True, with_session=True)
+def get_inventory(session, data):
     """
     Returns the current inventory state
-    :param data: None
+    :param data: dict(tag) (OPTIONAL, see conditional)
 
     :return: dict(inventory: list)
     """
-    return dictify(amber.inventory)
+    return conditional(
+        data, lambda: session.inventory_tag, lambda: payloads.inventory_json(session.inventory)
+    )
 
 
-@action.on("inventory/use")
-def use_item(data):
+@action.on("inventory/use", mode=ExecutionMode.THREAD, with_session=True)
+def use_item(session, data):
     """
     Uses an item in your inventory
     :param data: dict(item: str)
@@ -426,48 +529,50 @@ def use_item(data):
 
     resp = item.use()
 
-    return parse_event_response(resp)
+    return parse_event_response(session, resp)
 
 
-@action.on("inventory/combine")
-def combine_items(data):
+@action.on("inventory/combine", mode=ExecutionMode.THREAD, with_session=True)
+def combine_items(session, data):
     """
-    Combines two items (either both in inventory or one in room)
+    Combines two or more items (either all in inventory or one in room)
     :param data: dict(items: list)
 
     :return:
     If successful, dict(item: Item, Action.remove_item())
     """
-    item1, item2 = data.get("items")
+    item_ids = data.get("items")
 
-    obj1, obj2 = presence.obj_collector.find_by_id(item1), presence.obj_collector.find_by_id(item2)
+    typed = [presence.obj_collector.find_typed_by_id(a) for a in item_ids]
+    types = {type_ for type_, _ in typed}
+    objs = [obj for _, obj in typed]
 
-    if isinstance(obj1, Item) and isinstance(obj2, Item):
-        # Both are items, do a normal combine
+    if types == {ObjectType.ITEM}:
+        # All are items, do a normal combine
 
-        bp = amber.combine(item1, item2)
+        bp = session.combine(*item_ids)
 
         if not bp:
-            return Status.MISSING, amber.defaults.failed_combine
+            return Status.MISSING, session.amber.defaults.failed_combine
         else:
             res_item = bp.result
             # Default status is True, parse_event_response does not automatically remove items from inventory
-            status, additional = parse_event_response(bp.combine())
+            status, additional = parse_event_response(session, bp.combine())
 
             # Default behaviour: remove previous items, add the new one into inventory
             if status == Status.OK:
-                amber._add_to_inventory(res_item)
-                amber._remove_from_inventory(obj1)
-                amber._remove_from_inventory(obj2)
+                session._add_to_inventory(res_item)
+                for obj in objs:
+                    session._remove_from_inventory(obj)
 
-                # on REMOVE_FROM_INVENTORY, client automatically refreshes the inventory, so this is fine
-                return Status.OK, {**{"message": bp.message}, **act.Action.remove_from_inventory((obj1, obj2)).to_dict()}
+                # The client applies the inventory changes from the reply's deltas
+                return Status.OK, {**{"message": bp.message}, **act.Action.remove_from_inventory(tuple(a.id for a in objs)).to_dict()}
             # If user is not allowed to combine, return a message (additional)
             else:
                 return status, additional
 
     # Either of the items is an Item and a Room
-    elif (isinstance(obj1, Room) and isinstance(obj2, Item)) or (isinstance(obj1, Item) and isinstance(obj2, Room)):
+    elif types == {ObjectType.ROOM, ObjectType.ITEM}:
         # TODO room combine logic
         pass
 
@@ -479,11 +584,11 @@ def combine_items(data):
 # item/
 ######
 
-@action.on("item/get")
-def get_item_info(data):
+@action.on("item/get", read_only=True, with_session=True)
+def get_item_info(session, data):
     """
     Gets item info
-    :param data: dict(id)
+    :param data: dict(id, tag (OPTIONAL, see conditional))
 
     :return: dict(item: Item)
     """
@@ -492,7 +597,7 @@ def get_item_info(data):
     except IdMissing:
         return Status.MISSING, {}
 
-    return Status.OK, {"item": extract_from_item(item)}
+    return conditional(data, lambda: item.tag, lambda: {"item": payloads.item_json(item)})
 
 
 class SocketHandler:
@@ -500,8 +605,12 @@ class SocketHandler:
         self.sock = socket
         self.amber = amber_inst
 
-        global amber
-        amber = amber_inst
+        # Created on game/handshake
+        self.session = None
+
+        # Wire format, negotiated on game/handshake (the handshake reply itself is still sent as JSON)
+        self.codec = wire.default_codec
+        self._next_codec = None
 
         self.events = {}
         self.actions = {}
@@ -518,26 +627,176 @@ class SocketHandler:
             "data": data,
         }
         payload = {**payload, **kwargs}
-        await self.sock.send(dumps(payload))
+        await self.sock.send(self.codec.encode(payload))
 
-    async def handle(self, type_, additional, req_id, data):
+        if self._next_codec is not None:
+            self.codec, self._next_codec = self._next_codec, None
+
+    def is_read_only(self, type_, additional, data=None) -> bool:
+        """
+        Checks if a request can run concurrently with others (read-only actions or batches of them)
+        """
+        if type_ == "batch":
+            return all(self.is_read_only(*self.unpack(a)[:2]) for a in (data or []))
+
+        return type_ == "action" and additional in self.mgr_action.read_only
+
+    @staticmethod
+    def unpack(request: dict) -> tuple:
+        """
+        Extracts the parts of a request
+        :param request: dict(type, event/action, data, req_id)
+        :return: tuple(type, event/action name, req_id, data)
+        """
+        type_ = request.get("type")
+        return type_, request.get(type_), request.get("req_id"), request.get("data")
+
+    async def dispatch(self, type_, additional, data) -> tuple:
+        """
+        Runs a single event/action
+        :return: tuple(status, data, dict(deltas, tag) with what is sent next to the data)
+        """
         if type_ == "event":
             log.debug("Event: {}".format(additional))
+            if additional != "game/handshake":
+                status, resp = await self.handle_event(additional, data)
+                return self.finish(status, resp)
+
+            self.session = self.open_session(data)
+            self.session.connection = self
             status, resp = await self.handle_event(additional, data)
-            await self.reply(status, resp, req_id=req_id)
+
+            # Switches to the negotiated format after this reply
+            self._next_codec = wire.negotiate(data)
+            if isinstance(resp, dict):
+                resp = {
+                    **resp,
+                    "encoding": self._next_codec.encoding,
+                    "compression": self._next_codec.compression,
+                    "compressionThreshold": self._next_codec.threshold,
+                }
+
+            return status, resp, {}
 
         elif type_ == "action":
             log.debug("Action: {}".format(additional))
+            if self.session is None:
+                return Status.ERROR, {"message": "handshake required"}, {}
+
+            # Another connection (tab) resumed this session, only one of them can play it
+            if self.session.connection is not self:
+                return Status.FORBIDDEN, {"message": "the session was resumed by another connection"}, {}
+
             status, resp = await self.handle_action(additional, data)
-            await self.reply(status, resp, req_id=req_id)
+            return self.finish(status, resp)
 
         else:
             log.warning("No such type: {}".format(type_))
+            return Status.ERROR, {"message": "no such type: {}".format(type_)}, {}
+
+    def open_session(self, data) -> GameSession:
+        """
+        Resumes the saved session the client asks for (data["session"]) or starts a new one
+        """
+        saves = self.amber.saves
+        session_id = data.get("session") if isinstance(data, dict) else None
+
+        if saves is not None and session_id:
+            session = saves.resume(self.amber, session_id, track_changes=True)
+            if session is not None:
+                log.info("Resumed session {}".format(session_id))
+                return session
+
+        session = GameSession(self.amber, track_changes=True)
+        if saves is not None:
+            saves.attach(session)
+
+        return session
+
+    def finish(self, status, resp) -> tuple:
+        """
+        Collects what is sent next to the reply data (the version tag and deltas)
+        :return: tuple(status, data, dict)
+        """
+        extra = {}
+        if isinstance(resp, payloads.Tagged):
+            if resp.tag is not None:
+                extra["tag"] = resp.tag
+            resp = resp.data
+
+        deltas = self.take_deltas(resp)
+        if deltas:
+            extra["deltas"] = deltas
+
+        return status, resp, extra
+
+    def take_deltas(self, resp) -> list:
+        """
+        Builds the deltas of the changes made by the last request (see payloads.deltas)
+        :param resp: reply data of that request, a room in it is not sent twice
+        :return: list / None if nothing changed
+        """
+        if self.session is None:
+            return None
+
+        changes = self.session.take_changes()
+        if not changes:
+            return None
+
+        include_room = not (isinstance(resp, dict) and "room" in resp)
+
+        token = presence.set_session(self.session)
+        try:
+            return payloads.deltas(self.session, changes, include_room=include_room) or None
+        finally:
+            presence.reset_session(token)
+
+    async def handle(self, type_, additional, req_id, data):
+        if type_ == "batch":
+            await self.handle_batch(req_id, data)
+            return
+
+        status, resp, extra = await self.dispatch(type_, additional, data)
+        await self.reply(status, resp, req_id=req_id, **extra)
+
+    async def handle_batch(self, req_id, requests: list):
+        """
+        Runs a list of events/actions in order and replies with all results in one frame
+        :param req_id: id of the batch
+        :param requests: list(dict(type, event/action, data, req_id))
+        """
+        results = []
+        for request in requests or []:
+            type_, additional, r_id, data = self.unpack(request)
+
+            # A failing request is answered on its own, the others still run
+            try:
+                status, resp, extra = await self.dispatch(type_, additional, data)
+            except Exception:
+                log.exception("Error while handling {} in a batch".format(additional))
+                results.append({"status": Status.ERROR, "req_id": r_id})
+                continue
+
+            results.append({"status": status, "data": resp, "req_id": r_id, **extra})
+
+        await self.reply(Status.OK, results, req_id=req_id)
 
     async def handle_event(self, event_type, data, **kwargs) -> tuple:
-        if event_type in self.mgr_event.callbacks.keys():
-            return await self.mgr_event.dispatch_event(event_type, data, **kwargs)
+        if event_type not in self.mgr_event.callbacks.keys():
+            return Status.MISSING, {"message": "no such event: {}".format(event_type)}
+
+        token = presence.set_session(self.session)
+        try:
+            return await self.mgr_event.dispatch_event(event_type, self.session, data, **kwargs)
+        finally:
+            presence.reset_session(token)
 
     async def handle_action(self, action_type, data, **kwargs) -> tuple:
-        if action_type in self.mgr_action.callbacks.keys():
-            return await self.mgr_action.dispatch_event(action_type, data, **kwargs)
\ No newline at end of file
+        if action_type not in self.mgr_action.callbacks.keys():
+            return Status.MISSING, {"message": "no such action: {}".format(action_type)}
+
+        token = presence.set_session(self.session)
+        try:
+            return await self.mgr_action.dispatch_event(action_type, self.session, data, **kwargs)
+        finally:
+            presence.reset_session(token)
@@ -0,0 +1,143 @@
+# coding=utf-8
+
+##############
+# Memory-mapped, size-bounded LRU cache of game media (room images, sounds) with byte-range responses
+##############
+
+import logging
+import mimetypes
+import mmap
+import os
+from collections import OrderedDict
+
+from aiohttp import web
+
+from .static import parse_range, etag_matches, CACHE_REVALIDATE
+
+
+log = logging.getLogger(__name__)
+
+# Default upper bound of mapped bytes
+MEDIA_CACHE_SIZE = 256 * 1024 * 1024
+
+
+class MappedFile:
+    __slots__ = (
+        "data", "size", "mtime", "etag", "content_type"
+    )
+
+    def __init__(self, path: str, stat: os.stat_result):
+        """
+        A file mapped into memory (read-only). Pages are read from disk once and shared by all requests.
+        """
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        self.etag = '"{:x}-{:x}"'.format(self.mtime, self.size)
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        if self.size == 0:
+            # Empty files can't be mapped
+            self.data = memoryview(b"")
+            return
+
+        with open(path, "rb") as file:
+            self.data = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns == self.mtime and stat.st_size == self.size
+
+
+class MediaCache:
+    def __init__(self, max_size: int = MEDIA_CACHE_SIZE):
+        """
+        Keeps recently requested files mapped, evicting the least recently used ones above max_size
+        :param max_size: maximum total size of mapped files in bytes, files bigger than that are not cached
+        """
+        self.max_size = max_size
+        self.size = 0
+
+        # path -> MappedFile, least recently used first
+        self._files = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str):
+        """
+        Returns the mapped file (mapping it if needed)
+        :param path: absolute path
+        :return: MappedFile or None if the file is missing or too big for the cache
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._discard(path)
+            return None
+
+        mapped = self._files.get(path)
+        if mapped is not None and mapped.is_current(stat):
+            self.hits += 1
+            self._files.move_to_end(path)
+            return mapped
+
+        # New or changed on disk
+        self._discard(path)
+        if stat.st_size > self.max_size:
+            return None
+
+        self.misses += 1
+        mapped = MappedFile(path, stat)
+        self._files[path] = mapped
+        self.size += mapped.size
+
+        while self.size > self.max_size:
+            _, evicted = self._files.popitem(last=False)
+            self.size -= evicted.size
+
+        return mapped
+
+    def _discard(self, path: str):
+        # The mapping is not closed explicitly, responses that are still being sent may use it.
+        # It is unmapped once the last view of it is released.
+        mapped = self._files.pop(path, None)
+        if mapped is not None:
+            self.size -= mapped.size
+
+    def clear(self):
+        self._files.clear()
+        self.size = 0
+
+
+def respond(request: web.Request, mapped: MappedFile) -> web.Response:
+    """
+    Sends a mapped file, honouring If-None-Match, If-Range and single byte ranges (so the browser can seek in audio)
+    :param request: aiohttp request
+    :param mapped: MappedFile
+    :return: aiohttp Response
+    """
+    headers = {
+        "ETag": mapped.etag,
+        "Cache-Control": CACHE_REVALIDATE,
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None and etag_matches(if_none_match, mapped.etag):
+        return web.Response(status=304, headers=headers)
+
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and (if_range is None or if_range.strip() == mapped.etag):
+        byte_range = parse_range(range_header, mapped.size)
+        if byte_range is False:
+            headers["Content-Range"] = "bytes */{}".format(mapped.size)
+            return web.Response(status=416, headers=headers)
+
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = "bytes {}-{}/{}".format(start, end, mapped.size)
+            # Slicing the view does not copy
+            return web.Response(status=206, body=mapped.data[start:end + 1], content_type=mapped.content_type,
+                                headers=headers)
+
+    return web.Response(body=mapped.data, content_type=mapped.content_type, headers=headers)
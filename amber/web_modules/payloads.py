@@ -0,0 +1,286 @@
+# coding=utf-8
+
+##############
+# Cache of serialized (JSON) payloads for rooms, items and descriptions
+##############
+
+import logging
+import uuid
+try:
+    from ujson import dumps
+except ImportError:
+    from json import dumps
+
+from ..engine import presence
+from ..engine.types_ import Room, Item, Description
+from ..engine.utils import Change
+
+
+log = logging.getLogger(__name__)
+
+
+class RawJSON:
+    __slots__ = (
+        "raw",
+    )
+
+    def __init__(self, raw: str):
+        """
+        Already-encoded JSON that is spliced into replies as-is
+        :param raw: JSON text
+        """
+        self.raw = raw
+
+    def __repr__(self):
+        return "<RawJSON {}>".format(self.raw)
+
+
+class FragmentCache:
+    def __init__(self):
+        """
+        Keeps the latest encoded fragment of each (kind, object), tagged with the object's version
+        """
+        # (kind, object id) -> (version, fragment)
+        self._fragments = {}
+        # Kinds that were cached
+        self._kinds = set()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, obj, build) -> str:
+        """
+        Returns the cached fragment or builds (and caches) a new one
+        :param kind: What is cached (room, item, ...), an object can have several kinds of fragments
+        :param obj: Room/Item/Description with version and is_shared()
+        :param build: fn(obj) -> str, called on a miss
+        :return: str
+        """
+        version = obj.version
+        # Uncacheable (handlers) or changed by the active session
+        if version is None or not obj.is_shared():
+            return build(obj)
+
+        key = (kind, obj.id)
+        cached = self._fragments.get(key)
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        fragment = build(obj)
+        self._fragments[key] = (version, fragment)
+        self._kinds.add(kind)
+        return fragment
+
+    def discard(self, obj_id: str):
+        """
+        Drops every fragment of an object (that is not in memory anymore)
+        :param obj_id: object id
+        """
+        for kind in self._kinds:
+            self._fragments.pop((kind, obj_id), None)
+
+    def clear(self):
+        self._fragments.clear()
+
+    def __len__(self):
+        return len(self._fragments)
+
+
+fragments = FragmentCache()
+
+
+def _discard_room(room: Room):
+    # A paged out room (and its description) is read from the region store again, so its fragments only take memory
+    fragments.discard(room.id)
+    if isinstance(room._description, Description):
+        fragments.discard(room._description.id)
+
+
+presence.obj_collector.on_remove.append(_discard_room)
+
+
+# VERSION TAGS
+
+# Differs between runs of the server, so tags from a previous run never match
+_EPOCH = uuid.uuid4().hex[:8]
+
+
+class Tagged:
+    __slots__ = (
+        "data", "tag"
+    )
+
+    def __init__(self, data, tag: str = None):
+        """
+        Reply data together with its version tag, the tag is sent next to the data
+        :param data: payload
+        :param tag: str from etag (OPTIONAL)
+        """
+        self.data = data
+        self.tag = tag
+
+
+def etag(tag) -> str:
+    """
+    Turns an engine version tag (Room.tag, Item.tag, ...) into the string the client sends back
+    :param tag: tuple or None
+    :return: str or None
+    """
+    if tag is None:
+        return None
+
+    return _EPOCH + "-" + "-".join(str(a) for a in tag)
+
+
+# ENCODING
+
+def encode(obj) -> str:
+    """
+    Encodes a payload to JSON, splicing RawJSON fragments in without encoding them again
+    :param obj: payload
+    :return: str
+    """
+    if isinstance(obj, RawJSON):
+        return obj.raw
+
+    if isinstance(obj, dict):
+        return "{" + ",".join(dumps(str(k)) + ":" + encode(v) for k, v in obj.items()) + "}"
+
+    if isinstance(obj, (list, tuple)):
+        return "[" + ",".join(encode(a) for a in obj) + "]"
+
+    return dumps(obj)
+
+
+# FRAGMENTS
+
+def _build_room(room: Room) -> str:
+    # Without the braces, so the per-session message can be appended
+    return ",".join((
+        '"name":' + dumps(room.name),
+        '"description":' + description_json(room.description).raw,
+        '"image":' + dumps(room.image),
+        '"sound":' + dumps(room.sound),
+        '"id":' + dumps(room.id),
+    ))
+
+
+def _build_room_name_id(room: Room) -> str:
+    return dumps({"name": room.name, "id": room.id})
+
+
+def _build_item(item: Item) -> str:
+    return dumps({"name": item.name, "description": item.description, "id": item.id})
+
+
+def _build_description(desc: Description) -> str:
+    return dumps(desc.render())
+
+
+def room_json(room: Room, message: str = None) -> RawJSON:
+    # The message changes per session (and once read), so it is never cached. Entering a room already read it.
+    if message is None:
+        message = room.message
+
+    return RawJSON("{" + fragments.get("room", room, _build_room) + ',"msg":' + dumps(message) + "}")
+
+
+def room_name_id_json(room: Room) -> RawJSON:
+    return RawJSON(fragments.get("room_name_id", room, _build_room_name_id))
+
+
+def locations_json(rooms: list) -> RawJSON:
+    return RawJSON("[" + ",".join(fragments.get("room_name_id", a, _build_room_name_id) for a in rooms) + "]")
+
+
+def item_json(item: Item) -> RawJSON:
+    return RawJSON(fragments.get("item", item, _build_item))
+
+
+def inventory_json(items: list) -> RawJSON:
+    return RawJSON("[" + ",".join(fragments.get("item", a, _build_item) for a in items) + "]")
+
+
+def description_json(desc) -> RawJSON:
+    if not isinstance(desc, Description):
+        # A description handler returned plain text
+        return RawJSON(dumps({"text": desc, "rooms": {}, "items": {}, "id": None}))
+
+    return RawJSON(fragments.get("description", desc, _build_description))
+
+
+# DELTAS
+
+# Room/Item attributes that are part of their payloads (attribute -> payload key)
+_ROOM_FIELDS = {"_name": "name", "_description": "description", "_image": "image", "_sound": "sound"}
+_ITEM_FIELDS = {"_name": "name", "_desc": "description"}
+
+
+def _room_field(room: Room, key: str):
+    value = getattr(room, key)
+    return description_json(value) if key == "description" else value
+
+
+def deltas(session, changes: list, include_room: bool = True) -> list:
+    """
+    Turns the changes a session recorded during a request into deltas the client applies to its own state,
+    so it doesn't have to fetch the room/inventory/locations again. Must be called with the session active.
+    :param session: GameSession
+    :param changes: list(tuple(Change, object, attribute)), see GameSession.take_changes
+    :param include_room: Send the whole room on a move (OPTIONAL, False if the reply already contains it)
+    :return: list(dict(op, ...))
+    """
+    result = []
+    added = set()
+    moved = False
+
+    room_fields = {}
+    locations = False
+    updated_items = {}
+
+    for change, obj, attr in changes:
+        if change == Change.INVENTORY_ADD:
+            added.add(obj.id)
+            result.append({"op": "inventory/add", "item": item_json(obj)})
+
+        elif change == Change.INVENTORY_REMOVE:
+            result.append({"op": "inventory/remove", "id": obj.id})
+
+        elif change == Change.MOVE:
+            moved = True
+
+        elif change == Change.UPDATE:
+            if isinstance(obj, Room):
+                if obj is not session.current_room:
+                    continue
+
+                if attr == "_locations":
+                    locations = True
+                elif attr in _ROOM_FIELDS:
+                    room_fields[_ROOM_FIELDS[attr]] = None
+
+            elif isinstance(obj, Item) and attr in _ITEM_FIELDS:
+                updated_items[obj.id] = obj
+
+    room = session.current_room
+
+    if moved:
+        # Everything about the room is new
+        if include_room:
+            result.append({"op": "room", "room": room_json(room)})
+        locations = True
+
+    elif room_fields:
+        fields = {key: _room_field(room, key) for key in room_fields}
+        result.append({"op": "room/update", "fields": fields})
+
+    if locations:
+        result.append({"op": "locations", "locations": locations_json(room.locations)})
+
+    for item in session.inventory:
+        if item.id in updated_items and item.id not in added:
+            result.append({"op": "inventory/update", "item": item_json(item)})
+
+    return result
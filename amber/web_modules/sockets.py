@@ -1,81 +1,164 @@
 # coding=utf-8
 import logging
-import websockets
-from websockets import exceptions
 import asyncio
 
-try:
-    from ujson import dumps, loads
-except ImportError:
-    from json import dumps, loads
+from aiohttp import WSMsgType, web
 
 from .handler import SocketHandler
+from .web_utils import Status
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-class Socket:
-    def __init__(self, amber, loop: asyncio.AbstractEventLoop, host, port):
-        self.loop = loop
-        self.amber = amber
+# Default number of read-only requests handled concurrently per connection
+MAX_CONCURRENCY = 8
 
-        assert isinstance(self.loop, asyncio.AbstractEventLoop)
 
-        self.host = host
-        self.port = port
+class ConnectionClosed(Exception):
+    pass
 
-        self.connected_once = False
 
-        self.s_cor = None
-        self.socket = None
+class WebSocketAdapter:
+    __slots__ = (
+        "ws",
+    )
 
-        self.sockets = []
+    def __init__(self, ws: web.WebSocketResponse):
+        """
+        Gives an aiohttp websocket the recv/send interface the Socket and SocketHandler use
+        :param ws: prepared WebSocketResponse
+        """
+        self.ws = ws
 
-    async def start(self, amber):
-        self.s_cor = await websockets.serve(self.parse_socket, self.host, self.port)
+    async def recv(self):
+        """
+        Waits for the next frame
+        :return: str (text frame) or bytes (binary frame)
+        :raises ConnectionClosed: when the client disconnects
+        """
+        msg = await self.ws.receive()
 
-        log.info("Websocket ready")
+        if msg.type == WSMsgType.TEXT or msg.type == WSMsgType.BINARY:
+            return msg.data
 
-    async def parse_socket(self, socket, path):
-        parser = SocketHandler(self.amber, socket)
+        raise ConnectionClosed(msg.type)
 
-        self.sockets.append(socket)
+    async def send(self, data):
+        if self.ws.closed:
+            raise ConnectionClosed()
 
-        if self.connected_once:
-            log.warning("Websocket was already connected once, received another one")
-        self.connected_once = True
-
-        while True:
-            try:
-                resp = await socket.recv()
-            except exceptions.ConnectionClosed:
-                log.info("Client disconnected")
-                return
-
-            try:
-                resp = loads(resp)
-            except:
-                log.critical("Invalid JSON response: {}".format(resp))
-                # raise
-                continue
-
-            assert isinstance(resp, dict)
-
-            # Gets type
-            typ_ = resp.get("type")
-
-            # Gets event/action type
-            if typ_ == "event":
-                add = resp.get("event")
-            elif typ_ == "action":
-                add = resp.get("action")
+        try:
+            if isinstance(data, str):
+                await self.ws.send_str(data)
             else:
-                log.warning("Should not happen!")
-                raise RuntimeError
+                await self.ws.send_bytes(data)
+        except ConnectionResetError as e:
+            raise ConnectionClosed() from e
+
+
+class Socket:
+    def __init__(self, amber, max_concurrency: int = MAX_CONCURRENCY):
+        """
+        Websocket endpoint, serves every connection with its own SocketHandler (and GameSession)
+        :param max_concurrency: How many read-only requests of one connection can be handled at the same time
+        """
+        self.amber = amber
+        self.max_concurrency = max_concurrency
+
+        self.sockets = []
+
+    @staticmethod
+    def _is_valid(request) -> bool:
+        # A request (or a batch of requests) the handler can unpack
+        if not isinstance(request, dict):
+            return False
 
-            # Finally, extracts the data
-            data = resp.get("data")
-            req_id = resp.get("req_id")
+        type_ = request.get("type")
+        if type_ == "batch":
+            requests = request.get("data")
+            return isinstance(requests, list) and all(isinstance(a, dict) for a in requests)
 
+        return type_ in ("event", "action")
+
+    @staticmethod
+    async def _handle(parser, typ_, add, req_id, data):
+        # A failing handler is answered with an error, the connection stays open
+        try:
             await parser.handle(typ_, add, req_id, data)
+        except ConnectionClosed:
+            raise
+        except Exception:
+            log.exception("Error while handling {}".format(add))
+            await parser.reply(Status.ERROR, None, req_id=req_id)
+
+    async def _handle_concurrently(self, parser, limit: asyncio.Semaphore, typ_, add, req_id, data):
+        # The slot was taken before the task was created (see parse_socket)
+        try:
+            await self._handle(parser, typ_, add, req_id, data)
+        except ConnectionClosed:
+            pass
+        finally:
+            limit.release()
+
+    async def parse_socket(self, socket):
+        """
+        Serves one connection until it closes
+        :param socket: object with async recv() and send(data), see WebSocketAdapter
+        """
+        parser = SocketHandler(self.amber, socket)
+
+        self.sockets.append(socket)
+        log.info("Client connected ({} open)".format(len(self.sockets)))
+
+        # Read-only requests run as tasks (at most max_concurrency at once), everything else in order
+        limit = asyncio.Semaphore(self.max_concurrency)
+        pending = set()
+
+        try:
+            while True:
+                try:
+                    resp = await socket.recv()
+                except ConnectionClosed:
+                    log.info("Client disconnected")
+                    return
+
+                try:
+                    resp = parser.codec.decode(resp)
+                except Exception:
+                    log.warning("Invalid message: {}".format(resp))
+                    await parser.reply(Status.ERROR, {"message": "invalid message"}, req_id=None)
+                    continue
+
+                if not self._is_valid(resp):
+                    log.warning("Invalid request: {}".format(resp))
+                    req_id = resp.get("req_id") if isinstance(resp, dict) else None
+                    await parser.reply(Status.ERROR, {"message": "invalid request"}, req_id=req_id)
+                    continue
+
+                # Gets type, event/action type (batches carry a list of requests as data) and the data
+                typ_, add, req_id, data = parser.unpack(resp)
+
+                if parser.is_read_only(typ_, add, data):
+                    # Backpressure: no more frames are read while max_concurrency requests are running
+                    await limit.acquire()
+                    task = asyncio.ensure_future(self._handle_concurrently(parser, limit, typ_, add, req_id, data))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    continue
+
+                # State-changing requests wait for earlier reads, so those never see later state
+                if pending:
+                    await asyncio.gather(*pending)
+
+                try:
+                    await self._handle(parser, typ_, add, req_id, data)
+                except ConnectionClosed:
+                    log.info("Client disconnected")
+                    return
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+            self.sockets.remove(socket)
@@ -0,0 +1,241 @@
+# coding=utf-8
+
+##############
+# In-memory static assets for production mode: strong ETags, content-hashed URLs and precompression
+##############
+
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+
+from aiohttp import web
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+log = logging.getLogger(__name__)
+
+# Files that are worth compressing (by extension)
+COMPRESSIBLE = {".html", ".css", ".js", ".json", ".map", ".svg", ".txt", ".ttf", ".otf"}
+# A compressed variant is only kept if it is at most this big compared to the original
+MIN_RATIO = 0.9
+# Compression happens once at startup, so the slowest (smallest) setting is used
+BROTLI_QUALITY = 11
+
+# Sent with content-hashed URLs, the content behind such a URL never changes
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# Everything else can be cached, but has to be revalidated (with the ETag) before use
+CACHE_REVALIDATE = "no-cache"
+
+range_regex = re.compile(r"^bytes=(\d*)-(\d*)$")
+# src="assets/..." and href="assets/..." in the index page
+asset_url_regex = re.compile(r"""((?:src|href)=["'])(assets/[^"'?#]+)(["'])""")
+
+
+class Asset:
+    __slots__ = (
+        "data", "content_type", "digest", "encoded"
+    )
+
+    def __init__(self, data: bytes, content_type: str, compress: bool = False):
+        """
+        A file kept in memory, with its precompressed variants
+        :param data: contents
+        :param content_type: MIME type
+        :param compress: precompress it with gzip (and brotli if installed) (OPTIONAL)
+        """
+        self.data = data
+        self.content_type = content_type
+        self.digest = hashlib.sha256(data).hexdigest()
+
+        # Content-Encoding -> compressed contents
+        self.encoded = {}
+        if compress:
+            self._precompress()
+
+    def _precompress(self):
+        variants = [("gzip", gzip.compress(self.data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(("br", brotli.compress(self.data, quality=BROTLI_QUALITY)))
+
+        for encoding, data in variants:
+            if len(data) <= len(self.data) * MIN_RATIO:
+                self.encoded[encoding] = data
+
+    @property
+    def version(self) -> str:
+        """
+        Short content hash used in asset URLs (?v=...)
+        """
+        return self.digest[:12]
+
+    def etag(self, encoding: str = None) -> str:
+        # Each variant has different bytes, so it needs its own strong ETag
+        return '"{}"'.format(self.digest if encoding is None else "{}-{}".format(self.digest, encoding))
+
+    @classmethod
+    def from_file(cls, path: str):
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with open(path, "rb") as file:
+            return cls(file.read(), content_type, os.path.splitext(path)[1].lower() in COMPRESSIBLE)
+
+
+class AssetStore:
+    def __init__(self, directory: str, prefix: str):
+        """
+        Loads (and precompresses) every file in a directory
+        :param directory: directory to load
+        :param prefix: URL prefix of the files (e.g. "assets/")
+        """
+        self.prefix = prefix
+        # path relative to the directory (with / as separator) -> Asset
+        self.assets = {}
+
+        for root, _, files in os.walk(directory):
+            for name in files:
+                full = os.path.join(root, name)
+                path = os.path.relpath(full, directory).replace(os.sep, "/")
+
+                self.assets[path] = Asset.from_file(full)
+
+        log.info("Loaded {} assets ({} KiB)".format(len(self.assets), sum(len(a.data) for a in self.assets.values()) // 1024))
+
+    def get(self, path: str):
+        return self.assets.get(path)
+
+    def url(self, path: str) -> str:
+        """
+        Content-hashed URL of an asset, it changes whenever the file does
+        :param path: path relative to the directory
+        :return: str
+        """
+        asset = self.assets.get(path)
+        if asset is None:
+            return self.prefix + path
+
+        return "{}{}?v={}".format(self.prefix, path, asset.version)
+
+    def rewrite_urls(self, html: str) -> str:
+        """
+        Replaces asset URLs in a page with content-hashed ones
+        """
+        def replace(m):
+            path = m.group(2)[len(self.prefix):]
+            return m.group(1) + self.url(path) + m.group(3)
+
+        return asset_url_regex.sub(replace, html)
+
+
+# HTTP
+
+def _accepted_encodings(request: web.Request) -> set:
+    accepted = set()
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+
+        accepted.add(token.strip().lower())
+
+    return accepted
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison
+    if header.strip() == "*":
+        return True
+
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag[2:] == etag if tag.startswith("W/") else tag == etag:
+            return True
+
+    return False
+
+
+def parse_range(header: str, size: int):
+    """
+    Parses a single byte range
+    :return: tuple(start, end) (inclusive), None to ignore the header, False if it can't be satisfied
+    """
+    m = range_regex.match(header.strip())
+    if m is None:
+        # Multiple ranges or other units, sending the whole file is allowed
+        return None
+
+    start, end = m.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range: the last n bytes (an empty file has none)
+        length = int(end)
+        if length == 0 or size == 0:
+            return False
+
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+
+    return start, end
+
+
+def respond(request: web.Request, asset: Asset, cache_control: str = CACHE_REVALIDATE) -> web.Response:
+    """
+    Sends an asset, honouring Accept-Encoding, If-None-Match and Range (single ranges, uncompressed only)
+    :param request: aiohttp request
+    :param asset: Asset to send
+    :param cache_control: Cache-Control header (OPTIONAL, revalidate by default)
+    :return: aiohttp Response
+    """
+    range_header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    if range_header and if_range is not None and if_range.strip() != asset.etag():
+        # The client's partial copy is outdated
+        range_header = None
+
+    encoding = None
+    if not range_header and asset.encoded:
+        accepted = _accepted_encodings(request)
+        encoding = next((a for a in ("br", "gzip") if a in asset.encoded and a in accepted), None)
+
+    etag = asset.etag(encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if asset.encoded:
+        headers["Vary"] = "Accept-Encoding"
+
+    charset = "utf-8" if asset.content_type.startswith("text/") else None
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return web.Response(status=304, headers=headers)
+
+    data = asset.data if encoding is None else asset.encoded[encoding]
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    if range_header:
+        byte_range = parse_range(range_header, len(data))
+        if byte_range is False:
+            headers["Content-Range"] = "bytes */{}".format(len(data))
+            return web.Response(status=416, headers=headers)
+
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = "bytes {}-{}/{}".format(start, end, len(data))
+            return web.Response(status=206, body=data[start:end + 1], content_type=asset.content_type,
+                                charset=charset, headers=headers)
+
+    return web.Response(body=data, content_type=asset.content_type, charset=charset, headers=headers)
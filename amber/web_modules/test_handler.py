@@ -0,0 +1,74 @@
+# coding=utf-8
+import asyncio
+import json
+
+import pytest
+
+from amber import Amber, Room
+from amber.engine.saving import SaveManager
+from amber.web_modules.handler import SocketHandler
+from amber.web_modules.web_utils import Status
+
+
+class _Socket:
+    def __init__(self):
+        self.out = []
+
+    async def send(self, data):
+        self.out.append(json.loads(data))
+
+
+@pytest.fixture
+def amber():
+    amber = Amber("Test")
+    hall = Room("Hall", "h", room_id="hall", starting_room=True)
+    yard = Room("Yard", "y", room_id="yard", locations=["hall"])
+    hall.add_location(yard)
+    amber.resolve_world()
+
+    return amber
+
+
+def _connect(amber, data=None) -> SocketHandler:
+    handler = SocketHandler(amber, _Socket())
+    _send(handler, "event", "game/handshake", data or {})
+    return handler
+
+
+def _send(handler: SocketHandler, type_: str, name: str, data=None) -> dict:
+    asyncio.run(handler.handle(type_, name, len(handler.sock.out), data))
+    return handler.sock.out[-1]
+
+
+def test_moving_sends_deltas_without_the_room_twice(amber):
+    handler = _connect(amber)
+
+    reply = _send(handler, "action", "room/enter", {"room": "yard"})
+    assert reply["status"] == Status.OK
+    assert reply["data"]["room"]["id"] == "yard"
+    assert [a["op"] for a in reply["deltas"]] == ["locations"]
+
+    # Nothing changed since
+    assert "deltas" not in _send(handler, "action", "room/get/locations")
+
+
+def test_resuming_a_session_takes_it_over(amber, tmp_path):
+    amber.saves = SaveManager(str(tmp_path))
+
+    first = _connect(amber)
+    session_id = first.sock.out[-1]["data"]["session"]
+
+    second = _connect(amber, {"session": session_id})
+    assert second.session is first.session
+    assert second.sock.out[-1]["data"]["session"] == session_id
+
+    assert _send(first, "action", "room/get")["status"] == Status.FORBIDDEN
+    assert _send(second, "action", "room/get")["status"] == Status.OK
+
+
+def test_actions_need_a_handshake(amber):
+    handler = SocketHandler(amber, _Socket())
+
+    reply = _send(handler, "action", "room/get")
+    assert reply["status"] == Status.ERROR
+    assert reply["data"] == {"message": "handshake required"}
@@ -0,0 +1,133 @@
+# coding=utf-8
+import json
+
+import pytest
+
+from amber import Amber, Room, Item
+from amber.engine import presence
+from amber.engine.session import GameSession
+from amber.web_modules import payloads
+
+
+@pytest.fixture
+def world():
+    amber = Amber("Test")
+    hall = Room("Hall", "A hall", room_id="hall", starting_room=True)
+    yard = Room("Yard", "A yard", room_id="yard", locations=["hall"])
+    road = Room("Road", "A road", room_id="road")
+    hall.add_location(yard)
+    key = Item("Key", "Rusty", item_id="key")
+    amber.resolve_world()
+
+    return amber, hall, yard, road, key
+
+
+@pytest.fixture
+def session(world):
+    session = GameSession(world[0], track_changes=True)
+    token = presence.set_session(session)
+    yield session
+    presence.reset_session(token)
+
+
+def _deltas(session, **kwargs) -> list:
+    result = payloads.deltas(session, session.take_changes(), **kwargs)
+    return [(a["op"], json.loads(payloads.encode(a))) for a in result]
+
+
+def _ops(deltas: list) -> list:
+    return [a[0] for a in deltas]
+
+
+def test_moving_sends_the_room_and_its_locations(world, session):
+    session.walk_to("yard")
+
+    deltas = _deltas(session)
+    assert _ops(deltas) == ["room", "locations"]
+    assert deltas[0][1]["room"]["id"] == "yard"
+    assert [a["id"] for a in deltas[1][1]["locations"]] == ["hall"]
+
+    session.walk_to("hall")
+    assert _ops(_deltas(session, include_room=False)) == ["locations"]
+    assert _deltas(session) == []
+
+
+def test_only_changed_room_fields_are_sent(world, session):
+    amber, hall, yard, road, key = world
+
+    hall.name = "Great hall"
+    deltas = _deltas(session)
+    assert deltas == [("room/update", {"op": "room/update", "fields": {"name": "Great hall"}})]
+
+    # Rooms the player isn't in are fetched when they get there
+    yard.name = "Backyard"
+    assert _deltas(session) == []
+
+
+def test_changed_locations_are_sent(world, session):
+    amber, hall, yard, road, key = world
+
+    hall.add_location(road)
+    deltas = _deltas(session)
+    assert _ops(deltas) == ["locations"]
+    assert [a["id"] for a in deltas[0][1]["locations"]] == ["yard", "road"]
+
+
+def test_inventory_deltas(world, session):
+    amber, hall, yard, road, key = world
+
+    session._add_to_inventory(key)
+    key.name = "Old key"
+    deltas = _deltas(session)
+    # The added item already has the new name
+    assert _ops(deltas) == ["inventory/add"]
+    assert deltas[0][1]["item"]["name"] == "Old key"
+
+    key.name = "Older key"
+    deltas = _deltas(session)
+    assert _ops(deltas) == ["inventory/update"]
+    assert deltas[0][1]["item"]["name"] == "Older key"
+
+    session._remove_from_inventory(key)
+    key.name = "Oldest key"
+    assert _deltas(session) == [("inventory/remove", {"op": "inventory/remove", "id": "key"})]
+
+
+def test_fragments_follow_the_object_version(world):
+    amber, hall, yard, road, key = world
+
+    def cached():
+        return payloads.fragments._fragments.get(("room", "hall"))
+
+    payloads.room_json(hall, message="")
+    first = cached()
+    assert payloads.room_json(hall, message="").raw == "{" + first[1] + ',"msg":""}'
+
+    hall.name = "Great hall"
+    assert json.loads(payloads.room_json(hall).raw)["name"] == "Great hall"
+    assert cached()[0] != first[0]
+    shared = cached()
+
+    # Changed by a session: built for it, the shared fragment stays
+    session = GameSession(amber)
+    token = presence.set_session(session)
+    try:
+        hall.name = "My hall"
+        assert json.loads(payloads.room_json(hall).raw)["name"] == "My hall"
+    finally:
+        presence.reset_session(token)
+
+    assert cached() is shared
+    assert json.loads(payloads.room_json(hall).raw)["name"] == "Great hall"
+
+
+def test_fragments_of_removed_rooms_are_dropped(world):
+    amber, hall, yard, road, key = world
+
+    payloads.room_json(yard)
+    payloads.description_json(yard.description)
+    payloads.item_json(key)
+    assert len(payloads.fragments) == 3
+
+    presence.obj_collector.remove_room(yard)
+    assert len(payloads.fragments) == 1
@@ -0,0 +1,126 @@
+# coding=utf-8
+import asyncio
+import json
+
+import pytest
+
+from amber import Amber, Room
+from amber.web_modules.handler import action
+from amber.web_modules.sockets import Socket, ConnectionClosed
+from amber.web_modules.web_utils import Status
+
+
+HANDSHAKE = {"type": "event", "event": "game/handshake", "data": {}, "req_id": 0}
+
+
+class _Client:
+    def __init__(self, frames: list, replies: int):
+        """
+        Sends the frames, then waits for the replies and disconnects
+        """
+        self.frames = list(frames)
+        self.replies = replies
+        self.out = []
+
+    async def recv(self):
+        if self.frames:
+            frame = self.frames.pop(0)
+            return frame if isinstance(frame, str) else json.dumps(frame)
+
+        while len(self.out) < self.replies:
+            await asyncio.sleep(0.001)
+        raise ConnectionClosed()
+
+    async def send(self, data):
+        self.out.append(json.loads(data))
+
+
+def _request(name: str, req_id: int, data=None) -> dict:
+    return {"type": "action", "action": name, "data": data, "req_id": req_id}
+
+
+def _serve(amber, client: _Client, **kwargs) -> list:
+    asyncio.run(asyncio.wait_for(Socket(amber, **kwargs).parse_socket(client), 10))
+    return client.out
+
+
+@pytest.fixture
+def amber():
+    amber = Amber("Test")
+    Room("Hall", "h", room_id="hall", starting_room=True)
+    amber.resolve_world()
+
+    return amber
+
+
+@pytest.fixture
+def register():
+    names = []
+
+    def register_action(name, fn, read_only=False):
+        action.set_event_handler(name, fn, read_only=read_only, with_session=True)
+        names.append(name)
+
+    yield register_action
+
+    for name in names:
+        action.callbacks.pop(name, None)
+        action.read_only.discard(name)
+        action.modes.pop(name, None)
+        action._with_session.discard(name)
+
+
+def test_errors_are_answered_and_the_connection_stays_open(amber, register):
+    def fail(session, data):
+        raise RuntimeError("broken handler")
+
+    register("test/fail", fail)
+
+    frames = [HANDSHAKE, _request("test/fail", 1), "not json{", "[1, 2]", {"type": "weird", "req_id": 2},
+              {"type": "batch", "data": [1], "req_id": 3}, {"type": "batch", "data": [_request("test/fail", 5)], "req_id": 4},
+              _request("test/nope", 6), _request("room/get", 7)]
+    out = _serve(amber, _Client(frames, replies=9))
+
+    assert [(a["status"], a.get("req_id")) for a in out] == [
+        (Status.OK, 0),
+        (Status.ERROR, 1),
+        (Status.ERROR, None),
+        (Status.ERROR, None),
+        (Status.ERROR, 2),
+        (Status.ERROR, 3),
+        (Status.OK, 4),
+        (Status.MISSING, 6),
+        (Status.OK, 7),
+    ]
+    assert out[2]["data"] == {"message": "invalid message"}
+    assert out[4]["data"] == {"message": "invalid request"}
+    assert out[6]["data"] == [{"status": Status.ERROR, "req_id": 5}]
+    assert out[8]["data"]["id"] == "hall" and out[8]["tag"]
+
+
+def test_read_only_requests_run_concurrently_up_to_the_limit(amber, register):
+    running = []
+    peak = []
+
+    async def slow(session, data):
+        running.append(data)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(data)
+        return Status.OK, {"n": data}
+
+    async def write(session, data):
+        # Every read sent before this one is done
+        peak.append(-len(running))
+        return Status.OK, None
+
+    register("test/slow", slow, read_only=True)
+    register("test/write", write)
+
+    frames = [HANDSHAKE, *(_request("test/slow", a, a) for a in range(1, 11)), _request("test/write", 11)]
+    out = _serve(amber, _Client(frames, replies=12), max_concurrency=3)
+
+    assert max(peak) == 3
+    assert peak[-1] == 0
+    assert sorted(a["data"]["n"] for a in out[1:-1]) == list(range(1, 11))
+    assert out[-1]["req_id"] == 11
@@ -0,0 +1,48 @@
+# coding=utf-8
+import pytest
+
+from amber.web_modules.static import parse_range, etag_matches
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=500-", (500, 999)),
+    ("bytes=999-999", (999, 999)),
+    (" bytes=0-0 ", (0, 0)),
+    # The end is cut to the size
+    ("bytes=0-5000", (0, 999)),
+    # Suffix ranges: the last n bytes
+    ("bytes=-100", (900, 999)),
+    ("bytes=-2000", (0, 999)),
+    # Not satisfiable
+    ("bytes=-0", False),
+    ("bytes=1000-", False),
+    ("bytes=1000-1005", False),
+    ("bytes=5-2", False),
+    # Ignored, the whole file is sent
+    ("bytes=-", None),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+    ("bytes=a-b", None),
+    ("", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+def test_parse_range_of_an_empty_file():
+    assert parse_range("bytes=0-", 0) is False
+    assert parse_range("bytes=-10", 0) is False
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", W/"abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('"ab"', False),
+    ("", False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
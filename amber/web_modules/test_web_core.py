@@ -0,0 +1,97 @@
+# coding=utf-8
+import asyncio
+import os
+import sys
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from amber import Amber, Room
+from amber.engine.saving import SaveManager
+from amber.engine.utils import data_dir
+from amber.web_modules.web_core import make_app
+
+
+MEDIA = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def game_dir(tmp_path, monkeypatch):
+    game = tmp_path / "game"
+    game.mkdir()
+    (game / "img.png").write_bytes(MEDIA)
+    (game / ".env").write_text("SECRET=1")
+    (game / ".amber_cache").mkdir()
+    (game / ".amber_cache" / "world.pickle").write_bytes(b"x")
+
+    # The world cache, inside the game directory
+    monkeypatch.setenv("AMBER_DATA_DIR", str(game / "data"))
+    os.makedirs(data_dir(sys.argv[0]))
+    with open(os.path.join(data_dir(sys.argv[0]), "world.cache"), "wb") as file:
+        file.write(b"x")
+
+    amber = Amber("Test")
+    Room("Hall", "h", room_id="hall", starting_room=True)
+    amber.resolve_world()
+    amber.saves = SaveManager(str(game / "saves"))
+    (game / "saves" / "journal.jsonl").write_text("[]\n")
+    os.symlink(str(game / "saves" / "journal.jsonl"), str(game / "journal.jsonl"))
+
+    return amber, str(game)
+
+
+def _run(amber, game: str, fn):
+    async def run():
+        async with TestClient(TestServer(make_app(amber, game_dir=game))) as client:
+            return await fn(client)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("path", ["saves/journal.jsonl", "journal.jsonl", ".env", ".amber_cache/world.pickle",
+                                  "{data}/world.cache", "../game/.env", "%2e%2e/%2e%2e/etc/passwd", "nope.png"])
+def test_private_files_are_not_served(game_dir, path):
+    async def get(client):
+        return (await client.get("/" + path)).status
+
+    amber, game = game_dir
+    path = path.format(data=os.path.relpath(data_dir(sys.argv[0]), game))
+
+    assert _run(amber, game, get) == 404
+
+
+def test_media_is_served_with_ranges(game_dir):
+    async def get(client):
+        full = await client.get("/img.png")
+        part = await client.get("/img.png", headers={"Range": "bytes=-16"})
+        outside = await client.get("/img.png", headers={"Range": "bytes=5000-"})
+        cached = await client.get("/img.png", headers={"If-None-Match": full.headers["ETag"]})
+
+        return (full.status, await full.read(), part.status, await part.read(), part.headers["Content-Range"],
+                outside.status, cached.status)
+
+    full, data, part, part_data, content_range, outside, cached = _run(*game_dir, get)
+    assert (full, data) == (200, MEDIA)
+    assert (part, part_data, content_range) == (206, MEDIA[-16:], "bytes 1008-1023/1024")
+    assert outside == 416
+    assert cached == 304
+
+
+def test_websocket_handshake(game_dir):
+    async def talk(client):
+        async with client.ws_connect("/ws") as ws:
+            await ws.send_json({"type": "event", "event": "game/handshake", "data": {}, "req_id": 0})
+            handshake = await ws.receive_json()
+
+            await ws.send_str("not json{")
+            invalid = await ws.receive_json()
+
+            await ws.send_json({"type": "action", "action": "room/get", "data": None, "req_id": 1})
+            room = await ws.receive_json()
+
+        return handshake, invalid, room
+
+    handshake, invalid, room = _run(*game_dir, talk)
+    assert handshake["data"]["name"] == "Test"
+    assert invalid["data"] == {"message": "invalid message"}
+    assert room["data"]["id"] == "hall"
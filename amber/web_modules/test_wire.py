@@ -0,0 +1,71 @@
+# coding=utf-8
+import zlib
+
+import pytest
+
+from amber.web_modules import wire
+from amber.web_modules.payloads import RawJSON
+from amber.web_modules.wire import Codec, Encoding, Compression
+
+
+PAYLOAD = {"status": 200, "data": {"room": RawJSON('{"name":"Hall","id":"hall"}'), "items": [1, 2.5, None, "ž"]}}
+DECODED = {"status": 200, "data": {"room": {"name": "Hall", "id": "hall"}, "items": [1, 2.5, None, "ž"]}}
+
+
+@pytest.mark.parametrize("encoding", wire.available_encodings())
+@pytest.mark.parametrize("compression", [None, Compression.DEFLATE])
+def test_round_trip(encoding, compression):
+    codec = Codec(encoding, compression, threshold=0)
+
+    frame = codec.encode(PAYLOAD)
+    assert codec.decode(frame) == DECODED
+
+    if codec.binary:
+        assert frame[0] == (wire.FLAG_DEFLATE if compression else wire.FLAG_PLAIN)
+    else:
+        assert isinstance(frame, str)
+
+
+def test_small_messages_are_not_compressed():
+    codec = Codec(Encoding.JSON, Compression.DEFLATE, threshold=1024)
+
+    assert codec.encode({"a": 1})[0] == wire.FLAG_PLAIN
+    assert codec.encode({"a": "x" * 2000})[0] == wire.FLAG_DEFLATE
+
+
+def test_text_frames_are_json():
+    codec = Codec(Encoding.JSON, Compression.DEFLATE)
+    assert codec.decode('{"type": "event"}') == {"type": "event"}
+
+
+def test_frames_inflating_past_the_limit_are_refused():
+    codec = Codec(Encoding.JSON, Compression.DEFLATE)
+    bomb = bytes((wire.FLAG_DEFLATE, )) + zlib.compress(b" " * (wire.MAX_FRAME + 1))
+
+    with pytest.raises(ValueError):
+        codec.decode(bomb)
+
+    at_limit = b'"' + b"x" * (wire.MAX_FRAME - 2) + b'"'
+    assert len(codec.decode(bytes((wire.FLAG_DEFLATE, )) + zlib.compress(at_limit))) == wire.MAX_FRAME - 2
+
+
+def test_unavailable_encodings_are_refused():
+    with pytest.raises(ValueError):
+        Codec("xml")
+
+
+def test_negotiate_picks_the_first_available_offer():
+    codec = wire.negotiate({"encodings": ["xml", *reversed(wire.available_encodings())],
+                            "compression": ["br", Compression.DEFLATE], "compressionThreshold": 10})
+    assert codec.encoding == wire.available_encodings()[-1]
+    assert codec.compression == Compression.DEFLATE
+    assert codec.threshold == 10
+
+
+@pytest.mark.parametrize("data", [None, {}, {"encodings": "msgpack", "compression": "nodeflate", "compressionThreshold": -1},
+                                  {"encodings": None, "compressionThreshold": "10"}])
+def test_negotiate_falls_back_to_plain_json(data):
+    codec = wire.negotiate(data)
+    assert codec.encoding == Encoding.JSON
+    assert codec.threshold == wire.COMPRESSION_THRESHOLD
+    assert not codec.binary
@@ -3,93 +3,244 @@ import asyncio
 import webbrowser
 import logging
 import os
+import re
 import sys
 import time
+from html import escape
 from random import randint
 
-from flask import Flask, render_template_string, send_from_directory, request
-from amber.web_modules.sockets import Socket
+from aiohttp import web
+from amber.web_modules.sockets import Socket, WebSocketAdapter, ConnectionClosed
 from amber.web_modules.web_utils import threaded
+from amber.web_modules import static, media, wire
+from amber.engine.executor import executors
+from amber.engine.utils import data_dir
 
 
 MODULE_DIR = os.path.abspath(os.path.dirname(__file__))
-FRONTEND_DIR = os.path.join(MODULE_DIR, "..", "frontend")
+FRONTEND_DIR = os.path.abspath(os.path.join(MODULE_DIR, "..", "frontend"))
+ASSETS_DIR = os.path.join(FRONTEND_DIR, "assets")
 
 GAME_DIR = os.path.abspath(os.path.dirname(sys.argv[0]))
 
 HOST = "localhost"
-FLASK_PORT = randint(8560, 8566)
-SOCKET_PORT = randint(8567, 8573)
-
-app = Flask(__name__)
-loop = asyncio.get_event_loop()
-# socket = Socket(loop, HOST, SOCKET_PORT)
+# The page, game files and the websocket (/ws) are all served on this port
+PORT = randint(8560, 8573)
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
 
-logging.getLogger("werkzeug").setLevel(logging.WARNING)
+logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+
+# Application state
+amber_key = web.AppKey("amber", object)
+socket_key = web.AppKey("socket", Socket)
+address_key = web.AppKey("address", tuple)
+game_dir_key = web.AppKey("game_dir", str)
+# Directories in (or under) the game directory that are never served (saves, caches)
+private_key = web.AppKey("private", tuple)
+media_key = web.AppKey("media", media.MediaCache)
+# Production mode only
+assets_key = web.AppKey("assets", static.AssetStore)
+index_key = web.AppKey("index", static.Asset)
+
+# {{ name }} placeholders in index.html
+template_regex = re.compile(r"{{\s*(\w+)\s*}}")
 
 
-@app.route("/")
-def main_page():
+def render_index(**values) -> str:
     with open(os.path.join(FRONTEND_DIR, "index.html"), "r") as file:
-        return render_template_string(file.read(), host=HOST, port=SOCKET_PORT)
+        return template_regex.sub(lambda m: escape(str(values.get(m.group(1), ""))), file.read())
 
 
-# ONLY FOR DEVELOPMENT!
-@app.after_request
-def add_header(r):
+def _safe_join(directory: str, path: str):
     """
-    Removes caching
+    Joins a request path to a directory, None if it points outside of it
     """
-    if request.path != "/":
-        return r
+    full = os.path.abspath(os.path.join(directory, path))
+    if full != directory and not full.startswith(directory + os.sep):
+        return None
 
-    r.headers["Cache-Control"] = "no-cache, no-store, must-revalidate, max-age=0"
-    r.headers["Pragma"] = "no-cache"
-    r.headers["Expires"] = "0"
-    # r.headers['Cache-Control'] = 'public, max-age=0'
-    return r
+    return full
 
 
-@app.route("/<path:url>")
-def simplify(url: str):
-    if url.startswith(("assets/", "/assets")):
-        l_path, filename = os.path.split(url)
-        return send_from_directory(os.path.join(FRONTEND_DIR, l_path), filename)
-    else:
-        f_path, fn = os.path.split(os.path.join(GAME_DIR, url))
-        return send_from_directory(f_path, fn)
+def _is_private(directory: str, path: str, private: tuple) -> bool:
+    """
+    Whether a game file must not be served: hidden files and directories, saves and caches
+    """
+    if any(a.startswith(".") for a in os.path.relpath(path, directory).split(os.sep)):
+        return True
+
+    # Symlinks into a private directory are private too
+    path = os.path.realpath(path)
+    return any(path == a or path.startswith(a + os.sep) for a in private)
+
+
+def _file_response(path) -> web.StreamResponse:
+    if path is None or not os.path.isfile(path):
+        raise web.HTTPNotFound()
+
+    # Sent with sendfile (zero-copy) where the platform supports it
+    return web.FileResponse(path)
+
+
+##############
+# ROUTES
+##############
 
+async def main_page(request: web.Request):
+    host, port = request.app[address_key]
+    page = render_index(host=host, port=port, pageName=request.app[amber_key].name)
 
-@threaded
-def _run_flask():
-    app.run(debug=False, host=HOST, port=FLASK_PORT)
+    # ONLY FOR DEVELOPMENT: removes caching
+    return web.Response(text=page, content_type="text/html", headers={
+        "Cache-Control": "no-cache, no-store, must-revalidate, max-age=0",
+        "Pragma": "no-cache",
+        "Expires": "0",
+    })
 
 
-def run_web(amber_inst, open_browser=True):
+async def websocket(request: web.Request):
+    ws = web.WebSocketResponse(max_msg_size=wire.MAX_FRAME)
+    await ws.prepare(request)
 
     try:
-        log.info("Starting flask server...")
-        _run_flask()
-        log.info("Flask server running")
+        await request.app[socket_key].parse_socket(WebSocketAdapter(ws))
+    except ConnectionClosed:
+        log.info("Client disconnected")
+
+    return ws
+
+
+async def metrics(request: web.Request):
+    # Queue depth of the thread/process pools that run handlers
+    return web.json_response({"executors": executors.metrics()})
+
+
+async def frontend_asset(request: web.Request):
+    return _file_response(_safe_join(ASSETS_DIR, request.match_info["path"]))
+
+
+# PRODUCTION MODE
+# The index page and assets are loaded (and precompressed) once at startup and served from memory
+
+async def cached_main_page(request: web.Request):
+    return static.respond(request, request.app[index_key])
+
+
+async def cached_frontend_asset(request: web.Request):
+    asset = request.app[assets_key].get(request.match_info["path"])
+    if asset is None:
+        raise web.HTTPNotFound()
+
+    # Content-hashed URLs (from the index page) never change
+    if request.query.get("v") == asset.version:
+        return static.respond(request, asset, static.CACHE_IMMUTABLE)
+
+    return static.respond(request, asset)
 
-        socket = Socket(amber_inst, loop, HOST, SOCKET_PORT)
-        page_url = "http://{}:{}".format(HOST, FLASK_PORT)
 
-        # no async here
-        @threaded
-        def open_br():
-            time.sleep(1)
-            webbrowser.open(page_url)
+async def game_file(request: web.Request):
+    game_dir = request.app[game_dir_key]
+    path = _safe_join(game_dir, request.match_info["path"])
+    if path is None or _is_private(game_dir, path, request.app[private_key]) or not os.path.isfile(path):
+        raise web.HTTPNotFound()
+
+    # Whole files go out with sendfile (zero-copy from the page cache),
+    # byte ranges (seeking in audio) are sliced from the mapped file
+    if "Range" not in request.headers:
+        return _file_response(path)
+
+    mapped = request.app[media_key].get(path)
+    if mapped is None:
+        # Too big for the cache
+        return _file_response(path)
+
+    return media.respond(request, mapped)
+
+
+def make_app(amber_inst, host: str = HOST, port: int = PORT, game_dir: str = GAME_DIR,
+             production: bool = False, media_cache_size: int = media.MEDIA_CACHE_SIZE) -> web.Application:
+    """
+    Creates the web application: the page, frontend assets, game files and the websocket on one port
+    :param amber_inst: Amber instance
+    :param host: host the page connects the websocket to
+    :param port: port the page connects the websocket to
+    :param game_dir: directory game files (images, sounds) are served from
+    :param production: Serve the page and assets from memory with caching headers (OPTIONAL, defaults to False)
+    :param media_cache_size: How many bytes of game media can be kept mapped in memory (OPTIONAL, 0 disables the cache)
+    :return: aiohttp.web.Application
+    """
+    app = web.Application()
+    app[amber_key] = amber_inst
+    app[socket_key] = Socket(amber_inst)
+    app[address_key] = (host, port)
+    app[game_dir_key] = os.path.abspath(game_dir)
+
+    # Saves hold every player's session id (enough to resume their game), a save_dir or AMBER_DATA_DIR
+    # inside the game directory must not make them downloadable
+    saves = getattr(amber_inst, "saves", None)
+    app[private_key] = tuple(os.path.realpath(a) for a in
+                             ([saves.directory] if saves is not None else []) + [data_dir(sys.argv[0])])
+    app[media_key] = media.MediaCache(media_cache_size)
+
+    if production:
+        assets = static.AssetStore(ASSETS_DIR, "assets/")
+        page = assets.rewrite_urls(render_index(host=host, port=port, pageName=amber_inst.name))
+
+        app[assets_key] = assets
+        app[index_key] = static.Asset(page.encode("utf-8"), "text/html", compress=True)
+
+        app.router.add_get("/", cached_main_page)
+        app.router.add_get("/assets/{path:.+}", cached_frontend_asset)
+    else:
+        app.router.add_get("/", main_page)
+        app.router.add_get("/assets/{path:.+}", frontend_asset)
+
+    app.router.add_get("/ws", websocket)
+    app.router.add_get("/_amber/metrics", metrics)
+    # Game media
+    app.router.add_get("/{path:.+}", game_file)
+
+    return app
+
+
+async def serve(amber_inst, host: str = HOST, port: int = PORT, game_dir: str = GAME_DIR,
+                production: bool = False, media_cache_size: int = media.MEDIA_CACHE_SIZE) -> web.AppRunner:
+    """
+    Starts the server on the running loop, see make_app
+    :return: AppRunner (call .cleanup() to stop)
+    """
+    runner = web.AppRunner(make_app(amber_inst, host, port, game_dir, production, media_cache_size))
+    await runner.setup()
+
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def run_web(amber_inst, open_browser=True, production=False):
+    page_url = "http://{}:{}".format(HOST, PORT)
+
+    # no async here
+    @threaded
+    def open_br():
+        time.sleep(1)
+        webbrowser.open(page_url)
+
+    async def run():
+        runner = await serve(amber_inst, production=production)
+        log.info("Serving to {}".format(page_url))
 
         if open_browser:
             open_br()
-        log.info("Serving to {}".format(page_url))
 
-        loop.create_task(socket.start(amber_inst))
-        loop.run_forever()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    try:
+        asyncio.run(run())
     except:
         log.critical("Loop exception raised, exiting")
-        raise
\ No newline at end of file
+        raise
@@ -23,3 +23,5 @@ class Status:
     FORBIDDEN = "forbidden"
     MISSING = "missing"
     ERROR = "error"
+    # Conditional fetch: the client already has this version
+    NOT_MODIFIED = "not_modified"
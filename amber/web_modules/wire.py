@@ -0,0 +1,179 @@
+# coding=utf-8
+
+##############
+# Wire formats (JSON, MessagePack, CBOR) and compression negotiated on game/handshake
+##############
+
+import logging
+import zlib
+try:
+    from ujson import loads
+except ImportError:
+    from json import loads
+
+from .payloads import RawJSON, encode as encode_json
+
+# Optional encodings
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+log = logging.getLogger(__name__)
+
+
+class Encoding:
+    JSON = "json"
+    MSGPACK = "msgpack"
+    CBOR = "cbor"
+
+
+class Compression:
+    DEFLATE = "deflate"
+
+
+# Messages smaller than this (in bytes) are never compressed
+COMPRESSION_THRESHOLD = 1024
+# Largest client frame (in bytes), also after decompressing it
+MAX_FRAME = 1024 * 1024
+
+# First byte of every binary frame
+FLAG_PLAIN = 0x00
+FLAG_DEFLATE = 0x01
+
+
+def _raw_to_obj(obj):
+    # Cached JSON fragments have to be decoded for the binary encodings
+    if isinstance(obj, RawJSON):
+        return loads(obj.raw)
+
+    raise TypeError("can't encode {}".format(type(obj).__name__))
+
+
+def _cbor_default(encoder, obj):
+    encoder.encode(_raw_to_obj(obj))
+
+
+class Codec:
+    __slots__ = (
+        "encoding", "compression", "threshold"
+    )
+
+    def __init__(self, encoding: str = Encoding.JSON, compression: str = None, threshold: int = COMPRESSION_THRESHOLD):
+        """
+        Encodes outgoing and decodes incoming messages of one connection
+        :param encoding: Encoding
+        :param compression: Compression or None
+        :param threshold: Minimal size (in bytes) for compressing a message
+        """
+        if encoding not in available_encodings():
+            raise ValueError("encoding {} is not available".format(encoding))
+
+        self.encoding = encoding
+        self.compression = compression
+        self.threshold = threshold
+
+    @property
+    def binary(self) -> bool:
+        return self.encoding != Encoding.JSON or self.compression is not None
+
+    def _dumps(self, payload):
+        if self.encoding == Encoding.MSGPACK:
+            return msgpack.packb(payload, default=_raw_to_obj)
+        if self.encoding == Encoding.CBOR:
+            return cbor2.dumps(payload, default=_cbor_default)
+
+        return encode_json(payload)
+
+    def _loads(self, data: bytes):
+        if self.encoding == Encoding.MSGPACK:
+            return msgpack.unpackb(data)
+        if self.encoding == Encoding.CBOR:
+            return cbor2.loads(data)
+
+        return loads(data)
+
+    def encode(self, payload):
+        """
+        Encodes a payload into a websocket frame
+        :return: str (plain JSON, text frame) or bytes (binary frame: flag byte + data)
+        """
+        data = self._dumps(payload)
+        if not self.binary:
+            return data
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        if self.compression == Compression.DEFLATE and len(data) >= self.threshold:
+            return bytes((FLAG_DEFLATE, )) + zlib.compress(data)
+
+        return bytes((FLAG_PLAIN, )) + data
+
+    def decode(self, frame):
+        """
+        Decodes a websocket frame. Text frames are always JSON.
+        :raises ValueError: if a compressed frame inflates to more than MAX_FRAME bytes
+        """
+        if isinstance(frame, str):
+            return loads(frame)
+
+        flag, data = frame[0], frame[1:]
+        if flag == FLAG_DEFLATE:
+            # Stops at MAX_FRAME, a small frame can inflate to gigabytes
+            inflater = zlib.decompressobj()
+            data = inflater.decompress(data, MAX_FRAME)
+            if inflater.unconsumed_tail:
+                raise ValueError("compressed frame is larger than {} bytes".format(MAX_FRAME))
+
+        return self._loads(data)
+
+
+def available_encodings() -> tuple:
+    encodings = [Encoding.JSON]
+    if msgpack is not None:
+        encodings.append(Encoding.MSGPACK)
+    if cbor2 is not None:
+        encodings.append(Encoding.CBOR)
+
+    return tuple(encodings)
+
+
+def _offers(value) -> list:
+    # Offers are lists, anything else offers nothing ("deflate" in "nodeflate" would match)
+    return value if isinstance(value, list) else []
+
+
+def negotiate(data: dict) -> Codec:
+    """
+    Picks the first encoding/compression the client offers that is available here
+    :param data: handshake data: dict(encodings: list, compression: list, compressionThreshold: int), all OPTIONAL
+    :return: Codec
+    """
+    data = data or {}
+
+    encoding = Encoding.JSON
+    for offered in _offers(data.get("encodings")):
+        if offered in available_encodings():
+            encoding = offered
+            break
+
+    compression = None
+    if Compression.DEFLATE in _offers(data.get("compression")):
+        compression = Compression.DEFLATE
+
+    threshold = data.get("compressionThreshold")
+    if not isinstance(threshold, int) or threshold < 0:
+        threshold = COMPRESSION_THRESHOLD
+
+    return Codec(encoding, compression, threshold)
+
+
+# Until a connection negotiates something else
+default_codec = Codec()
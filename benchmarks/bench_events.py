@@ -0,0 +1,61 @@
+# coding=utf-8
+
+##############
+# Benchmark: construction and property getter cost with and without event handlers
+# Usage: python -m benchmarks.bench_events
+##############
+
+import logging
+import timeit
+
+from amber import Amber, Room, Item
+
+logging.disable(logging.WARNING)
+
+ITEMS = 20000
+ROOMS = 1000
+GETTER_CALLS = 200000
+
+
+def _report(label: str, seconds: float, count: int):
+    print("{:<36} {:>10.3f} us".format(label, seconds / count * 1e6))
+
+
+def main():
+    Amber("Benchmark")
+
+    # Construction
+    counter = iter(range(10 ** 9))
+
+    def make_item():
+        i = next(counter)
+        Item("Item {}".format(i), "Description {}".format(i), item_id="item_{}".format(i))
+
+    def make_room():
+        i = next(counter)
+        Room("Room {}".format(i), "Description {}".format(i), room_id="room_{}".format(i))
+
+    _report("Item()", timeit.timeit(make_item, number=ITEMS), ITEMS)
+    _report("Room()", timeit.timeit(make_room, number=ROOMS), ROOMS)
+
+    # Getters
+    plain = Room("Plain", "No handlers", room_id="plain")
+    handled = Room("Handled", "Has a name handler", room_id="handled")
+
+    @handled.event("name")
+    def name_handler(name):
+        return None
+
+    item = Item("Plain item", "No handlers", item_id="plain_item")
+
+    for label, fn in (("Room.name (no handler)", lambda: plain.name),
+                      ("Room.image (no handler)", lambda: plain.image),
+                      ("Room.locations (no handler)", lambda: plain.locations),
+                      ("Item.name (no handler)", lambda: item.name),
+                      ("Room.name (name handler)", lambda: handled.name),
+                      ("Room.image (name handler)", lambda: handled.image)):
+        _report(label, min(timeit.repeat(fn, number=GETTER_CALLS, repeat=3)), GETTER_CALLS)
+
+
+if __name__ == "__main__":
+    main()
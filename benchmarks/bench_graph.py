@@ -0,0 +1,152 @@
+# coding=utf-8
+
+##############
+# Benchmark: shortest paths on large grid and random worlds (WorldGraph), compared to searching through Room.locations
+# Usage: python -m benchmarks.bench_graph [grid|random]
+##############
+
+import logging
+import random
+import subprocess
+import sys
+import time
+from collections import deque
+
+from amber import Amber, Room
+from amber.engine import presence
+
+logging.disable(logging.WARNING)
+
+# Rooms on a side of the (wrapping) grid
+GRID = 300
+# Rooms of the random world and their locations
+RANDOM_ROOMS = 90000
+RANDOM_DEGREE = 3
+QUERIES = 100
+TRAVELS = 20
+UPDATES = 1000
+
+
+def _grid_id(x: int, y: int) -> str:
+    return "g{}_{}".format(x % GRID, y % GRID)
+
+
+def _grid_distance(room_id: str, goal_id: str) -> int:
+    # Manhattan distance on the wrapping grid, a lower bound of the steps
+    x1, y1 = (int(a) for a in room_id[1:].split("_"))
+    x2, y2 = (int(a) for a in goal_id[1:].split("_"))
+    dx, dy = abs(x1 - x2), abs(y1 - y2)
+    return min(dx, GRID - dx) + min(dy, GRID - dy)
+
+
+def _build_grid() -> list:
+    for y in range(GRID):
+        for x in range(GRID):
+            Room("Room {} {}".format(x, y), locations=[_grid_id(x + 1, y), _grid_id(x, y + 1), _grid_id(x - 1, y), _grid_id(x, y - 1)],
+                 room_id=_grid_id(x, y), starting_room=x == y == 0)
+
+    return [_grid_id(x, y) for y in range(GRID) for x in range(GRID)]
+
+
+def _build_random() -> list:
+    rnd = random.Random(2)
+    ids = ["n{}".format(i) for i in range(RANDOM_ROOMS)]
+
+    for i, room_id in enumerate(ids):
+        # A ring keeps every room reachable, the other locations are random shortcuts
+        locations = [ids[(i + 1) % RANDOM_ROOMS]] + rnd.sample(ids, RANDOM_DEGREE - 1)
+        Room("Node {}".format(i), locations=locations, room_id=room_id, starting_room=i == 0)
+
+    return ids
+
+
+def _naive_path(start: Room, goal: Room) -> list:
+    # What finding a path looked like without the index: walking Room.locations
+    parents = {start.id: None}
+    queue = deque((start, ))
+
+    while queue:
+        room = queue.popleft()
+        for location in room.locations:
+            if location.id not in parents:
+                parents[location.id] = room.id
+                if location is goal:
+                    return [location.id]
+                queue.append(location)
+
+    return None
+
+
+def _time(fn, pairs) -> float:
+    start = time.perf_counter()
+    for a, b in pairs:
+        fn(a, b)
+
+    return (time.perf_counter() - start) / len(pairs) * 1000
+
+
+def _run(name: str, build, heuristic=None):
+    amber = Amber("Benchmark")
+
+    start = time.perf_counter()
+    ids = build()
+    amber.resolve_world()
+    print("{}: {} rooms (world built in {:.1f}s)".format(name, len(ids), time.perf_counter() - start))
+
+    collector = presence.obj_collector
+    graph = collector.graph
+    rnd = random.Random(1)
+    pairs = [(rnd.choice(ids), rnd.choice(ids)) for _ in range(QUERIES)]
+    rooms = [(collector.find_room_by_id(a), collector.find_room_by_id(b)) for a, b in pairs]
+
+    naive = _time(_naive_path, rooms[:QUERIES // 10])
+    bfs = _time(lambda a, b: graph._bfs(a, b, graph.locations), pairs)
+    both = _time(graph.shortest_path, pairs)
+    cached = _time(graph.shortest_path, pairs)
+    lengths = [len(graph.shortest_path(a, b)) - 1 for a, b in pairs]
+
+    print("  {:<32} {:>10.3f} ms".format("Room.locations search", naive))
+    print("  {:<32} {:>10.3f} ms".format("WorldGraph breadth-first", bfs))
+    print("  {:<32} {:>10.3f} ms".format("WorldGraph bidirectional", both))
+    if heuristic is not None:
+        graph._changed()
+        print("  {:<32} {:>10.3f} ms".format("WorldGraph A* (manhattan)",
+                                              _time(lambda a, b: graph.shortest_path(a, b, heuristic=heuristic), pairs)))
+    print("  {:<32} {:>10.3f} ms".format("cached", cached))
+    print("  average path: {:.1f} steps".format(sum(lengths) / len(lengths)))
+
+    # Incremental updates: a new location invalidates the cached paths, the index isn't rebuilt
+    room = collector.find_room_by_id(ids[0])
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        room.add_location(ids[i + 1])
+        room.remove_location(ids[i + 1])
+    print("  {:<32} {:>10.3f} ms".format("add + remove location", (time.perf_counter() - start) / UPDATES * 1000))
+
+    # Travelling walks every step (enter events run), the paths are already cached
+    session = amber.session
+    for a, b in pairs[:TRAVELS]:
+        graph.shortest_path(a, b, heuristic=heuristic)
+
+    start = time.perf_counter()
+    steps = 0
+    for a, b in pairs[:TRAVELS]:
+        session.current_room = collector.find_room_by_id(a)
+        steps += len(session.travel_to(b, heuristic))
+    print("  {:<32} {:>10.3f} ms ({:.1f} us per step)".format(
+        "travel_to", (time.perf_counter() - start) / TRAVELS * 1000, (time.perf_counter() - start) / steps * 1e6))
+
+
+def main():
+    # Amber and the world are singletons, so each world is built in its own process
+    if len(sys.argv) > 1 and sys.argv[1] == "random":
+        _run("Random, {} locations per room".format(RANDOM_DEGREE), _build_random)
+    elif len(sys.argv) > 1 and sys.argv[1] == "grid":
+        _run("Grid {0}x{0}".format(GRID), _build_grid, _grid_distance)
+    else:
+        for world in ("grid", "random"):
+            subprocess.run([sys.executable, "-m", "benchmarks.bench_graph", world], check=True)
+
+
+if __name__ == "__main__":
+    main()
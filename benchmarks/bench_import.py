@@ -0,0 +1,67 @@
+# coding=utf-8
+
+##############
+# Benchmark: time to import amber (python -X importtime), for tools, tests and workers that only use the engine.
+# Fails if importing the engine loads the web server.
+# Usage: python -m benchmarks.bench_import
+##############
+
+import os
+import statistics
+import subprocess
+import sys
+
+REPEAT = 7
+
+SCENARIOS = (
+    ("import amber", "import amber"),
+    ("import amber + web server", "import amber; amber.run_web"),
+)
+
+# Prints the modules of the web server that "import amber" loaded (there must be none)
+CHECK = """
+import sys
+import amber
+print(" ".join(a for a in sys.modules if a.split(".")[0] in ("aiohttp", "asyncio", "multiprocessing") or a.startswith("amber.web_modules")))
+"""
+
+
+def _import_time(code: str) -> float:
+    """
+    :return: import time (ms) of the amber modules the code imports, from -X importtime
+    """
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            check=True, capture_output=True, text=True).stderr
+
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        # Unindented: imported by the code itself, not by another module
+        if name.startswith(" ") and not name.startswith("  ") and name.strip().startswith("amber"):
+            total += int(cumulative)
+
+    return total / 1000
+
+
+def main():
+    env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    os.environ["PYTHONPATH"] = env_path + os.pathsep + os.environ.get("PYTHONPATH", "")
+
+    print("{:<28} {:>12} {:>12}".format("", "median (ms)", "min (ms)"))
+    for name, code in SCENARIOS:
+        times = [_import_time(code) for _ in range(REPEAT)]
+        print("{:<28} {:>12.1f} {:>12.1f}".format(name, statistics.median(times), min(times)))
+
+    loaded = subprocess.run([sys.executable, "-c", CHECK], check=True, capture_output=True, text=True).stdout.split()
+    if loaded:
+        print("import amber loaded the web server: {}".format(", ".join(sorted(loaded))))
+        sys.exit(1)
+
+    print("import amber loads no web modules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# coding=utf-8
+
+##############
+# Benchmark: building a world with the Python constructors vs. streaming it from a world data file
+# Every variant runs in its own process, so peak memory is comparable
+# Usage: python -m benchmarks.bench_loader [rooms]
+##############
+
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOMS = 100000
+
+CONSTRUCTORS = '''
+import logging, resource, sys, time
+logging.disable(logging.WARNING)
+from amber import Amber, Room, Item, Blueprint, Description
+
+rooms = int(sys.argv[1])
+start = time.perf_counter()
+amber = Amber("Benchmark")
+
+for i in range(rooms):
+    Item("Thing {}".format(i), "A thing", item_id="thing_{}".format(i))
+for i in range(rooms):
+    desc = Description("Room {} has {{item|thing_{}}} and a door to {{room|room_{}}}".format(i, i, (i + 1) % rooms),
+                       desc_id="desc_{}".format(i))
+    Room("Room {}".format(i), desc, locations=["room_{}".format((i + 1) % rooms)], room_id="room_{}".format(i),
+         starting_room=i == 0)
+for i in range(0, rooms - 1, 2):
+    Blueprint("thing_{}".format(i), "thing_{}".format(i + 1), "thing_{}".format(i), recipe_id="bp_{}".format(i))
+amber._lazy_load()
+
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+LOADER = '''
+import logging, resource, sys, time
+logging.disable(logging.WARNING)
+from amber import Amber
+
+start = time.perf_counter()
+Amber("Benchmark").load_world(sys.argv[1])
+
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def _records(rooms: int):
+    # Rooms come first, so every reference to an item is a forward one
+    for i in range(rooms):
+        yield {"type": "description", "id": "desc_{}".format(i),
+               "text": "Room {} has {{item|thing_{}}} and a door to {{room|room_{}}}".format(i, i, (i + 1) % rooms)}
+        yield {"type": "room", "id": "room_{}".format(i), "name": "Room {}".format(i), "description_id": "desc_{}".format(i),
+               "locations": ["room_{}".format((i + 1) % rooms)], "starting": i == 0}
+    for i in range(0, rooms - 1, 2):
+        yield {"type": "blueprint", "id": "bp_{}".format(i), "ingredients": ["thing_{}".format(i), "thing_{}".format(i + 1)],
+               "result": "thing_{}".format(i)}
+    for i in range(rooms):
+        yield {"type": "item", "id": "thing_{}".format(i), "name": "Thing {}".format(i), "description": "A thing"}
+
+
+def _run(code: str, arg: str) -> tuple:
+    out = subprocess.run([sys.executable, "-c", code, arg], check=True, capture_output=True, text=True).stdout
+    seconds, max_rss = out.split()
+    return float(seconds), int(max_rss) / 1024
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else ROOMS
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "world.jsonl")
+        with open(path, "w", encoding="utf-8") as file:
+            for record in _records(rooms):
+                file.write(json.dumps(record) + "\n")
+
+        with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+
+        env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        os.environ["PYTHONPATH"] = env_path + os.pathsep + os.environ.get("PYTHONPATH", "")
+
+        print("{} rooms, {} items, data file {:.1f} MiB ({:.1f} MiB gzipped)".format(
+            rooms, rooms, os.path.getsize(path) / 1024 / 1024, os.path.getsize(path + ".gz") / 1024 / 1024))
+        print("{:<24} {:>10} {:>16}".format("", "time (s)", "peak RSS (MiB)"))
+
+        for name, code, arg in (("python constructors", CONSTRUCTORS, str(rooms)),
+                                ("load_world .jsonl", LOADER, path),
+                                ("load_world .jsonl.gz", LOADER, path + ".gz")):
+            print("{:<24} {:>10.3f} {:>16.1f}".format(name, *min(_run(code, arg) for _ in range(3))))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# coding=utf-8
+
+##############
+# Benchmark: id lookups in ObjectCollector as the world grows
+# Usage: python -m benchmarks.bench_lookup
+##############
+
+import logging
+import random
+import timeit
+
+from amber import Amber, Item, Blueprint
+from amber.engine import presence
+
+logging.disable(logging.WARNING)
+
+SIZES = (1000, 10000, 50000, 200000)
+LOOKUPS = 20000
+
+
+def _grow_world(to_size: int, current: int):
+    # Rooms always create a Description with a generated id, so the world is grown with items and blueprints
+    for i in range(current, to_size):
+        Item("Item {}".format(i), item_id="item_{}".format(i))
+
+        if i % 2:
+            Blueprint("item_{}".format(i - 1), "item_{}".format(i), "item_{}".format(i), recipe_id="bp_{}".format(i))
+
+
+def main():
+    Amber("Benchmark")
+    collector = presence.obj_collector
+
+    print("{:>8} {:>16} {:>16} {:>16}".format("objects", "item (us)", "recipe (us)", "typed (us)"))
+
+    current = 0
+    for size in SIZES:
+        _grow_world(size, current)
+        current = size
+
+        items = ["item_{}".format(random.randrange(size)) for _ in range(LOOKUPS)]
+        recipes = ["bp_{}".format(random.randrange(1, size, 2)) for _ in range(LOOKUPS)]
+
+        def lookup_items():
+            for i in items:
+                collector.find_item_by_id(i)
+
+        def lookup_recipes():
+            for r in recipes:
+                collector.find_recipe_by_id(r)
+
+        def lookup_typed():
+            for i in items:
+                collector.find_typed_by_id(i)
+
+        per_call = [min(timeit.repeat(fn, number=1, repeat=3)) / LOOKUPS * 1e6
+                    for fn in (lookup_items, lookup_recipes, lookup_typed)]
+
+        print("{:>8} {:>16.3f} {:>16.3f} {:>16.3f}".format(size + size // 2, *per_call))
+
+
+if __name__ == "__main__":
+    main()
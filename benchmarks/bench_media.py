@@ -0,0 +1,85 @@
+# coding=utf-8
+
+##############
+# Benchmark: many clients downloading (and seeking in) the same audio file,
+# with and without the mapped media cache (whole files always go out with sendfile)
+# Usage: python -m benchmarks.bench_media [clients]
+##############
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from amber import Amber
+from benchmarks.bench_server import HOST, _build_world, _free_port, _start_server
+
+logging.disable(logging.WARNING)
+
+CLIENTS = 100
+REQUESTS = 1000
+FILE_SIZE = 8 * 1024 * 1024
+# Seeking in the browser requests ranges of about this size
+RANGE_SIZE = 256 * 1024
+
+
+async def _bench(url: str, clients: int, requests: int, ranged: bool) -> tuple:
+    per_client = requests // clients
+    received = 0
+    rng = random.Random(1)
+
+    async with aiohttp.ClientSession() as http:
+        async def client():
+            nonlocal received
+            for _ in range(per_client):
+                headers = {}
+                if ranged:
+                    start = rng.randrange(0, FILE_SIZE - RANGE_SIZE)
+                    headers["Range"] = "bytes={}-{}".format(start, start + RANGE_SIZE - 1)
+
+                async with http.get(url, headers=headers) as resp:
+                    body = await resp.read()
+                received += len(body)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return per_client * clients / elapsed, received / elapsed / 1024 / 1024
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else CLIENTS
+
+    amber = Amber("Benchmark")
+    _build_world(amber)
+
+    with tempfile.TemporaryDirectory() as game_dir:
+        with open(os.path.join(game_dir, "theme.ogg"), "wb") as file:
+            file.write(os.urandom(FILE_SIZE))
+
+        servers = (
+            ("no media cache", _free_port(), 0),
+            ("media cache", _free_port(), FILE_SIZE * 2),
+        )
+        loops = [_start_server(amber, port, game_dir, media_cache_size=size) for _, port, size in servers]
+
+        print("{} clients, {} MiB file".format(clients, FILE_SIZE // 1024 // 1024))
+        print("{:<22} {:<18} {:>10} {:>10}".format("server", "requests", "req/s", "MiB/s"))
+        for label, port, _ in servers:
+            url = "http://{}:{}/theme.ogg".format(HOST, port)
+            for ranged, name in ((False, "whole file"), (True, "256 KiB ranges")):
+                rps, mbps = asyncio.run(_bench(url, clients, REQUESTS, ranged))
+                print("{:<22} {:<18} {:>10.0f} {:>10.1f}".format(label, name, rps, mbps))
+
+        for loop in loops:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
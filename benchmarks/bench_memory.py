@@ -0,0 +1,54 @@
+# coding=utf-8
+
+##############
+# Benchmark: bytes per world object, measured with tracemalloc
+# Usage: python -m benchmarks.bench_memory
+##############
+
+import gc
+import logging
+import tracemalloc
+
+from amber import Amber, Room, Item, Blueprint, Description
+
+logging.disable(logging.WARNING)
+
+COUNT = 5000
+
+
+def _measure(label: str, build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    objects = build()
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print("{:<28} {:>12.1f}".format(label, total / len(objects)))
+    return objects
+
+
+def main():
+    amber = Amber("Benchmark")
+
+    print("{:<28} {:>12}".format("object", "bytes/object"))
+
+    _measure("Item", lambda: [Item("Item {}".format(i), "Item description", item_id="item_{}".format(i))
+                              for i in range(COUNT)])
+    _measure("Blueprint", lambda: [Blueprint("item_{}".format(i), "item_{}".format(i + 1), "item_{}".format(i + 2),
+                                             recipe_id="bp_{}".format(i)) for i in range(COUNT - 2)])
+    _measure("Description", lambda: [Description("Plain text", desc_id="desc_{}".format(i)) for i in range(COUNT)])
+
+    def build_rooms():
+        rooms = [Room("Room {}".format(i), Description("A room next to {room|room_0}", desc_id="room_desc_{}".format(i)),
+                      room_id="room_{}".format(i), locations=["room_0"] if i % 2 else None) for i in range(COUNT)]
+        amber._lazy_load()
+        return rooms
+
+    _measure("Room (incl. Description)", build_rooms)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# coding=utf-8
+
+##############
+# Benchmark: cold vs. warm room/get (payload building + JSON encoding)
+# Usage: python -m benchmarks.bench_payloads
+##############
+
+import asyncio
+import logging
+import timeit
+
+from amber import Amber, Room, Item, Description
+from amber.engine import presence
+from amber.engine.session import GameSession
+from amber.web_modules import payloads
+from amber.web_modules.handler import SocketHandler, extract_from_room
+
+try:
+    from ujson import dumps
+except ImportError:
+    from json import dumps
+
+logging.disable(logging.WARNING)
+
+LINKS = 20
+CALLS = 20000
+
+
+class _NullSocket:
+    async def send(self, data):
+        pass
+
+
+def _build_world(amber):
+    text = " ".join("Next to {{room|side_{0}}} lies {{item|thing_{0}}}.".format(i) for i in range(LINKS))
+
+    for i in range(LINKS):
+        Room("Side room {}".format(i), Description("A side room", desc_id="side_desc_{}".format(i)),
+             room_id="side_{}".format(i))
+        Item("Thing {}".format(i), "A rather ordinary thing number {}".format(i), item_id="thing_{}".format(i))
+
+    Room("Main hall", Description(text * 4, desc_id="main_desc"), "Welcome!", image="images/hall.png",
+         sound="sounds/hall.ogg", room_id="main", starting_room=True)
+    amber._lazy_load()
+
+
+def main():
+    amber = Amber("Benchmark")
+    _build_world(amber)
+
+    handler = SocketHandler(amber, _NullSocket())
+    handler.session = GameSession(amber)
+    loop = asyncio.new_event_loop()
+
+    token = presence.set_session(handler.session)
+    room = handler.session.current_room
+
+    def uncached():
+        room.description._invalidate()
+        dumps({"status": "ok", "data": extract_from_room(room), "req_id": 1})
+
+    def cold():
+        payloads.fragments.clear()
+        room.description._invalidate()
+        payloads.encode({"status": "ok", "data": payloads.room_json(room), "req_id": 1})
+
+    def warm():
+        payloads.encode({"status": "ok", "data": payloads.room_json(room), "req_id": 1})
+
+    def warm_handler():
+        loop.run_until_complete(handler.handle("action", "room/get", 1, None))
+
+    print("{:<40} {:>10}".format("room/get", "us/call"))
+    for label, fn in (("dicts + dumps", uncached),
+                      ("fragment cache, cold", cold),
+                      ("fragment cache, warm", warm),
+                      ("warm, through SocketHandler.handle", warm_handler)):
+        seconds = min(timeit.repeat(fn, number=CALLS, repeat=3))
+        print("{:<40} {:>10.2f}".format(label, seconds / CALLS * 1e6))
+
+    presence.reset_session(token)
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
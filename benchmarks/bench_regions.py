@@ -0,0 +1,128 @@
+# coding=utf-8
+
+##############
+# Benchmark: walking a synthetic grid world from a region store, memory stays bounded by the regions in use
+# Usage: python -m benchmarks.bench_regions [rooms] [steps]
+##############
+
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOMS = 1000000
+STEPS = 20000
+# Square blocks of BLOCK x BLOCK rooms form a region
+BLOCK = 32
+MAX_REGIONS = 16
+
+WALK = '''
+import logging, os, random, resource, sys, time
+logging.disable(logging.INFO)
+from amber import Amber
+from amber.web_modules import payloads
+
+
+def rss():
+    # Current resident set size in MiB
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+path, steps, max_regions = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+random.seed(1)
+
+before = rss()
+start = time.perf_counter()
+amber = Amber("Benchmark")
+store = amber.use_regions(path, max_regions=max_regions)
+print("open", time.perf_counter() - start, rss() - before)
+
+session = amber.session
+direction = 0
+start = time.perf_counter()
+
+for step in range(1, steps + 1):
+    room = session.current_room
+
+    # What the client asks for in every room (room/get, room/locations)
+    payloads.encode({"room": payloads.room_json(room), "locations": payloads.locations_json(room.locations)})
+
+    # Long straight stretches, so the walk keeps crossing into new regions
+    if step % 100 == 0:
+        direction = random.randrange(4)
+    session.walk_to(room.locations[direction])
+
+    if step % (steps // 4) == 0:
+        print("walk", step, time.perf_counter() - start, rss(), len(store), store.loads, store.evictions, len(payloads.fragments))
+'''
+
+
+def _records(rooms: int):
+    width = int(math.sqrt(rooms))
+
+    def room_id(x, y):
+        return "r{}_{}".format(x % width, y % width)
+
+    for y in range(width):
+        for x in range(width):
+            yield {"type": "room", "id": room_id(x, y), "name": "Room {} {}".format(x, y),
+                   "region": "{}_{}".format(x // BLOCK, y // BLOCK),
+                   "description": "A plain room, {{room|{}}} is to the east".format(room_id(x + 1, y)),
+                   # east, south, west, north (the grid wraps around)
+                   "locations": [room_id(x + 1, y), room_id(x, y + 1), room_id(x - 1, y), room_id(x, y - 1)],
+                   "starting": x == y == 0}
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else ROOMS
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else STEPS
+
+    env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    sys.path.insert(0, env_path)
+    os.environ["PYTHONPATH"] = env_path + os.pathsep + os.environ.get("PYTHONPATH", "")
+
+    from amber.engine import regions
+
+    directory = tempfile.mkdtemp()
+    try:
+        data_path = os.path.join(directory, "world.jsonl")
+        store_path = os.path.join(directory, "world.regions")
+
+        start = time.perf_counter()
+        with open(data_path, "w", encoding="utf-8") as file:
+            for record in _records(rooms):
+                file.write(json.dumps(record) + "\n")
+
+        counts = regions.build(store_path, data_path)
+        os.remove(data_path)
+
+        print("{rooms} rooms in {regions} regions".format(**counts))
+        print("built the region store in {:.1f}s ({:.0f} MiB)".format(
+            time.perf_counter() - start, os.path.getsize(store_path) / 1024 / 1024))
+
+        out = subprocess.run([sys.executable, "-c", WALK, store_path, str(steps), str(MAX_REGIONS)],
+                             check=True, capture_output=True, text=True).stdout
+
+        print("{:>8} {:>10} {:>10} {:>10} {:>8} {:>10} {:>10}".format(
+            "steps", "time (s)", "RSS (MiB)", "regions", "loads", "evictions", "fragments"))
+        for line in out.splitlines():
+            fields = line.split()
+            if fields[0] == "open":
+                print("opened in {:.3f}s (+{:.1f} MiB)".format(float(fields[1]), float(fields[2])))
+            else:
+                print("{:>8} {:>10.2f} {:>10.1f} {:>10} {:>8} {:>10} {:>10}".format(
+                    int(fields[1]), float(fields[2]), float(fields[3]), *fields[4:]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# coding=utf-8
+
+##############
+# Benchmark: resolving and checking the world (Amber.resolve_world) as it grows, time per room should stay flat
+# Usage: python -m benchmarks.bench_resolution
+##############
+
+import os
+import subprocess
+import sys
+
+SIZES = (10000, 40000, 160000)
+
+RESOLVE = '''
+import logging, sys, time
+logging.disable(logging.WARNING)
+from amber import Amber, Room, Item, Blueprint, Description
+
+rooms = int(sys.argv[1])
+amber = Amber("Benchmark")
+
+# Unresolved world: rooms link forward, every room links an item, half of the items are crafted
+for i in range(rooms):
+    Room("Room {}".format(i), Description("Room {} has {{item|thing_{}}}, {{room|room_{}}} is next".format(i, i, (i + 1) % rooms)),
+         locations=["room_{}".format((i + 1) % rooms), "room_{}".format((i + 7) % rooms)], room_id="room_{}".format(i),
+         starting_room=i == 0)
+for i in range(rooms):
+    Item("Thing {}".format(i), item_id="thing_{}".format(i))
+for i in range(0, rooms - 1, 2):
+    Blueprint("thing_{}".format(i), "thing_{}".format(i + 1), "thing_{}".format(i), recipe_id="bp_{}".format(i))
+
+start = time.perf_counter()
+report = amber.resolve_world()
+print(time.perf_counter() - start, len(report.unreachable), len(report.uncraftable))
+'''
+
+
+def main():
+    env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    os.environ["PYTHONPATH"] = env_path + os.pathsep + os.environ.get("PYTHONPATH", "")
+
+    print("{:>8} {:>14} {:>16}".format("rooms", "resolve (s)", "per room (us)"))
+    for rooms in SIZES:
+        out = subprocess.run([sys.executable, "-c", RESOLVE, str(rooms)], check=True, capture_output=True, text=True).stdout
+        seconds = float(out.split()[0])
+
+        print("{:>8} {:>14.3f} {:>16.2f}".format(rooms, seconds, seconds / rooms * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# coding=utf-8
+
+##############
+# Benchmark: HTTP asset throughput and websocket round-trip latency of the web server under concurrent load
+# Usage: python -m benchmarks.bench_server [clients]
+##############
+
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+try:
+    from ujson import dumps, loads
+except ImportError:
+    from json import dumps, loads
+
+from amber import Amber, Room, Description
+from amber.web_modules.web_core import serve
+
+logging.disable(logging.WARNING)
+
+HOST = "127.0.0.1"
+CLIENTS = 50
+HTTP_REQUESTS = 2000
+WS_ROUND_TRIPS = 100
+
+# name, size in bytes
+GAME_FILES = (
+    ("small.png", 16 * 1024),
+    ("large.ogg", 4 * 1024 * 1024),
+)
+
+
+def _build_world(amber):
+    Room("Side room", Description("A side room", desc_id="side_desc"), room_id="side")
+    Room("Main hall", Description("The hall is long and quiet. A door leads to {room|side}.", desc_id="main_desc"),
+         "Welcome!", locations=["side"], room_id="main", starting_room=True)
+    amber._lazy_load()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def _start_server(amber, port, game_dir, **kwargs) -> asyncio.AbstractEventLoop:
+    # The server gets its own thread and loop, so clients don't compete with it for the loop
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve(amber, HOST, port, game_dir, **kwargs))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return loop
+
+
+async def _bench_http(url: str, clients: int, requests: int) -> tuple:
+    per_client = requests // clients
+    received = 0
+
+    async with aiohttp.ClientSession() as http:
+        async def client():
+            nonlocal received
+            for _ in range(per_client):
+                async with http.get(url) as resp:
+                    body = await resp.read()
+                received += len(body)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    return per_client * clients / elapsed, received / elapsed / 1024 / 1024
+
+
+async def _bench_ws(url: str, clients: int, round_trips: int) -> list:
+    latencies = []
+
+    async with aiohttp.ClientSession() as http:
+        async def client():
+            async with http.ws_connect(url) as ws:
+                await ws.send_str(dumps({"type": "event", "event": "game/handshake", "data": {}, "req_id": 0}))
+                await ws.receive()
+
+                for i in range(round_trips):
+                    start = time.perf_counter()
+                    await ws.send_str(dumps({"type": "action", "action": "room/get", "data": {}, "req_id": i + 1}))
+                    loads((await ws.receive()).data)
+                    latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(client() for _ in range(clients)))
+
+    return latencies
+
+
+async def _run(port: int, clients: int):
+    base = "http://{}:{}".format(HOST, port)
+
+    print("{:<28} {:>10} {:>10}".format("HTTP ({} clients)".format(clients), "req/s", "MiB/s"))
+    for label, path in [("frontend: main.js", "/assets/scripts/main.js")] + \
+                       [("game: {} ({} KiB)".format(name, size // 1024), "/" + name) for name, size in GAME_FILES]:
+        rps, mbps = await _bench_http(base + path, clients, HTTP_REQUESTS)
+        print("{:<28} {:>10.0f} {:>10.1f}".format(label, rps, mbps))
+
+    start = time.perf_counter()
+    latencies = await _bench_ws("ws://{}:{}/ws".format(HOST, port), clients, WS_ROUND_TRIPS)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print()
+    print("websocket room/get ({} clients x {} round trips)".format(clients, WS_ROUND_TRIPS))
+    print("  {:.0f} msg/s, p50 {:.2f} ms, p99 {:.2f} ms, mean {:.2f} ms".format(
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+        statistics.mean(latencies) * 1000,
+    ))
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else CLIENTS
+
+    amber = Amber("Benchmark")
+    _build_world(amber)
+
+    with tempfile.TemporaryDirectory() as game_dir:
+        for name, size in GAME_FILES:
+            with open(os.path.join(game_dir, name), "wb") as file:
+                file.write(os.urandom(size))
+
+        port = _free_port()
+        loop = _start_server(amber, port, game_dir)
+
+        asyncio.run(_run(port, clients))
+        loop.call_soon_threadsafe(loop.stop)
+
+
+if __name__ == "__main__":
+    main()
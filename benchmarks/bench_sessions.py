@@ -0,0 +1,90 @@
+# coding=utf-8
+
+##############
+# Benchmark: memory cost of GameSession objects
+# Usage: python -m benchmarks.bench_sessions
+##############
+
+import logging
+import tracemalloc
+
+from amber import Amber, Room, Item
+from amber.engine import presence
+from amber.engine.session import GameSession
+
+logging.disable(logging.WARNING)
+
+ROOMS = 200
+SESSIONS = (100, 1000, 10000)
+CHANGES = (0, 10, 100)
+OVERLAY_SESSIONS = 1000
+
+
+def _build_world(amber):
+    for i in range(ROOMS):
+        Room("Room {}".format(i), "Room number {}".format(i),
+             locations=["room_{}".format((i + 1) % ROOMS)], room_id="room_{}".format(i))
+        Item("Item {}".format(i), "Item number {}".format(i), item_id="item_{}".format(i))
+
+    amber.set_starting_point("room_0")
+    amber._lazy_load()
+
+
+def _measure(fn) -> int:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+
+    keep = fn()
+
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    del keep
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def _session_with_changes(amber, changes: int):
+    session = GameSession(amber)
+
+    token = presence.set_session(session)
+    try:
+        for i in range(changes):
+            room = presence.obj_collector.find_room_by_id("room_{}".format(i))
+            room.name = "Visited room {}".format(i)
+            room.add_location("room_0")
+    finally:
+        presence.reset_session(token)
+
+    return session
+
+
+def main():
+    amber = Amber("Benchmark")
+    _build_world(amber)
+
+    print("{:>10} {:>16} {:>20}".format("sessions", "total (KiB)", "per session (B)"))
+
+    for count in SESSIONS:
+        def create():
+            sessions = []
+            for _ in range(count):
+                session = GameSession(amber)
+                session._add_to_inventory("item_1")
+                session.walk_to("room_1")
+                sessions.append(session)
+
+            return sessions
+
+        total = _measure(create)
+        print("{:>10} {:>16.1f} {:>20.1f}".format(count, total / 1024, total / count))
+
+    print()
+    print("{:>10} {:>16} {:>20}".format("changes", "total (KiB)", "per session (B)"))
+
+    for changes in CHANGES:
+        total = _measure(lambda: [_session_with_changes(amber, changes) for _ in range(OVERLAY_SESSIONS)])
+        print("{:>10} {:>16.1f} {:>20.1f}".format(changes, total / 1024, total / OVERLAY_SESSIONS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# coding=utf-8
+
+##############
+# Benchmark: game startup with the world built by the script (cold) vs. loaded from the world cache
+# Usage: python -m benchmarks.bench_startup [rooms]
+##############
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOMS = 20000
+RUNS = 3
+
+# Each room links to the next one, has an item and a description linking both
+GAME_SCRIPT = '''
+import time
+START = time.perf_counter()
+
+from amber import Amber, Room, Item, Blueprint, Description, Action
+
+amber = Amber("Benchmark")
+ROOMS = {rooms}
+
+
+def pick_up():
+    return True, "picked up"
+
+
+def build():
+    for i in range(ROOMS):
+        Item("Thing {{}}".format(i), "A thing", item_id="thing_{{}}".format(i)).event("pickup")(pick_up)
+
+    for i in range(ROOMS):
+        desc = Description("Room {{}} has {{{{item|thing_{{}}}}}} and a door to {{{{room|room_{{}}}}}}".format(i, i, (i + 1) % ROOMS),
+                           desc_id="desc_{{}}".format(i))
+        Room("Room {{}}".format(i), desc, locations=["room_{{}}".format((i + 1) % ROOMS)],
+             room_id="room_{{}}".format(i), starting_room=i == 0)
+
+    for i in range(0, ROOMS - 1, 2):
+        Blueprint("thing_{{}}".format(i), "thing_{{}}".format(i + 1), "thing_{{}}".format(i), recipe_id="bp_{{}}".format(i))
+
+
+amber.build_world(build)
+print(time.perf_counter() - START)
+'''
+
+
+def _run(script: str) -> tuple:
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, script], check=True, capture_output=True, text=True).stdout
+    return time.perf_counter() - start, float(out.strip().splitlines()[-1])
+
+
+def main():
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else ROOMS
+
+    directory = tempfile.mkdtemp()
+    try:
+        script = os.path.join(directory, "game.py")
+        with open(script, "w") as file:
+            file.write(GAME_SCRIPT.format(rooms=rooms))
+
+        env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+        os.environ["PYTHONPATH"] = env_path + os.pathsep + os.environ.get("PYTHONPATH", "")
+
+        # The world cache goes to the game's data directory, kept in the temporary directory as well
+        cache_dir = os.path.join(directory, "data")
+        os.environ["AMBER_DATA_DIR"] = cache_dir
+
+        cold = []
+        for _ in range(RUNS):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.append(_run(script))
+
+        cached = [_run(script) for _ in range(RUNS)]
+
+        size = sum(os.path.getsize(os.path.join(path, a)) for path, _, files in os.walk(cache_dir) for a in files)
+
+        print("{} rooms, {} items, cache file {:.1f} MiB".format(rooms, rooms, size / 1024 / 1024))
+        print("{:<30} {:>12} {:>12}".format("", "process (s)", "world (s)"))
+        print("{:<30} {:>12.3f} {:>12.3f}".format("cold (build + write cache)", *min(cold)))
+        print("{:<30} {:>12.3f} {:>12.3f}".format("cached", *min(cached)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
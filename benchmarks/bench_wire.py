@@ -0,0 +1,78 @@
+# coding=utf-8
+
+##############
+# Benchmark: bytes on the wire and encode/decode cost of the negotiable wire formats
+# Usage: python -m benchmarks.bench_wire
+##############
+
+import logging
+import timeit
+
+from amber import Amber, Room, Item, Description
+from amber.engine import presence
+from amber.engine.session import GameSession
+from amber.web_modules import payloads
+from amber.web_modules.wire import Codec, Compression, available_encodings
+
+logging.disable(logging.WARNING)
+
+CALLS = 2000
+
+
+def _build_world(amber):
+    for i in range(10):
+        Room("Side room {}".format(i), Description("A side room", desc_id="side_desc_{}".format(i)),
+             room_id="side_{}".format(i))
+        Item("Thing {}".format(i), "A rather ordinary thing, number {} of many. ".format(i) * 3, item_id="thing_{}".format(i))
+
+    text = ("The hall is long and quiet. Dust floats in the light that falls through the tall windows. "
+            "A door leads to {room|side_0}, another one to {room|side_1}. On the table lies {item|thing_0}. ") * 6
+    Room("Main hall", Description(text, desc_id="main_desc"), "Welcome!", image="images/hall.png",
+         sound="sounds/hall.ogg", locations=["side_{}".format(i) for i in range(10)], room_id="main",
+         starting_room=True)
+    amber._lazy_load()
+
+
+def _typical_payloads(session):
+    room = session.current_room
+    for i in range(10):
+        session._add_to_inventory("thing_{}".format(i))
+
+    return (
+        ("room/get", {"status": "ok", "data": payloads.room_json(room), "req_id": 1}),
+        ("room/get/locations", {"status": "ok", "data": payloads.locations_json(room.locations), "req_id": 2}),
+        ("game/get/inventory", {"status": "ok", "data": payloads.inventory_json(session.inventory), "req_id": 3}),
+        ("room/get/name", {"status": "ok", "data": room.name, "req_id": 4}),
+    )
+
+
+def main():
+    amber = Amber("Benchmark")
+    _build_world(amber)
+
+    session = GameSession(amber)
+    token = presence.set_session(session)
+
+    codecs = []
+    for encoding in available_encodings():
+        codecs.append(Codec(encoding))
+        codecs.append(Codec(encoding, Compression.DEFLATE))
+
+    print("{:<20} {:<18} {:>8} {:>12} {:>12}".format("payload", "format", "bytes", "encode (us)", "decode (us)"))
+
+    for label, payload in _typical_payloads(session):
+        for codec in codecs:
+            frame = codec.encode(payload)
+            size = len(frame.encode("utf-8") if isinstance(frame, str) else frame)
+
+            encode = min(timeit.repeat(lambda: codec.encode(payload), number=CALLS, repeat=3)) / CALLS * 1e6
+            decode = min(timeit.repeat(lambda: codec.decode(frame), number=CALLS, repeat=3)) / CALLS * 1e6
+
+            name = codec.encoding + ("+" + codec.compression if codec.compression else "")
+            print("{:<20} {:<18} {:>8} {:>12.2f} {:>12.2f}".format(label, name, size, encode, decode))
+
+    presence.reset_session(token)
+
+
+if __name__ == "__main__":
+    main()
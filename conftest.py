@@ -0,0 +1,44 @@
+# coding=utf-8
+
+##############
+# Test setup. Tests live next to the modules they cover (amber/**/test_*.py).
+# The world is global (Amber and the object collector are singletons, ids are registered in presence),
+# so every test starts with an empty one.
+##############
+
+import sys
+
+import pytest
+
+from amber.engine import presence
+from amber.engine.core import Amber
+from amber.engine.utils import Singleton
+
+
+def _reset_world():
+    Singleton._instances.pop(Amber, None)
+    presence.world.clear()
+
+    presence.ids.clear()
+    presence._id_cursors.clear()
+    presence._id_counters.clear()
+
+    # Same object (modules keep references to it), the hooks are registered once on import
+    collector = presence.obj_collector
+    hooks = collector.on_remove
+    collector.__init__()
+    collector.on_remove = hooks
+
+    presence.sessions.clear()
+    presence.set_session(None)
+
+    payloads = sys.modules.get("amber.web_modules.payloads")
+    if payloads is not None:
+        payloads.fragments.clear()
+
+
+@pytest.fixture(autouse=True)
+def empty_world():
+    _reset_world()
+    yield
+    _reset_world()
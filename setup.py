@@ -19,4 +19,7 @@ setup(name='Amber',
       keywords="defaltsimon amber text adventure",
       packages=['amber'],
       install_requires=requirements,
+      extras_require={
+          "wire": ["msgpack", "cbor2"],
+      },
       zip_safe=True)